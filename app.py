@@ -1,17 +1,32 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import requests
-from bs4 import BeautifulSoup
 import re
 import hashlib
 import time
+import threading
 import json
+import base64
+import csv
+import io
 from datetime import datetime
-import mysql.connector
-from mysql.connector import Error
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import os
 from dotenv import load_dotenv
+from db_pool import ConnectionPool, PoolExhausted
+from db_backends import create_backend, mysql_config, Error
+from cache import LRUCache, MISSING, SingleFlight, create_response_cache
+from write_queue import WriteBehindQueue
+from content_store import pack_pages, load_pages, PackedPages
+from http_client import create_client
+from model_router import ModelRouter, HedgePolicy
+from semantic_cache import SemanticCache
+from prompt_builder import create_prompt_builder
+from faq import FAQStore, likely_questions
+from retrieval import ChunkIndex, RetrievalStats
+from crawler import Crawler, PAGE_BYTES, validators, conditional_headers
+from fetch_engine import create_engine
+from extraction import Extractor
+import migrations
 
 # Load environment variables - prioritize .env.local for local development
 from pathlib import Path
@@ -26,7 +41,7 @@ CORS(app)
 
 # Configuration
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "").strip()
-OPENROUTER_API_BASE = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_API_BASE = os.getenv("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1/chat/completions")
 
 MODELS = [
     "meta-llama/llama-3.2-3b-instruct:free",
@@ -35,100 +50,265 @@ MODELS = [
     "nousresearch/hermes-3-llama-3.1-405b:free"
 ]
 
-MYSQL_CONFIG = {
-    'host': os.getenv('MYSQL_HOST', 'localhost'),
-    'database': os.getenv('MYSQL_DATABASE', 'chatbot_db'),
-    'user': os.getenv('MYSQL_USER', 'root'),
-    'password': os.getenv('MYSQL_PASSWORD', ''),
-    'port': int(os.getenv('MYSQL_PORT', '3306'))
-}
+MYSQL_CONFIG = mysql_config()
+
+# DB_BACKEND=mysql (default) or sqlite (SQLITE_PATH, WAL mode) for local runs and benchmarks
+db_backend = create_backend(MYSQL_CONFIG)
+
+MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', '5'))
+MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', '5'))
+MYSQL_POOL_RECYCLE = int(os.getenv('MYSQL_POOL_RECYCLE', '3600'))
+
+# Leads are journaled here and inserted in batches by a background thread
+LEAD_SPOOL_DIR = os.getenv('LEAD_SPOOL_DIR', 'spool')
+LEAD_BATCH_SIZE = int(os.getenv('LEAD_BATCH_SIZE', '50'))
+LEAD_FLUSH_INTERVAL = float(os.getenv('LEAD_FLUSH_INTERVAL', '1.0'))
+
+# Parsed chatbot records, per worker. Content writes invalidate locally; other
+# workers pick up changes once the TTL expires.
+chatbot_cache = LRUCache(
+    max_entries=int(os.getenv('CHATBOT_CACHE_SIZE', '500')),
+    max_bytes=int(os.getenv('CHATBOT_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    ttl=int(os.getenv('CHATBOT_CACHE_TTL', '300')),
+    negative_ttl=int(os.getenv('CHATBOT_CACHE_NEGATIVE_TTL', '30'))
+)
+
+# Keep-alive HTTP pool for OpenRouter completions
+llm_http = create_client('LLM', read_timeout=10, headers={
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+    "Content-Type": "application/json",
+    "HTTP-Referer": "https://github.com",
+    "X-Title": "Chatbot"
+})
+# Scraper fetches for every crawl in the process share one asyncio engine: a single
+# connection pool, at most SCRAPE_PER_HOST connections per site and SCRAPE_MAX_CONNECTIONS overall
+scrape_engine = create_engine('SCRAPE', read_timeout=8)
+
+# LLM responses keyed by chatbot + full prompt digest. LLM_CACHE_BACKEND=sqlite
+# (LLM_CACHE_PATH) shares one bounded cache between all workers on the host.
+response_cache = create_response_cache()
+# Rephrasings of questions a chatbot has already answered, per worker
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.85')),
+    max_entries=int(os.getenv('SEMANTIC_CACHE_SIZE', '200')),
+    max_chatbots=int(os.getenv('SEMANTIC_CACHE_CHATBOTS', '100'))
+)
+
+# Scraped context is packed into each prompt up to a per-model token budget
+# (PROMPT_CONTEXT_TOKENS / PROMPT_CONTEXT_SCALE); prompt sizes are reported on /api/health
+prompt_builder = create_prompt_builder(reply_tokens=150)
+
+# Site crawl budgets for chatbot creation: pages kept, bytes downloaded, seconds, link depth
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', '15'))
+CRAWL_MAX_BYTES = int(os.getenv('CRAWL_MAX_BYTES', str(3 * 1024 * 1024)))
+CRAWL_TIME_BUDGET = float(os.getenv('CRAWL_TIME_BUDGET', '20'))
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', '3'))
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', '4'))
+
+# Page text: title, description, headings, paragraphs and list items in one lxml pass
+# (SCRAPE_EXTRACTOR=bs4 switches back to the BeautifulSoup html.parser path)
+page_extractor = Extractor(engine=os.getenv('SCRAPE_EXTRACTOR', 'lxml').strip().lower())
+
+# Chat prompts get the RETRIEVAL_TOP_K best BM25 chunks of all scraped pages
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '4'))
+retrieval_stats = RetrievalStats()
+
+# After a chatbot is created, answers to its likely questions are generated in the
+# background (FAQ_PRECOMPUTE) and matching chat messages are served from them
+FAQ_PRECOMPUTE = os.getenv('FAQ_PRECOMPUTE', 'true').strip().lower() in ('1', 'true', 'yes')
+FAQ_COUNT = int(os.getenv('FAQ_COUNT', '8'))
+FAQ_CONCURRENCY = int(os.getenv('FAQ_CONCURRENCY', '2'))
+faq_store = FAQStore(threshold=float(os.getenv('FAQ_MATCH_THRESHOLD', '0.8')))
+faq_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='faq')
+
+# Concurrent identical prompts always coalesce within a worker; with LLM_SINGLEFLIGHT_SHARED
+# workers also wait for each other through the shared cache (up to LLM_SINGLEFLIGHT_TIMEOUT s)
+LLM_SINGLEFLIGHT_SHARED = os.getenv('LLM_SINGLEFLIGHT_SHARED', 'false').strip().lower() in ('1', 'true', 'yes')
+LLM_SINGLEFLIGHT_TIMEOUT = float(os.getenv('LLM_SINGLEFLIGHT_TIMEOUT', '15'))
 
 class DatabaseManager:
+    _pool = None
+
+    @staticmethod
+    def get_pool():
+        if DatabaseManager._pool is None:
+            DatabaseManager._pool = ConnectionPool(
+                db_backend.connect,
+                size=MYSQL_POOL_SIZE,
+                timeout=MYSQL_POOL_TIMEOUT,
+                recycle=MYSQL_POOL_RECYCLE,
+                ping=db_backend.ping
+            )
+        return DatabaseManager._pool
+
+    @staticmethod
+    def pool_stats():
+        return DatabaseManager.get_pool().stats()
+
     @staticmethod
     def create_connection():
         try:
-            conn = mysql.connector.connect(**MYSQL_CONFIG)
-            return conn if conn.is_connected() else None
-        except Error as e:
+            return DatabaseManager.get_pool().get_connection()
+        except Error + (PoolExhausted,) as e:
             print(f"[DB] Error: {e}")
             return None
     
     @staticmethod
-    def initialize_database():
+    def check_schema():
+        """Compare the recorded schema version with the code's; DDL is left to migrations.py"""
+        global schema_version
         conn = DatabaseManager.create_connection()
         if not conn:
             return False
         
         try:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS leads (
-                    userid INT AUTO_INCREMENT PRIMARY KEY,
-                    username VARCHAR(255) NOT NULL,
-                    mailid VARCHAR(255),
-                    phonenumber VARCHAR(100),
-                    conversation TEXT,
-                    timestart TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    timeend TIMESTAMP NULL,
-                    chatbot_id VARCHAR(255),
-                    company_name VARCHAR(255),
-                    session_id VARCHAR(255),
-                    questions_asked INT DEFAULT 0,
-                    INDEX idx_chatbot_id (chatbot_id),
-                    INDEX idx_mailid (mailid),
-                    INDEX idx_session_id (session_id)
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS chatbots (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    chatbot_id VARCHAR(255) UNIQUE NOT NULL,
-                    company_name VARCHAR(255) NOT NULL,
-                    website_url TEXT NOT NULL,
-                    scraped_content TEXT,
-                    contact_info TEXT,
-                    embed_code TEXT,
-                    status VARCHAR(50) DEFAULT 'active',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    INDEX idx_chatbot_id (chatbot_id)
-                )
-            """)
+            schema_version = migrations.current_version(conn)
+        except Error:
+            schema_version = 0
+        finally:
+            conn.close()
+        
+        if schema_version < migrations.SCHEMA_VERSION:
+            print(f"[DB] Schema is at version {schema_version}, expected {migrations.SCHEMA_VERSION} - run: python migrations.py")
+            return False
+        return True
+    
+    @staticmethod
+    def save_chatbot(chatbot_id, company_name, website_url, scraped_content, contact_info, embed_code):
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return False
+        
+        try:
+            # Index once here so chat requests only ever load it
+            index = ChunkIndex.build(scraped_content)
+            retrieval_stats.record_build(index.build_ms)
+            print(f"[AI] Indexed {len(index)} chunks for {chatbot_id} in {index.build_ms:.1f}ms")
             
+            cursor = conn.cursor()
+            query = f"""
+                INSERT INTO chatbots (chatbot_id, company_name, website_url, scraped_content, contact_info, embed_code, search_index)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                {db_backend.upsert('chatbot_id', ['scraped_content', 'contact_info', 'search_index'])}
+            """
+            cursor.execute(query, (chatbot_id, company_name, website_url, 
+                                 pack_pages([page_record(p) for p in scraped_content]), json.dumps(contact_info),
+                                 embed_code, index.to_bytes()))
             conn.commit()
             cursor.close()
-            conn.close()
+            DatabaseManager._save_page_state(conn, chatbot_id, scraped_content)
+            DatabaseManager.invalidate_content(chatbot_id)
             return True
         except Error as e:
-            print(f"[DB] Init error: {e}")
+            print(f"[DB] Save error: {e}")
             return False
+        finally:
+            conn.close()
     
     @staticmethod
-    def save_chatbot(chatbot_id, company_name, website_url, scraped_content, contact_info, embed_code):
+    def update_chatbot_content(chatbot_id, pages, frames, contact_info, touched, removed_urls):
+        """Store a refreshed page list: frames maps positions in pages to compressed frames
+        reused from the old blob; touched/removed_urls update the per-page state"""
         conn = DatabaseManager.create_connection()
         if not conn:
             return False
         
         try:
+            index = ChunkIndex.build(pages)
+            retrieval_stats.record_build(index.build_ms)
+            
             cursor = conn.cursor()
-            query = """
-                INSERT INTO chatbots (chatbot_id, company_name, website_url, scraped_content, contact_info, embed_code)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE scraped_content = VALUES(scraped_content), contact_info = VALUES(contact_info)
-            """
-            cursor.execute(query, (chatbot_id, company_name, website_url, 
-                                 json.dumps(scraped_content), json.dumps(contact_info), embed_code))
+            cursor.execute(
+                "UPDATE chatbots SET scraped_content = %s, contact_info = %s, search_index = %s WHERE chatbot_id = %s",
+                (pack_pages([page_record(p) for p in pages], frames), json.dumps(contact_info),
+                 index.to_bytes(), chatbot_id)
+            )
             conn.commit()
             cursor.close()
+            DatabaseManager._save_page_state(conn, chatbot_id, touched, removed_urls)
+            DatabaseManager.invalidate_content(chatbot_id)
+            return True
+        except Error as e:
+            print(f"[DB] Content update error: {e}")
+            return False
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def invalidate_content(chatbot_id):
+        """Drop everything derived from a chatbot's scraped content"""
+        chatbot_cache.invalidate(chatbot_id)
+        response_cache.invalidate_namespace(chatbot_id)
+        semantic_cache.invalidate(chatbot_id)
+        faq_store.invalidate(chatbot_id)
+    
+    @staticmethod
+    def get_page_state(chatbot_id):
+        """{url: {etag, last_modified, content_hash}} as of the last scrape or refresh"""
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return {}
+        
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT url, etag, last_modified, content_hash FROM scraped_pages WHERE chatbot_id = %s",
+                (chatbot_id,)
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+            return {row.pop('url'): row for row in rows}
+        except Error as e:
+            # Missing table until migration 6 runs: every page is fetched unconditionally
+            print(f"[DB] Page state load error: {e}")
+            return {}
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def save_page_state(chatbot_id, pages):
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return False
+        
+        try:
+            return DatabaseManager._save_page_state(conn, chatbot_id, pages)
+        finally:
             conn.close()
+    
+    @staticmethod
+    def _save_page_state(conn, chatbot_id, pages, removed_urls=()):
+        """Upsert the validators and content hash of pages, delete removed_urls"""
+        cursor = conn.cursor()
+        try:
+            if pages:
+                cursor.executemany(f"""
+                    INSERT INTO scraped_pages (chatbot_id, url_hash, url, etag, last_modified, content_hash)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    {db_backend.upsert('chatbot_id, url_hash', ['etag', 'last_modified', 'content_hash'])}
+                """, [(chatbot_id, url_hash(p['url']), p['url'], p.get('etag'), p.get('last_modified'), content_hash(p))
+                      for p in pages])
+            if removed_urls:
+                cursor.executemany(
+                    "DELETE FROM scraped_pages WHERE chatbot_id = %s AND url_hash = %s",
+                    [(chatbot_id, url_hash(url)) for url in removed_urls]
+                )
+            conn.commit()
             return True
         except Error as e:
-            print(f"[DB] Save error: {e}")
+            print(f"[DB] Page state save error: {e}")
             return False
+        finally:
+            cursor.close()
     
     @staticmethod
     def get_chatbot(chatbot_id):
+        """Return the parsed chatbot record, served from chatbot_cache when possible.
+        The returned dict is shared with the cache and must not be mutated."""
+        cached = chatbot_cache.get(chatbot_id)
+        if cached is not MISSING:
+            return cached
+        
         conn = DatabaseManager.create_connection()
         if not conn:
             return None
@@ -138,17 +318,73 @@ class DatabaseManager:
             cursor.execute("SELECT * FROM chatbots WHERE chatbot_id = %s", (chatbot_id,))
             chatbot = cursor.fetchone()
             cursor.close()
-            conn.close()
             
-            if chatbot and chatbot['scraped_content']:
-                chatbot['scraped_content'] = json.loads(chatbot['scraped_content'])
-            if chatbot and chatbot['contact_info']:
+            if not chatbot:
+                chatbot_cache.set_missing(chatbot_id)
+                return None
+            
+            size = len(chatbot['scraped_content'] or '') + len(chatbot['contact_info'] or '')
+            chatbot['content_version'] = content_version(chatbot['scraped_content'])
+            # Packed pages stay compressed in the cache and are inflated one page at a time
+            chatbot['scraped_content'] = load_pages(chatbot['scraped_content'])
+            index_blob = chatbot.get('search_index')
+            index = ChunkIndex.from_bytes(index_blob) if index_blob else None
+            if index is None:
+                # Stored before migration 5 or in an older format: index in memory for now
+                index = ChunkIndex.build(chatbot['scraped_content'])
+                retrieval_stats.record_build(index.build_ms)
+            chatbot['search_index'] = index
+            size += index.nbytes()
+            if chatbot['contact_info']:
                 chatbot['contact_info'] = json.loads(chatbot['contact_info'])
+            chatbot['faqs'] = DatabaseManager._load_faqs(conn, chatbot_id)
+            size += sum(len(q) + len(a) for q, a in chatbot['faqs'])
             
+            chatbot_cache.set(chatbot_id, chatbot, size=size)
             return chatbot
         except Error as e:
             print(f"[DB] Get error: {e}")
             return None
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _load_faqs(conn, chatbot_id):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT question, answer FROM faq_answers WHERE chatbot_id = %s ORDER BY id", (chatbot_id,))
+            return tuple((question, answer) for question, answer in cursor.fetchall())
+        except Error as e:
+            # Missing table until migration 4 runs: the chatbot simply has no FAQs yet
+            print(f"[DB] FAQ load error: {e}")
+            return ()
+        finally:
+            cursor.close()
+    
+    @staticmethod
+    def save_faqs(chatbot_id, faqs):
+        """Replace a chatbot's precomputed (question, answer) pairs"""
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return False
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM faq_answers WHERE chatbot_id = %s", (chatbot_id,))
+            if faqs:
+                cursor.executemany(
+                    "INSERT INTO faq_answers (chatbot_id, question, answer) VALUES (%s, %s, %s)",
+                    [(chatbot_id, question, answer) for question, answer in faqs]
+                )
+            conn.commit()
+            cursor.close()
+            chatbot_cache.invalidate(chatbot_id)
+            return True
+        except Error as e:
+            print(f"[DB] FAQ save error: {e}")
+            return False
+        finally:
+            conn.close()
     
     @staticmethod
     def get_all_chatbots():
@@ -161,10 +397,235 @@ class DatabaseManager:
             cursor.execute("SELECT * FROM chatbots ORDER BY created_at DESC")
             chatbots = cursor.fetchall()
             cursor.close()
-            conn.close()
             return chatbots
         except Error as e:
             return []
+        finally:
+            conn.close()
+    
+    # Columns accepted by the fields= projection; list views skip the heavy TEXT ones by default
+    CHATBOT_FIELDS = ('id', 'chatbot_id', 'company_name', 'website_url', 'scraped_content',
+                      'contact_info', 'embed_code', 'status', 'created_at')
+    CHATBOT_LIST_FIELDS = tuple(f for f in CHATBOT_FIELDS if f != 'scraped_content')
+    LEAD_FIELDS = ('userid', 'username', 'mailid', 'phonenumber', 'conversation', 'timestart',
+                   'timeend', 'chatbot_id', 'company_name', 'session_id', 'questions_asked')
+    LEAD_LIST_FIELDS = tuple(f for f in LEAD_FIELDS if f != 'conversation')
+    
+    @staticmethod
+    def _fetch_page(table, fields, sort_cols, filters, limit, after):
+        """Keyset pagination, newest first. sort_cols is (timestamp column, id column) and
+        after is that pair for the last row already seen. Returns (rows, next_key);
+        next_key is None on the last page. Returns (None, None) on error."""
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return None, None
+        
+        ts_col, id_col = sort_cols
+        columns = list(fields) + [c for c in sort_cols if c not in fields]
+        where, params = [], []
+        for col, value in filters.items():
+            if value:
+                where.append(f"{col} = %s")
+                params.append(value)
+        if after:
+            where.append(f"({ts_col} < %s OR ({ts_col} = %s AND {id_col} < %s))")
+            params.extend([after[0], after[0], after[1]])
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        params.append(limit + 1)
+        
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                f"SELECT {', '.join(columns)} FROM {table} {where_sql} "
+                f"ORDER BY {ts_col} DESC, {id_col} DESC LIMIT %s",
+                tuple(params)
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        except Error as e:
+            print(f"[DB] Page error: {e}")
+            return None, None
+        finally:
+            conn.close()
+        
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1][ts_col], rows[-1][id_col])
+        for row in rows:
+            for col in sort_cols:
+                if col not in fields:
+                    del row[col]
+        return rows, next_key
+    
+    @staticmethod
+    def get_chatbots_page(fields=CHATBOT_LIST_FIELDS, limit=50, after=None):
+        rows, next_key = DatabaseManager._fetch_page('chatbots', fields, ('created_at', 'id'), {}, limit, after)
+        if rows and 'scraped_content' in fields:
+            for row in rows:
+                row['scraped_content'] = list(load_pages(row['scraped_content']))
+        return rows, next_key
+    
+    @staticmethod
+    def get_leads_page(chatbot_id=None, fields=LEAD_LIST_FIELDS, limit=50, after=None):
+        return DatabaseManager._fetch_page(
+            'leads', fields, ('timestart', 'userid'), {'chatbot_id': chatbot_id}, limit, after
+        )
+    
+    @staticmethod
+    def get_lead_conversation(userid):
+        """Return (found, conversation) for one lead"""
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return False, None
+        
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT session_id, conversation FROM leads WHERE userid = %s", (userid,))
+            row = cursor.fetchone()
+            cursor.close()
+            if not row:
+                return False, None
+            try:
+                return True, json.loads(row['conversation']) if row['conversation'] else []
+            except ValueError:
+                return True, row['conversation']
+        except Error as e:
+            print(f"[DB] Get conversation error: {e}")
+            return False, None
+        finally:
+            conn.close()
+    
+    LEAD_INSERT_QUERY = """
+        INSERT INTO leads 
+        (chatbot_id, company_name, username, mailid, phonenumber, 
+         session_id, questions_asked, conversation, timestart)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    
+    @staticmethod
+    def _lead_row(chatbot_id, company_name, username, mailid, phonenumber,
+                  session_id, questions_asked, conversation, timestart):
+        conv_json = json.dumps(conversation) if conversation else "[]"
+        if isinstance(timestart, str):
+            # Clients send ISO strings; store a naive local datetime so keyset comparisons line up
+            try:
+                parsed = datetime.fromisoformat(timestart)
+                timestart = parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+            except ValueError:
+                pass
+        return (
+            chatbot_id, company_name, 
+            username or "Anonymous", 
+            mailid or "not_provided@example.com", 
+            phonenumber or "Not provided", 
+            session_id, questions_asked, conv_json, timestart
+        )
+    
+    MESSAGE_INSERT_QUERY = """
+        INSERT INTO messages (session_id, chatbot_id, role, content, created_at)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    
+    @staticmethod
+    def queue_messages(session_id, chatbot_id, turns):
+        """Append (role, content) turns for a session through message_writer"""
+        now = datetime.now()
+        try:
+            for role, content in turns:
+                message_writer.enqueue((session_id, chatbot_id, role, content, now))
+            return True
+        except OSError as e:
+            print(f"[DB] Queue message error: {e}")
+            return False
+    
+    @staticmethod
+    def get_messages(session_id, last=None):
+        """Return a session's turns oldest first; with last=N only the final N.
+        Turns still waiting in message_writer are not visible yet."""
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return None
+        
+        try:
+            cursor = conn.cursor(dictionary=True)
+            if last:
+                cursor.execute(
+                    "SELECT role, content, created_at FROM messages WHERE session_id = %s "
+                    "ORDER BY id DESC LIMIT %s",
+                    (session_id, last)
+                )
+                messages = cursor.fetchall()[::-1]
+            else:
+                cursor.execute(
+                    "SELECT role, content, created_at FROM messages WHERE session_id = %s ORDER BY id",
+                    (session_id,)
+                )
+                messages = cursor.fetchall()
+            cursor.close()
+            return messages
+        except Error as e:
+            print(f"[DB] Get messages error: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def stream_leads(chatbot_id=None, since=None, until=None, fields=LEAD_FIELDS, chunk_size=500):
+        """Start an export query on an unbuffered (server-side) cursor and return a generator
+        of row chunks, or None if the query could not be started. The pooled connection is
+        held until the generator is exhausted or closed, so callers must close it even when
+        they never read from it (HEAD requests, clients that hang up)."""
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return None
+        
+        where, params = [], []
+        if chatbot_id:
+            where.append("chatbot_id = %s")
+            params.append(chatbot_id)
+        if since:
+            where.append("timestart >= %s")
+            params.append(since)
+        if until:
+            where.append("timestart < %s")
+            params.append(until)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            cursor.execute(
+                f"SELECT {', '.join(fields)} FROM leads {where_sql} ORDER BY timestart, userid",
+                tuple(params)
+            )
+        except Error as e:
+            print(f"[DB] Export error: {e}")
+            conn.close()
+            return None
+        
+        def chunks():
+            finished = False
+            try:
+                yield None  # primed below: close() now reaches the finally even before the first chunk
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+                cursor.close()
+                finished = True
+            except Error as e:
+                print(f"[DB] Export error: {e}")
+            finally:
+                # An abandoned unbuffered result leaves unread rows on the wire; drop that connection
+                if finished:
+                    conn.close()
+                else:
+                    conn.discard()
+        
+        gen = chunks()
+        next(gen)
+        return gen
     
     @staticmethod
     def save_lead(chatbot_id, company_name, username, mailid, phonenumber, 
@@ -175,30 +636,32 @@ class DatabaseManager:
         
         try:
             cursor = conn.cursor()
-            query = """
-                INSERT INTO leads 
-                (chatbot_id, company_name, username, mailid, phonenumber, 
-                 session_id, questions_asked, conversation, timestart)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            conv_json = json.dumps(conversation) if conversation else "[]"
-            
-            cursor.execute(query, (
-                chatbot_id, company_name, 
-                username or "Anonymous", 
-                mailid or "not_provided@example.com", 
-                phonenumber or "Not provided", 
-                session_id, questions_asked, conv_json, timestart
+            cursor.execute(DatabaseManager.LEAD_INSERT_QUERY, DatabaseManager._lead_row(
+                chatbot_id, company_name, username, mailid, phonenumber,
+                session_id, questions_asked, conversation, timestart
             ))
             
             conn.commit()
             cursor.close()
-            conn.close()
             return True
         except Error as e:
             print(f"[DB] Save lead error: {e}")
             return False
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def queue_lead(chatbot_id, company_name, username, mailid, phonenumber,
+                   session_id, questions_asked, conversation, timestart):
+        """Journal the lead for lead_writer; returns once it is durably queued, not yet inserted"""
+        try:
+            return lead_writer.enqueue(DatabaseManager._lead_row(
+                chatbot_id, company_name, username, mailid, phonenumber,
+                session_id, questions_asked, conversation, timestart
+            ))
+        except (OSError, TypeError) as e:
+            print(f"[DB] Queue lead error: {e}")
+            return False
     
     @staticmethod
     def get_leads(chatbot_id=None):
@@ -214,139 +677,469 @@ class DatabaseManager:
                 cursor.execute("SELECT * FROM leads ORDER BY timestart DESC")
             leads = cursor.fetchall()
             cursor.close()
-            conn.close()
             return leads
         except Error as e:
             return []
-
-class EnhancedScraper:
-    def __init__(self):
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        self.timeout = 8
+        finally:
+            conn.close()
     
-    def extract_content(self, soup):
-        content_parts = []
-        
-        if soup.title:
-            content_parts.append(f"TITLE: {soup.title.string}")
-        
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        if meta_desc and meta_desc.get('content'):
-            content_parts.append(f"DESC: {meta_desc.get('content')}")
+    # Time buckets accepted by get_lead_stats
+    STATS_INTERVALS = ('hour', 'day', 'month')
+    
+    @staticmethod
+    def get_lead_stats(chatbot_id=None, since=None, until=None, group_by_chatbot=False, interval=None):
+        """Aggregate lead metrics in SQL. Returns (totals, breakdown) or (None, None) on error.
+        A lead counts as converted when it left a real email or phone number."""
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return None, None
         
-        headings = soup.find_all(['h1', 'h2', 'h3'])
-        for h in headings[:15]:
-            text = h.get_text(strip=True)
-            if text:
-                content_parts.append(f"{h.name.upper()}: {text}")
+        where, params = [], []
+        if chatbot_id:
+            where.append("chatbot_id = %s")
+            params.append(chatbot_id)
+        if since:
+            where.append("timestart >= %s")
+            params.append(since)
+        if until:
+            where.append("timestart < %s")
+            params.append(until)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
         
-        paragraphs = soup.find_all('p')
-        for p in paragraphs[:20]:
-            text = p.get_text(strip=True)
-            if len(text) > 20:
-                content_parts.append(text)
+        duration = db_backend.seconds_between('timestart', 'timeend')
+        metrics = f"""
+            COUNT(*) AS total_leads,
+            COALESCE(SUM(questions_asked), 0) AS total_questions,
+            AVG(questions_asked) AS avg_questions,
+            SUM(CASE WHEN (mailid IS NOT NULL AND mailid <> 'not_provided@example.com')
+                       OR (phonenumber IS NOT NULL AND phonenumber <> 'Not provided')
+                     THEN 1 ELSE 0 END) AS converted_leads,
+            COUNT(timeend) AS completed_sessions,
+            AVG({duration}) AS avg_duration_seconds,
+            MAX({duration}) AS max_duration_seconds
+        """
         
-        lists = soup.find_all(['ul', 'ol'])
-        for lst in lists[:5]:
-            items = lst.find_all('li')
-            for item in items[:10]:
-                text = item.get_text(strip=True)
-                if text and len(text) > 5:
-                    content_parts.append(f"• {text}")
+        group_cols = []
+        if group_by_chatbot:
+            group_cols.append("chatbot_id")
+        if interval:
+            group_cols.append(f"{db_backend.time_bucket(interval, 'timestart')} AS bucket")
         
-        return '\n'.join(content_parts)[:4000]
-    
-    def scrape_page(self, url):
         try:
-            resp = requests.get(url, headers=self.headers, timeout=self.timeout, allow_redirects=True)
-            if resp.status_code != 200:
-                return None
-            
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'iframe']):
-                tag.decompose()
-            
-            content = self.extract_content(soup)
-            if not content or len(content) < 100:
-                return None
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {metrics} FROM leads {where_sql}", tuple(params))
+            totals = DatabaseManager._format_stats(cursor.fetchone())
             
-            return {"url": url, "content": content}
-        except Exception as e:
-            print(f"Scrape error for {url}: {e}")
-            return None
+            breakdown = []
+            if group_cols:
+                group_keys = ", ".join(c.split(" AS ")[-1] for c in group_cols)
+                cursor.execute(
+                    f"SELECT {', '.join(group_cols)}, {metrics} FROM leads {where_sql} "
+                    f"GROUP BY {group_keys} ORDER BY {group_keys}",
+                    tuple(params)
+                )
+                for row in cursor.fetchall():
+                    entry = {k: row[k] for k in ('chatbot_id', 'bucket') if k in row}
+                    if 'bucket' in entry:
+                        entry['bucket'] = str(entry['bucket'])
+                    entry.update(DatabaseManager._format_stats(row))
+                    breakdown.append(entry)
+            cursor.close()
+            return totals, breakdown
+        except Error as e:
+            print(f"[DB] Stats error: {e}")
+            return None, None
+        finally:
+            conn.close()
     
-    def scrape_website(self, base_url):
-        if not base_url.startswith('http'):
-            base_url = 'https://' + base_url
-        
-        urls = [base_url, f"{base_url}/about", f"{base_url}/services", 
-                f"{base_url}/contact", f"{base_url}/pricing"]
-        
-        pages = []
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = {executor.submit(self.scrape_page, url): url for url in urls}
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    pages.append(result)
+    @staticmethod
+    def _format_stats(row):
+        total = int(row['total_leads'] or 0)
+        converted = int(row['converted_leads'] or 0)
+        avg_duration = row['avg_duration_seconds']
+        return {
+            "total_leads": total,
+            "total_questions": int(row['total_questions'] or 0),
+            "avg_questions": round(float(row['avg_questions'] or 0), 2),
+            "converted_leads": converted,
+            "conversion_rate": round(converted / total, 4) if total else 0,
+            "completed_sessions": int(row['completed_sessions'] or 0),
+            "avg_duration_seconds": round(float(avg_duration), 1) if avg_duration is not None else None,
+            "max_duration_seconds": int(row['max_duration_seconds']) if row['max_duration_seconds'] is not None else None
+        }
+
+# HTTP validators ride along on freshly crawled pages but live in scraped_pages, not in scraped_content
+PAGE_VALIDATORS = ('etag', 'last_modified')
+
+def page_record(page):
+    """The page as stored in scraped_content"""
+    return {k: v for k, v in page.items() if k not in PAGE_VALIDATORS}
+
+def content_hash(page):
+    return hashlib.sha1(page['content'].encode('utf-8')).hexdigest()
+
+def url_hash(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+def content_version(blob):
+    """Digest of a chatbot's stored scraped_content; changes whenever any worker rewrites it"""
+    if isinstance(blob, str):
+        blob = blob.encode('utf-8')
+    return hashlib.sha1(blob or b'').hexdigest()[:16]
+
+class EnhancedScraper:
+    def __init__(self):
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+        }
+    
+    def parse_page(self, url, html):
+        """Turn fetched HTML into a page record, or None if it has too little content"""
+        return self.parse_page_links(url, html)[0]
+    
+    def parse_page_links(self, url, html):
+        """(page record or None, hrefs of its links); links are read before nav/footer are dropped"""
+        content, links, _ = page_extractor.extract(html)
+        if not content or len(content) < 100:
+            return None, links
         
+        return {"url": url, "content": content}, links
+    
+    @staticmethod
+    def extract_contacts(pages):
         all_text = '\n'.join([p['content'] for p in pages])
         emails = list(set(re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', all_text)))[:5]
         phones = list(set(re.findall(r'(?:\+?\d{1,3}[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)?\d{3}[-.\s]?\d{4}', all_text)))[:5]
-        
-        return pages, {"emails": emails, "phones": phones}
+        return {"emails": emails, "phones": phones}
+    
+    def crawler(self, progress_callback=None):
+        return Crawler(
+            self.parse_page_links,
+            max_pages=CRAWL_MAX_PAGES,
+            max_bytes=CRAWL_MAX_BYTES,
+            time_budget=CRAWL_TIME_BUDGET,
+            max_depth=CRAWL_MAX_DEPTH,
+            concurrency=CRAWL_CONCURRENCY,
+            progress_callback=progress_callback
+        )
+    
+    def scrape_website(self, base_url, progress_callback=None):
+        """Crawl the site from robots.txt, sitemaps and links; progress_callback(done, total, url, info)
+        is called after every fetch with its status, size and timing"""
+        crawler = self.crawler(progress_callback)
+        pages = scrape_engine.crawl(crawler, base_url, self.headers)
+        print(f"[Scraper] Crawled {base_url}: {crawler.report}")
+        return pages, self.extract_contacts(pages)
+
+def completion_request(model, prompt, stream=False):
+    """OpenRouter chat completion body for one prompt, packed to model's token budget"""
+    text, max_tokens = prompt_builder.render(prompt, model)
+    body = {
+        "model": model,
+        "messages": [{"role": "user", "content": text}],
+        "max_tokens": max_tokens,
+        "temperature": 0.7
+    }
+    if stream:
+        body["stream"] = True
+        body["stream_options"] = {"include_usage": True}  # token counts arrive in a final chunk
+    return body
+
+def parse_stream_line(line, usage=None):
+    """One line of an OpenAI-style SSE completion stream -> (finished, text delta or None).
+    A usage block, if the line carries one, is copied into the usage dict when given."""
+    if not line.startswith("data:"):
+        return False, None  # blank separators and ': keep-alive' comments
+    payload = line[5:].strip()
+    if payload == "[DONE]":
+        return True, None
+    chunk = json.loads(payload)
+    if "error" in chunk:
+        raise RuntimeError(str(chunk["error"]))
+    if usage is not None and chunk.get("usage"):
+        usage.update(chunk["usage"])
+    choices = chunk.get("choices") or []
+    if choices:
+        return False, (choices[0].get("delta") or {}).get("content") or None
+    return False, None
 
 class SmartAI:
-    def __init__(self):
-        self.cache = {}
-        self.current_model_index = 0
+    NO_KEY_REPLY = "I'm having trouble connecting. Please configure the API key."
+    UNAVAILABLE_REPLY = "I'm having trouble connecting to the AI service. Please try again."
+    
+    def __init__(self, cache, router, hedge=None):
+        self.cache = cache
+        self.router = router
+        self.hedge = hedge
+        self.flights = SingleFlight()
     
-    def call_llm(self, prompt):
+    def call_llm(self, prompt, chatbot_id=None):
         if not OPENROUTER_API_KEY:
-            return "I'm having trouble connecting. Please configure the API key."
+            return self.NO_KEY_REPLY
         
-        cache_key = hashlib.md5(prompt.encode()).hexdigest()[:12]
-        if cache_key in self.cache:
-            return self.cache[cache_key]
+        namespace = chatbot_id or ''
+        cached = self.cache.get(namespace, prompt)
+        if cached is not MISSING:
+            return cached
         
-        for attempt in range(len(MODELS)):
-            model = MODELS[self.current_model_index]
+        # Identical prompts already in flight share one upstream call
+        result = self.flights.do((namespace, prompt), lambda: self._fetch(prompt, namespace))
+        if result is None:
+            return self.UNAVAILABLE_REPLY
+        return result
+    
+    def _fetch(self, prompt, namespace):
+        """Run one completion and cache it; None if every model failed"""
+        leased = False
+        if LLM_SINGLEFLIGHT_SHARED:
+            # Another worker may already be asking the same thing; wait for its answer instead
+            leased = self.cache.acquire_lease(namespace, prompt, LLM_SINGLEFLIGHT_TIMEOUT)
+            if not leased:
+                shared = self.cache.wait_for(namespace, prompt, LLM_SINGLEFLIGHT_TIMEOUT)
+                if shared is not MISSING:
+                    return shared
+        try:
+            # A flight that finished between the caller's cache check and this one may have stored it
+            cached = self.cache.get(namespace, prompt)
+            if cached is not MISSING:
+                return cached
+            models = self.router.candidates()
+            if self.hedge and len(models) > 1:
+                result = self._call_hedged(prompt, models, namespace)
+            else:
+                result = self._call_sequential(prompt, models)
+            if result is not None:
+                self.cache.set(namespace, prompt, result)
+            return result
+        finally:
+            if leased:
+                self.cache.release_lease(namespace, prompt)
+    
+    def _call_sequential(self, prompt, models):
+        for i, model in enumerate(models):
+            started = time.perf_counter()
             try:
-                resp = requests.post(
+                resp = llm_http.post(
                     OPENROUTER_API_BASE,
-                    headers={
-                        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                        "Content-Type": "application/json",
-                        "HTTP-Referer": "https://github.com",
-                        "X-Title": "Chatbot"
-                    },
-                    json={
-                        "model": model,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "max_tokens": 150,
-                        "temperature": 0.7
-                    },
-                    timeout=10
+                    json=completion_request(model, prompt)
                 )
                 
                 if resp.status_code == 200:
                     data = resp.json()
                     if "choices" in data and len(data["choices"]) > 0:
                         result = data["choices"][0]["message"]["content"].strip()
-                        self.cache[cache_key] = result
+                        self.router.record_success(model, time.perf_counter() - started)
+                        prompt_builder.record_usage(model, data.get("usage"))
+                        self._release(models[i + 1:])
                         return result
+                self.record_http_failure(model, resp)
             except Exception as e:
                 print(f"[AI] Model {model} failed: {e}")
-            
-            self.current_model_index = (self.current_model_index + 1) % len(MODELS)
+                self.router.record_failure(model)
+        return None
+    
+    def _call_hedged(self, prompt, models, chatbot_id):
+        """Start on the best model; if it is slower than its usual p95 (LLM_HEDGE_PERCENTILE),
+        race the next model against it. The first answer wins and the other is cancelled."""
+        self.hedge.start(chatbot_id)
+        pending = list(models)
+        in_flight = {}  # future -> (model, cancel event)
+        
+        def launch(model):
+            cancel = threading.Event()
+            future = hedge_executor.submit(self._complete_cancellable, model, prompt, cancel)
+            in_flight[future] = (model, cancel)
+        
+        primary = pending.pop(0)
+        launch(primary)
+        hedge_timer = self.hedge.delay(primary)
+        hedged = False
+        try:
+            while in_flight:
+                done, _ = wait(in_flight, timeout=hedge_timer, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Primary is in its tail: hedge once, if the chatbot still has budget
+                    hedge_timer = None
+                    if pending and self.hedge.allow(chatbot_id):
+                        hedged = True
+                        launch(pending.pop(0))
+                    continue
+                
+                for future in done:
+                    model, _ = in_flight.pop(future)
+                    result = future.result()
+                    if result is not None:
+                        for _, cancel in in_flight.values():
+                            cancel.set()
+                        self.hedge.record(hedge_won=(model != primary) if hedged else None,
+                                          cancelled=len(in_flight))
+                        return result
+                
+                if not in_flight and pending:
+                    # Everything in flight failed outright; fall back to the next model straight away
+                    hedge_timer = None
+                    launch(pending.pop(0))
+            return None
+        finally:
+            self._release(pending)
+    
+    def _complete_cancellable(self, model, prompt, cancel):
+        """One streamed completion that stops reading (closing the connection, which stops
+        generation upstream) as soon as cancel is set. Returns the text, or None.
+        Reads time out after LLM_HEDGE_READ_TIMEOUT, so a cancelled request stuck waiting
+        for its first byte gives its hedge thread back within that long."""
+        started = time.perf_counter()
+        parts = []
+        usage = {}
+        try:
+            with llm_http.post(
+                OPENROUTER_API_BASE,
+                json=completion_request(model, prompt, stream=True),
+                stream=True,
+                timeout=(llm_http.connect_timeout, LLM_HEDGE_READ_TIMEOUT)
+            ) as resp:
+                if resp.status_code != 200:
+                    if not cancel.is_set():
+                        self.record_http_failure(model, resp)
+                    return None
+                for delta in self._stream_deltas(resp, usage):
+                    if cancel.is_set():
+                        break
+                    parts.append(delta)
+            if cancel.is_set():
+                self.router.release(model)
+                self.router.observe_latency(model, time.perf_counter() - started)
+                return None
+            result = "".join(parts).strip()
+            if not result:
+                self.router.record_failure(model)
+                return None
+            self.router.record_success(model, time.perf_counter() - started)
+            prompt_builder.record_usage(model, usage)
+            return result
+        except Exception as e:
+            if cancel.is_set():
+                self.router.release(model)
+                self.router.observe_latency(model, time.perf_counter() - started)
+            else:
+                print(f"[AI] Model {model} failed: {e}")
+                self.router.record_failure(model)
+            return None
+    
+    def stream_llm(self, prompt, chatbot_id=None, outcome=None):
+        """Yield the completion in pieces as OpenRouter produces them.
+        Only a stream that finishes cleanly is written to the response cache; if it breaks
+        after text was sent, the outcome dict (when given) gets truncated=True."""
+        if not OPENROUTER_API_KEY:
+            yield self.NO_KEY_REPLY
+            return
+        
+        namespace = chatbot_id or ''
+        cached = self.cache.get(namespace, prompt)
+        if cached is not MISSING:
+            yield cached
+            return
+        
+        models = self.router.candidates()
+        try:
+            for i, model in enumerate(models):
+                started = time.perf_counter()
+                parts = []
+                try:
+                    with llm_http.post(
+                        OPENROUTER_API_BASE,
+                        json=completion_request(model, prompt, stream=True),
+                        stream=True
+                    ) as resp:
+                        if resp.status_code == 200:
+                            for delta in self._stream_deltas(resp):
+                                if not parts:
+                                    delta = delta.lstrip()
+                                    if not delta:
+                                        continue
+                                parts.append(delta)
+                                yield delta
+                            if parts:
+                                self.router.record_success(model, time.perf_counter() - started)
+                                self.cache.set(namespace, prompt, "".join(parts).strip())
+                                return
+                        self.record_http_failure(model, resp)
+                except Exception as e:
+                    print(f"[AI] Model {model} stream failed: {e}")
+                    self.router.record_failure(model)
+                    if parts:
+                        # Tokens already reached the client; switching models now would garble the reply
+                        if outcome is not None:
+                            outcome["truncated"] = True
+                        return
+        finally:
+            # Hand back probe slots of models this request never got to (success or client disconnect)
+            self._release(models[i:] if models else [])
         
-        return "I'm having trouble connecting to the AI service. Please try again."
+        yield self.UNAVAILABLE_REPLY
+    
+    def is_answer(self, reply):
+        """False for the canned replies given when no model could answer"""
+        return reply not in (self.NO_KEY_REPLY, self.UNAVAILABLE_REPLY)
+    
+    def record_http_failure(self, model, resp):
+        rate_limited = resp.status_code == 429
+        retry_after = resp.headers.get('Retry-After', '')
+        print(f"[AI] Model {model} returned HTTP {resp.status_code}")
+        self.router.record_failure(
+            model, rate_limited=rate_limited,
+            retry_after=float(retry_after) if retry_after.isdigit() else None
+        )
+    
+    def _release(self, models):
+        for model in models:
+            self.router.release(model)
+    
+    @staticmethod
+    def _stream_deltas(resp, usage=None):
+        """Text deltas from an OpenAI-style SSE completion stream; raises if the
+        connection ends before the closing [DONE], so a cut-off reply is never taken as whole"""
+        for line in resp.iter_lines():
+            finished, delta = parse_stream_line(line.decode('utf-8'), usage)
+            if finished:
+                return
+            if delta:
+                yield delta
+        raise RuntimeError("completion stream ended before [DONE]")
 
-# Initialize database on startup
-DatabaseManager.initialize_database()
-ai_engine = SmartAI()
+# Workers only check the schema version; run migrations.py to create or upgrade tables
+schema_version = None
+DatabaseManager.check_schema()
+model_router = ModelRouter(
+    MODELS,
+    failure_threshold=int(os.getenv('MODEL_BREAKER_THRESHOLD', '3')),
+    cooldown=float(os.getenv('MODEL_BREAKER_COOLDOWN', '30'))
+)
+# LLM_HEDGE=true races a second model once the first is slower than its usual p95
+hedge_policy = hedge_executor = None
+if os.getenv('LLM_HEDGE', 'false').strip().lower() in ('1', 'true', 'yes'):
+    hedge_policy = HedgePolicy(
+        model_router,
+        percentile=float(os.getenv('LLM_HEDGE_PERCENTILE', '95')),
+        default_delay=float(os.getenv('LLM_HEDGE_DELAY', '2.0')),
+        ratio=float(os.getenv('LLM_HEDGE_BUDGET', '0.1'))
+    )
+    hedge_executor = ThreadPoolExecutor(max_workers=int(os.getenv('LLM_HEDGE_THREADS', '16')), thread_name_prefix='llm-hedge')
+# Per-read timeout of hedged (streamed) calls: OpenRouter sends keep-alive comments while a
+# model is thinking, so this only bounds how long a cancelled call holds its hedge thread
+LLM_HEDGE_READ_TIMEOUT = float(os.getenv('LLM_HEDGE_READ_TIMEOUT', '3.0'))
+ai_engine = SmartAI(response_cache, model_router, hedge_policy)
+lead_writer = WriteBehindQueue(
+    'leads', DatabaseManager.LEAD_INSERT_QUERY, DatabaseManager.create_connection,
+    batch_size=LEAD_BATCH_SIZE, flush_interval=LEAD_FLUSH_INTERVAL, spool_dir=LEAD_SPOOL_DIR
+)
+message_writer = WriteBehindQueue(
+    'messages', DatabaseManager.MESSAGE_INSERT_QUERY, DatabaseManager.create_connection,
+    batch_size=LEAD_BATCH_SIZE * 4, flush_interval=LEAD_FLUSH_INTERVAL, spool_dir=LEAD_SPOOL_DIR
+)
+# Replay rows journaled before a crash or restart now, not on the first new lead or message
+lead_writer.start()
+message_writer.start()
 
 # API Endpoints
 @app.route('/', methods=['GET'])
@@ -363,9 +1156,14 @@ def home():
                 "create": "POST /api/chatbot/create"
             },
             "chat": "POST /api/chat",
+            "chat_stream": "POST /api/chat/stream (text/event-stream)",
+            "models": "GET /api/models",
+            "messages": "GET /api/session/<session_id>/messages?last=N",
             "leads": {
                 "capture": "POST /api/lead/capture",
                 "list": "GET /api/leads",
+                "conversation": "GET /api/lead/<userid>/conversation",
+                "export": "GET /api/leads/export?format=ndjson|csv",
                 "stats": "GET /api/stats"
             }
         },
@@ -374,18 +1172,94 @@ def home():
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+    return jsonify({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "schema_version": {"current": schema_version, "expected": migrations.SCHEMA_VERSION},
+        "db_pool": DatabaseManager.pool_stats(),
+        "chatbot_cache": chatbot_cache.stats(),
+        "llm_cache": response_cache.stats(),
+        "llm_http": llm_http.stats(),
+        "scraper": scrape_engine.stats(),
+        "models": ai_engine.router.stats(),
+        "hedging": hedge_policy.stats() if hedge_policy else None,
+        "llm_singleflight": ai_engine.flights.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "faq": faq_store.stats(),
+        "retrieval": retrieval_stats.stats(),
+        "prompts": prompt_builder.stats(),
+        "lead_writer": lead_writer.stats(),
+        "message_writer": message_writer.stats()
+    })
+
+@app.route('/api/models', methods=['GET'])
+def model_stats():
+    """Per-model routing health for dashboards (this worker's view)"""
+    return jsonify({"success": True, "order": ai_engine.router.candidates_preview(), "models": ai_engine.router.stats()})
+
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(key):
+    ts, row_id = key
+    raw = json.dumps([ts.isoformat() if isinstance(ts, datetime) else ts, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    padded = token + '=' * (-len(token) % 4)
+    ts, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return datetime.fromisoformat(ts), int(row_id)
+
+def parse_date_range():
+    """Read since/until ISO date query args; raises ValueError on bad input"""
+    since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+    until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+    return since, until
+
+def parse_page_args(allowed_fields, default_fields):
+    """Read limit/cursor/fields query args. Returns (fields, limit, after) or raises ValueError"""
+    limit = int(request.args.get('limit', 50))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    limit = min(limit, MAX_PAGE_SIZE)
+    
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor) if cursor else None
+    
+    fields_arg = request.args.get('fields')
+    if not fields_arg:
+        fields = default_fields
+    elif fields_arg == '*':
+        fields = allowed_fields
+    else:
+        fields = tuple(f.strip() for f in fields_arg.split(',') if f.strip())
+        unknown = [f for f in fields if f not in allowed_fields]
+        if unknown or not fields:
+            raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return fields, limit, after
 
 @app.route('/api/chatbots', methods=['GET'])
 def get_chatbots():
-    chatbots = DatabaseManager.get_all_chatbots()
-    return jsonify({"success": True, "chatbots": chatbots})
+    try:
+        fields, limit, after = parse_page_args(DatabaseManager.CHATBOT_FIELDS, DatabaseManager.CHATBOT_LIST_FIELDS)
+    except (ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": f"Invalid pagination arguments: {e}"}), 400
+    
+    chatbots, next_key = DatabaseManager.get_chatbots_page(fields, limit, after)
+    if chatbots is None:
+        return jsonify({"success": False, "error": "Database error"}), 500
+    return jsonify({
+        "success": True,
+        "chatbots": chatbots,
+        "next_cursor": encode_cursor(next_key) if next_key else None
+    })
 
 @app.route('/api/chatbot/<chatbot_id>', methods=['GET'])
 def get_chatbot(chatbot_id):
     chatbot = DatabaseManager.get_chatbot(chatbot_id)
     if chatbot:
-        return jsonify({"success": True, "chatbot": chatbot})
+        # Copy so the cached record keeps its lazily-inflated pages
+        record = {k: v for k, v in chatbot.items() if k != 'search_index'}
+        return jsonify({"success": True, "chatbot": dict(record, scraped_content=list(chatbot['scraped_content']))})
     return jsonify({"success": False, "error": "Chatbot not found"}), 404
 
 @app.route('/api/chatbot/create', methods=['POST'])
@@ -398,43 +1272,155 @@ def create_chatbot():
         return jsonify({"success": False, "error": "Missing required fields"}), 400
     
     try:
-        chatbot_id = hashlib.md5(f"{company_name}{website_url}{time.time()}".encode()).hexdigest()[:12]
-        
         scraper = EnhancedScraper()
         pages, contact_info = scraper.scrape_website(website_url)
-        
-        if not pages:
-            return jsonify({"success": False, "error": "Failed to scrape website"}), 400
-        
-        embed_code = f'''<!-- {company_name} Chatbot -->
+        payload, status = register_chatbot(company_name, website_url, pages, contact_info)
+        return jsonify(payload), status
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def register_chatbot(company_name, website_url, pages, contact_info):
+    """Store a freshly scraped chatbot; returns (response payload, HTTP status)"""
+    if not pages:
+        return {"success": False, "error": "Failed to scrape website"}, 400
+    
+    chatbot_id = hashlib.md5(f"{company_name}{website_url}{time.time()}".encode()).hexdigest()[:12]
+    embed_code = f'''<!-- {company_name} Chatbot -->
 <script src="https://yourdomain.com/chatbot.js" data-chatbot-id="{chatbot_id}"></script>'''
-        
-        success = DatabaseManager.save_chatbot(
-            chatbot_id, company_name, website_url, pages, contact_info, embed_code
-        )
-        
-        if success:
-            return jsonify({
-                "success": True,
-                "chatbot_id": chatbot_id,
-                "company_name": company_name,
-                "embed_code": embed_code
-            })
-        else:
-            return jsonify({"success": False, "error": "Database error"}), 500
-            
+    
+    success = DatabaseManager.save_chatbot(
+        chatbot_id, company_name, website_url, pages, contact_info, embed_code
+    )
+    
+    if success:
+        if FAQ_PRECOMPUTE and OPENROUTER_API_KEY:
+            faq_executor.submit(precompute_faqs, chatbot_id)
+        return {
+            "success": True,
+            "chatbot_id": chatbot_id,
+            "company_name": company_name,
+            "embed_code": embed_code
+        }, 200
+    return {"success": False, "error": "Database error"}, 500
+
+@app.route('/api/chatbot/<chatbot_id>/refresh', methods=['POST'])
+def refresh_chatbot_route(chatbot_id):
+    try:
+        payload, status = refresh_chatbot(chatbot_id)
+        return jsonify(payload), status
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    data = request.json
-    chatbot_id = data.get('chatbot_id')
-    message = data.get('message')
+def refresh_chatbot(chatbot_id):
+    """Re-fetch a chatbot's pages with conditional GETs and store only what changed.
+    A 304 or an identical content hash leaves the page, its compressed frame and every
+    cache alone; caches and the search index are only rebuilt when some page changed.
+    Returns (response payload, HTTP status)."""
+    chatbot = DatabaseManager.get_chatbot(chatbot_id)
+    if not chatbot:
+        return {"success": False, "error": "Chatbot not found"}, 404
     
-    if not chatbot_id or not message:
-        return jsonify({"success": False, "error": "Missing required fields"}), 400
+    started = time.perf_counter()
+    old_pages = chatbot['scraped_content']
+    state = DatabaseManager.get_page_state(chatbot_id)
+    scraper = EnhancedScraper()
+    urls = [page['url'] for page in old_pages]
+    known = [state.get(url) or {} for url in urls]
+    results = scrape_engine.fetch_all(
+        urls,
+        [dict(scraper.headers, **conditional_headers(k.get('etag'), k.get('last_modified'))) for k in known],
+        CRAWL_TIME_BUDGET, PAGE_BYTES
+    )
     
+    counts = dict.fromkeys(("not_modified", "unchanged", "changed", "removed", "failed"), 0)
+    pages, frames, touched, removed = [], {}, [], []
+    for i, (url, k, result) in enumerate(zip(urls, known, results)):
+        old = old_pages[i]
+        page = None
+        if result is not None and result.is_html:
+            page = scraper.parse_page(url, result.text)
+        if result is not None and result.status in (404, 410):
+            counts["removed"] += 1
+            removed.append(url)
+            continue
+        
+        if page is not None and content_hash(page) != (k.get('content_hash') or content_hash(old)):
+            counts["changed"] += 1
+            page.update(validators(result))
+            pages.append(page)
+            touched.append(page)
+            continue
+        
+        if page is not None:
+            counts["unchanged"] += 1
+            fresh = validators(result)
+            if not k or any(fresh.get(v) != k.get(v) for v in PAGE_VALIDATORS):
+                touched.append(dict(old, **fresh))
+        elif result is not None and result.status == 304:
+            counts["not_modified"] += 1
+        else:
+            counts["failed"] += 1
+        # Kept as stored: the compressed frame is copied, not re-encoded
+        if isinstance(old_pages, PackedPages):
+            frames[len(pages)] = old_pages.frame(i)
+        pages.append(old)
+    
+    changed = bool(counts["changed"] or counts["removed"])
+    if changed and not pages:
+        return {"success": False, "error": "No pages left after refresh; the previous content was kept"}, 409
+    if changed:
+        contact_info = EnhancedScraper.extract_contacts(pages)
+        if not DatabaseManager.update_chatbot_content(chatbot_id, pages, frames, contact_info, touched, removed):
+            return {"success": False, "error": "Database error"}, 500
+        if FAQ_PRECOMPUTE and OPENROUTER_API_KEY:
+            faq_executor.submit(precompute_faqs, chatbot_id)
+    elif touched:
+        DatabaseManager.save_page_state(chatbot_id, touched)
+    
+    elapsed_ms = round((time.perf_counter() - started) * 1000)
+    print(f"[Scraper] Refreshed {chatbot_id}: {counts} in {elapsed_ms}ms")
+    return dict({"success": True, "chatbot_id": chatbot_id, "updated": changed, "elapsed_ms": elapsed_ms}, **counts), 200
+
+CHAT_PROMPT = """You are a helpful AI assistant for {company_name}.
+
+Company Information:
+{context}
+
+User Question: {message}
+
+Provide a helpful, concise answer (2-3 sentences):"""
+
+def chat_prompt(chatbot, message):
+    """Chat prompt with the chunks most relevant to message, best first, packed to the model's budget"""
+    return prompt_builder.build(
+        CHAT_PROMPT,
+        retrieval_stats.search(chatbot['search_index'], message, RETRIEVAL_TOP_K),
+        company_name=chatbot['company_name'], message=message
+    )
+
+def precompute_faqs(chatbot_id):
+    """Background stage after create: answer the chatbot's likely questions ahead of its first visitors.
+    Answers go through SmartAI with the chat prompt, so they also land in the response cache."""
+    try:
+        chatbot = DatabaseManager.get_chatbot(chatbot_id)
+        if not chatbot:
+            return
+        questions = likely_questions(chatbot['company_name'], chatbot.get('scraped_content', []), FAQ_COUNT)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=FAQ_CONCURRENCY) as pool:
+            answers = list(pool.map(lambda q: ai_engine.call_llm(chat_prompt(chatbot, q), chatbot_id), questions))
+        faqs = [(q, a) for q, a in zip(questions, answers) if ai_engine.is_answer(a)]
+        if DatabaseManager.save_faqs(chatbot_id, faqs):
+            faq_store.record_job(len(faqs))
+            print(f"[AI] Precomputed {len(faqs)}/{len(questions)} FAQ answers for {chatbot_id} "
+                  f"in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"[AI] FAQ precompute failed for {chatbot_id}: {e}")
+
+def plan_reply(chatbot_id, message):
+    """Work out how to answer one chat message.
+    Returns (text, prompt, namespace, suffix): text is set for the canned fast paths,
+    otherwise the reply is the LLM completion of prompt (cached under namespace) + suffix."""
     # Try to get chatbot from database
     chatbot = DatabaseManager.get_chatbot(chatbot_id)
     
@@ -443,12 +1429,12 @@ def chat():
         # Handle greetings
         if any(g in message.lower() for g in ['hi', 'hello', 'hey', 'greetings']):
             response = "👋 Hello! I'm your AI assistant. How can I help you today? (Note: Database not configured - using demo mode)"
-            return jsonify({"success": True, "response": response})
+            return response, None, None, ""
         
         # Handle contact requests
         if any(k in message.lower() for k in ['email', 'contact', 'phone']):
             response = "📞 To set up contact information, please configure a database and create a chatbot with your company details."
-            return jsonify({"success": True, "response": response})
+            return response, None, None, ""
         
         # Use AI for other queries (without company context)
         prompt = f"""You are a helpful AI assistant.
@@ -457,14 +1443,13 @@ User Question: {message}
 
 Provide a helpful, concise answer (2-3 sentences):"""
         
-        response = ai_engine.call_llm(prompt)
-        return jsonify({"success": True, "response": response + "\n\n(Demo mode - create a chatbot for company-specific responses)"})
+        return None, prompt, None, "\n\n(Demo mode - create a chatbot for company-specific responses)"
     
     # Normal flow with database
     # Handle greetings
     if any(g in message.lower() for g in ['hi', 'hello', 'hey']):
         response = f"👋 Hello! I'm the AI assistant for **{chatbot['company_name']}**. How can I help you today?"
-        return jsonify({"success": True, "response": response})
+        return response, None, None, ""
     
     # Handle contact requests
     if any(k in message.lower() for k in ['email', 'contact', 'phone']):
@@ -475,24 +1460,103 @@ Provide a helpful, concise answer (2-3 sentences):"""
         if contact_info.get('phones'):
             response += "📱 " + ", ".join(contact_info['phones']) + "\n"
         response += f"🌐 {chatbot['website_url']}"
-        return jsonify({"success": True, "response": response})
+        return response, None, None, ""
     
-    # Use AI for other queries
-    scraped_content = chatbot.get('scraped_content', [])
-    context = scraped_content[0]['content'][:800] if scraped_content else "No content available"
+    # Precomputed answer to a question like this one
+    faq_answer = faq_store.match(chatbot_id, chatbot.get('faqs'), message)
+    if faq_answer is not None:
+        return faq_answer, None, None, ""
+    
+    # Earlier answer to a rephrasing of this question
+    similar = semantic_cache.lookup(chatbot_id, message, chatbot['content_version'])
+    if similar is not None:
+        return similar, None, None, ""
     
-    prompt = f"""You are a helpful AI assistant for {chatbot['company_name']}.
+    # Use AI for other queries
+    return None, chat_prompt(chatbot, message), chatbot_id, ""
 
-Company Information:
-{context}
+def remember_reply(namespace, message, reply):
+    """Offer a fresh LLM answer to the semantic cache for later rephrasings"""
+    if namespace and ai_engine.is_answer(reply):
+        # Cached record only: asgi.py calls this on its event loop, where a database read would block
+        chatbot = chatbot_cache.get(namespace)
+        if chatbot is not MISSING and chatbot:
+            semantic_cache.add(namespace, message, reply, chatbot['content_version'])
 
-User Question: {message}
+def generate_reply(chatbot_id, message):
+    """Answer one chat message in full"""
+    text, prompt, namespace, suffix = plan_reply(chatbot_id, message)
+    if text is not None:
+        return text
+    reply = ai_engine.call_llm(prompt, namespace)
+    remember_reply(namespace, message, reply)
+    return reply + suffix
 
-Provide a helpful, concise answer (2-3 sentences):"""
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    data = request.json
+    chatbot_id = data.get('chatbot_id')
+    message = data.get('message')
+    
+    if not chatbot_id or not message:
+        return jsonify({"success": False, "error": "Missing required fields"}), 400
+    
+    response = generate_reply(chatbot_id, message)
+    
+    session_id = data.get('session_id')
+    if session_id:
+        DatabaseManager.queue_messages(session_id, chatbot_id, [("user", message), ("assistant", response)])
     
-    response = ai_engine.call_llm(prompt)
     return jsonify({"success": True, "response": response})
 
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same input as /api/chat; answers as Server-Sent Events.
+    LLM replies arrive as 'delta' events followed by 'done' with the full text;
+    canned replies (greetings, contact details) are a single 'done' event.
+    If the upstream stream breaks partway, 'done' carries truncated: true and nothing is cached."""
+    data = request.json
+    chatbot_id = data.get('chatbot_id')
+    message = data.get('message')
+    
+    if not chatbot_id or not message:
+        return jsonify({"success": False, "error": "Missing required fields"}), 400
+    
+    session_id = data.get('session_id')
+    text, prompt, namespace, suffix = plan_reply(chatbot_id, message)
+    
+    def events():
+        response = text
+        if response is None:
+            # Flush headers right away so the client sees the stream open before the first token
+            yield ": stream open\n\n"
+            parts, outcome = [], {}
+            for delta in ai_engine.stream_llm(prompt, namespace, outcome):
+                parts.append(delta)
+                yield sse_event("delta", {"text": delta})
+            if outcome.get("truncated"):
+                response = "".join(parts)
+                yield sse_event("done", {"response": response, "truncated": True})
+            else:
+                remember_reply(namespace, message, "".join(parts))
+                if suffix:
+                    parts.append(suffix)
+                    yield sse_event("delta", {"text": suffix})
+                response = "".join(parts)
+                yield sse_event("done", {"response": response})
+        else:
+            yield sse_event("done", {"response": response})
+        if session_id:
+            DatabaseManager.queue_messages(session_id, chatbot_id, [("user", message), ("assistant", response)])
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @app.route('/api/lead/capture', methods=['POST'])
 def capture_lead():
     data = request.json
@@ -501,7 +1565,7 @@ def capture_lead():
     if not all(field in data for field in required_fields):
         return jsonify({"success": False, "error": "Missing required fields"}), 400
     
-    success = DatabaseManager.save_lead(
+    success = DatabaseManager.queue_lead(
         data['chatbot_id'],
         data['company_name'],
         data.get('username', 'Anonymous'),
@@ -515,31 +1579,123 @@ def capture_lead():
     
     if success:
         return jsonify({"success": True, "message": "Lead captured successfully"})
-    return jsonify({"success": False, "error": "Database error"}), 500
+    return jsonify({"success": False, "error": "Could not queue lead"}), 500
 
 @app.route('/api/leads', methods=['GET'])
 def get_leads():
     chatbot_id = request.args.get('chatbot_id')
-    leads = DatabaseManager.get_leads(chatbot_id)
-    return jsonify({"success": True, "leads": leads})
+    try:
+        fields, limit, after = parse_page_args(DatabaseManager.LEAD_FIELDS, DatabaseManager.LEAD_LIST_FIELDS)
+    except (ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": f"Invalid pagination arguments: {e}"}), 400
+    
+    leads, next_key = DatabaseManager.get_leads_page(chatbot_id, fields, limit, after)
+    if leads is None:
+        return jsonify({"success": False, "error": "Database error"}), 500
+    return jsonify({
+        "success": True,
+        "leads": leads,
+        "next_cursor": encode_cursor(next_key) if next_key else None
+    })
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+@app.route('/api/leads/export', methods=['GET'])
+def export_leads():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"success": False, "error": "format must be 'ndjson' or 'csv'"}), 400
+    
+    fields = DatabaseManager.LEAD_FIELDS
+    if request.args.get('fields'):
+        fields = tuple(f.strip() for f in request.args['fields'].split(',') if f.strip())
+        if not fields or any(f not in DatabaseManager.LEAD_FIELDS for f in fields):
+            return jsonify({"success": False, "error": "Unknown field in fields"}), 400
+    try:
+        since, until = parse_date_range()
+    except ValueError:
+        return jsonify({"success": False, "error": "since/until must be ISO dates"}), 400
+    
+    chunks = DatabaseManager.stream_leads(request.args.get('chatbot_id'), since, until, fields)
+    if chunks is None:
+        return jsonify({"success": False, "error": "Database error"}), 500
+    
+    def generate_ndjson():
+        for rows in chunks:
+            yield ''.join(json.dumps(row, default=_export_value) + '\n' for row in rows)
+    
+    def generate_csv():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(fields)
+        for rows in chunks:
+            for row in rows:
+                writer.writerow([_export_value(row[f]) for f in fields])
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+    
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+    response = Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=leads.{export_format}"}
+    )
+    # The body generators only release the connection once iterated; HEAD responses never are
+    response.call_on_close(chunks.close)
+    return response
+
+@app.route('/api/session/<session_id>/messages', methods=['GET'])
+def get_session_messages(session_id):
+    try:
+        last = int(request.args['last']) if request.args.get('last') else None
+    except ValueError:
+        return jsonify({"success": False, "error": "last must be an integer"}), 400
+    
+    messages = DatabaseManager.get_messages(session_id, last)
+    if messages is None:
+        return jsonify({"success": False, "error": "Database error"}), 500
+    return jsonify({"success": True, "session_id": session_id, "messages": messages})
+
+@app.route('/api/lead/<int:userid>/conversation', methods=['GET'])
+def get_lead_conversation(userid):
+    found, conversation = DatabaseManager.get_lead_conversation(userid)
+    if not found:
+        return jsonify({"success": False, "error": "Lead not found"}), 404
+    return jsonify({"success": True, "userid": userid, "conversation": conversation})
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     chatbot_id = request.args.get('chatbot_id')
-    leads = DatabaseManager.get_leads(chatbot_id)
+    interval = request.args.get('interval')
+    group_by = request.args.get('group_by')
     
-    total_leads = len(leads)
-    total_questions = sum(lead.get('questions_asked', 0) for lead in leads)
-    avg_questions = total_questions / total_leads if total_leads > 0 else 0
+    if interval and interval not in DatabaseManager.STATS_INTERVALS:
+        return jsonify({"success": False, "error": f"interval must be one of {', '.join(DatabaseManager.STATS_INTERVALS)}"}), 400
+    if group_by and group_by != 'chatbot':
+        return jsonify({"success": False, "error": "group_by must be 'chatbot'"}), 400
     
-    stats = {
-        "total_leads": total_leads,
-        "total_questions": total_questions,
-        "avg_questions": round(avg_questions, 2),
-        "conversion_rate": 0  # Calculate based on your metrics
-    }
+    try:
+        since, until = parse_date_range()
+    except ValueError:
+        return jsonify({"success": False, "error": "since/until must be ISO dates"}), 400
+    
+    stats, breakdown = DatabaseManager.get_lead_stats(
+        chatbot_id, since, until, group_by_chatbot=group_by == 'chatbot', interval=interval
+    )
+    if stats is None:
+        return jsonify({"success": False, "error": "Database error"}), 500
     
-    return jsonify({"success": True, "stats": stats})
+    response = {"success": True, "stats": stats}
+    if group_by or interval:
+        response["breakdown"] = breakdown
+    return jsonify(response)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -1,6 +1,4 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import re
 import os
@@ -8,10 +6,18 @@ import hashlib
 import time
 import json
 from typing import Optional, Dict, List, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import mysql.connector
 from mysql.connector import Error
+from db_pool import ConnectionPool, PoolExhausted
+import migrations
+from write_queue import WriteBehindQueue
+from http_client import create_client
+from prompt_builder import create_prompt_builder
+from retrieval import ChunkIndex
+from crawler import Crawler
+from fetch_engine import create_engine
+from extraction import Extractor
 
 # Load environment variables from .env file
 try:
@@ -32,68 +38,115 @@ MYSQL_CONFIG = {
     'port': int(os.getenv('MYSQL_PORT', '3306')) if os.getenv('MYSQL_PORT', '').strip() else 3306
 }
 
+MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', '5'))
+MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', '5'))
+
+@st.cache_resource
+def get_connection_pool():
+    """One pool per Streamlit server process, shared across reruns and sessions"""
+    return ConnectionPool(
+        lambda: mysql.connector.connect(**MYSQL_CONFIG),
+        size=MYSQL_POOL_SIZE,
+        timeout=MYSQL_POOL_TIMEOUT
+    )
+
+@st.cache_resource
+def get_lead_writer():
+    """Background lead writer, started once per Streamlit server process"""
+    writer = WriteBehindQueue(
+        'leads', DatabaseManager.LEAD_INSERT_QUERY, DatabaseManager.create_connection,
+        batch_size=int(os.getenv('LEAD_BATCH_SIZE', '50')),
+        flush_interval=float(os.getenv('LEAD_FLUSH_INTERVAL', '1.0')),
+        spool_dir=os.getenv('LEAD_SPOOL_DIR', 'spool')
+    )
+    writer.start()
+    return writer
+
+@st.cache_resource
+def get_message_writer():
+    """Background writer for per-turn message appends"""
+    writer = WriteBehindQueue(
+        'messages', DatabaseManager.MESSAGE_INSERT_QUERY, DatabaseManager.create_connection,
+        batch_size=200,
+        flush_interval=float(os.getenv('LEAD_FLUSH_INTERVAL', '1.0')),
+        spool_dir=os.getenv('LEAD_SPOOL_DIR', 'spool')
+    )
+    writer.start()
+    return writer
+
+@st.cache_resource
+def get_llm_http():
+    """Keep-alive connection pool to OpenRouter, shared by every session"""
+    return create_client('LLM', read_timeout=4)
+
+@st.cache_resource
+def get_prompt_builder():
+    """Per-model token budgets for prompt context; 80-token answers keep replies fast"""
+    return create_prompt_builder(reply_tokens=80)
+
+@st.cache_resource
+def get_scrape_engine():
+    """Asyncio fetch engine shared by every session's crawls, with per-host connection limits"""
+    return create_engine('SCRAPE', read_timeout=8)
+
+@st.cache_resource
+def get_extractor():
+    """Comprehensive page layout: all headings, more paragraphs and list items, and tables"""
+    return Extractor(
+        engine=os.getenv('SCRAPE_EXTRACTOR', 'lxml').strip().lower(),
+        title_label="PAGE TITLE", desc_label="DESCRIPTION",
+        heading_tags=('h1', 'h2', 'h3', 'h4'), max_headings=None,
+        max_paragraphs=30, max_lists=10, max_items=15, max_tables=3, max_rows=10,
+        sections=True, drop_tags=('script', 'style', 'nav', 'footer', 'header', 'iframe', 'noscript'),
+        max_chars=8000
+    )
+
+@st.cache_data(ttl=60)
+def schema_version():
+    """Recorded schema version, re-read at most once a minute so a finished migration is noticed"""
+    return DatabaseManager.get_schema_version()
+
 class DatabaseManager:
+    MESSAGE_INSERT_QUERY = """
+        INSERT INTO messages (session_id, chatbot_id, role, content, created_at)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    
+    LEAD_INSERT_QUERY = """
+        INSERT INTO leads 
+        (chatbot_id, company_name, username, mailid, phonenumber, 
+         session_id, questions_asked, conversation, timestart)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    
+    # What the leads list shows; the conversation blob is read only for legacy leads
+    LEAD_LIST_FIELDS = ('userid', 'username', 'mailid', 'phonenumber', 'company_name', 'session_id',
+                        'questions_asked', 'timestart', 'timeend')
+    IN_BATCH = 500  # session ids per IN (...) query
+    
     @staticmethod
     def create_connection():
         try:
-            conn = mysql.connector.connect(**MYSQL_CONFIG)
-            return conn if conn.is_connected() else None
-        except Error as e:
+            return get_connection_pool().get_connection()
+        except (Error, PoolExhausted) as e:
             print(f"[DB] Error: {e}")
             st.error(f"Database connection error: {e}")
             return None
     
     @staticmethod
-    def initialize_database():
+    def get_schema_version():
+        """Applied migrations.py version, 0 before the first run, None without a database.
+        The schema is shared with the Flask API and only migrations.py changes it."""
         conn = DatabaseManager.create_connection()
         if not conn:
-            return False
+            return None
         
         try:
-            cursor = conn.cursor()
-            
-            # Create leads table with requested schema
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS leads (
-                    userid INT AUTO_INCREMENT PRIMARY KEY,
-                    username VARCHAR(255) NOT NULL,
-                    mailid VARCHAR(255),
-                    phonenumber VARCHAR(100),
-                    conversation TEXT,
-                    timestart TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    timeend TIMESTAMP NULL,
-                    chatbot_id VARCHAR(255),
-                    company_name VARCHAR(255),
-                    session_id VARCHAR(255),
-                    questions_asked INT DEFAULT 0,
-                    INDEX idx_chatbot_id (chatbot_id),
-                    INDEX idx_mailid (mailid),
-                    INDEX idx_session_id (session_id)
-                )
-            """)
-            
-            # Create chatbots table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS chatbots (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    chatbot_id VARCHAR(255) UNIQUE NOT NULL,
-                    company_name VARCHAR(255) NOT NULL,
-                    website_url TEXT NOT NULL,
-                    embed_code TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    INDEX idx_chatbot_id (chatbot_id)
-                )
-            """)
-            
-            conn.commit()
-            cursor.close()
+            return migrations.current_version(conn)
+        except Error:
+            return 0
+        finally:
             conn.close()
-            print("[DB] ✅ Database initialized")
-            return True
-        except Error as e:
-            print(f"[DB] Init error: {e}")
-            st.error(f"Database initialization error: {e}")
-            return False
     
     @staticmethod
     def save_lead(chatbot_id, company_name, username, mailid, phonenumber, 
@@ -106,17 +159,11 @@ class DatabaseManager:
         
         try:
             cursor = conn.cursor()
-            query = """
-                INSERT INTO leads 
-                (chatbot_id, company_name, username, mailid, phonenumber, 
-                 session_id, questions_asked, conversation, timestart)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
             
             # Convert conversation to JSON string
             conv_json = json.dumps(conversation) if conversation else "[]"
             
-            cursor.execute(query, (
+            cursor.execute(DatabaseManager.LEAD_INSERT_QUERY, (
                 chatbot_id, 
                 company_name, 
                 username or "Anonymous", 
@@ -131,18 +178,90 @@ class DatabaseManager:
             conn.commit()
             userid = cursor.lastrowid
             cursor.close()
-            conn.close()
             print(f"[DB] ✅ Lead saved with userid: {userid}")
             return True
         except Error as e:
             print(f"[DB] ❌ Save error: {e}")
             st.error(f"Failed to save lead: {e}")
-            if conn:
-                try:
-                    conn.close()
-                except:
-                    pass
             return False
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def queue_lead(chatbot_id, company_name, username, mailid, phonenumber,
+                   session_id, questions_asked, conversation, timestart):
+        """Journal the lead for the background writer instead of inserting while the user waits"""
+        try:
+            return get_lead_writer().enqueue((
+                chatbot_id,
+                company_name,
+                username or "Anonymous",
+                mailid or "not_provided@example.com",
+                phonenumber or "Not provided",
+                session_id,
+                questions_asked,
+                json.dumps(conversation) if conversation else "[]",
+                timestart
+            ))
+        except (OSError, TypeError) as e:
+            print(f"[DB] ❌ Queue error: {e}")
+            st.error(f"Failed to save lead: {e}")
+            return False
+    
+    @staticmethod
+    def append_message(session_id, chatbot_id, role, content):
+        """Append one chat turn to the messages table via the background writer"""
+        try:
+            return get_message_writer().enqueue((session_id, chatbot_id, role, content, datetime.now()))
+        except OSError as e:
+            print(f"[DB] Message queue error: {e}")
+            return False
+    
+    @staticmethod
+    def get_last_messages(session_ids, limit=10):
+        """Last N turns of each session, oldest first, as {session_id: [messages]}.
+        One query per batch of sessions rather than one per lead. Sessions without
+        messages (leads captured before the messages table existed) get their raw
+        leads.conversation text instead of a list."""
+        session_ids = list(dict.fromkeys(s for s in session_ids if s))
+        if not session_ids:
+            return {}
+        conn = DatabaseManager.create_connection()
+        if not conn:
+            return {}
+        
+        try:
+            cursor = conn.cursor(dictionary=True)
+            conversations = {}
+            for start in range(0, len(session_ids), DatabaseManager.IN_BATCH):
+                batch = session_ids[start:start + DatabaseManager.IN_BATCH]
+                cursor.execute(
+                    f"SELECT session_id, role, content FROM messages WHERE session_id IN "
+                    f"({', '.join(['%s'] * len(batch))}) ORDER BY session_id, id",
+                    tuple(batch)
+                )
+                for row in cursor.fetchall():
+                    conversations.setdefault(row.pop('session_id'), []).append(row)
+            conversations = {sid: messages[-limit:] for sid, messages in conversations.items()}
+            
+            legacy = [sid for sid in session_ids if sid not in conversations]
+            for start in range(0, len(legacy), DatabaseManager.IN_BATCH):
+                batch = legacy[start:start + DatabaseManager.IN_BATCH]
+                cursor.execute(
+                    f"SELECT session_id, conversation FROM leads WHERE conversation IS NOT NULL AND session_id IN "
+                    f"({', '.join(['%s'] * len(batch))})",
+                    tuple(batch)
+                )
+                for row in cursor.fetchall():
+                    if row['conversation']:
+                        conversations[row['session_id']] = row['conversation']
+            cursor.close()
+            return conversations
+        except Error as e:
+            print(f"[DB] Get messages error: {e}")
+            return {}
+        finally:
+            conn.close()
     
     @staticmethod
     def update_lead_endtime(session_id):
@@ -161,34 +280,38 @@ class DatabaseManager:
             cursor.execute(query, (datetime.now(), session_id))
             conn.commit()
             cursor.close()
-            conn.close()
             return True
         except Error as e:
             print(f"[DB] Update error: {e}")
             return False
+        finally:
+            conn.close()
     
     @staticmethod
     def get_leads(chatbot_id=None):
+        """Leads for the list view: every column it shows, but not the conversation blob"""
         conn = DatabaseManager.create_connection()
         if not conn:
             return []
         
         try:
             cursor = conn.cursor(dictionary=True)
+            columns = ', '.join(DatabaseManager.LEAD_LIST_FIELDS)
             if chatbot_id:
                 cursor.execute(
-                    "SELECT * FROM leads WHERE chatbot_id = %s ORDER BY timestart DESC", 
+                    f"SELECT {columns} FROM leads WHERE chatbot_id = %s ORDER BY timestart DESC", 
                     (chatbot_id,)
                 )
             else:
-                cursor.execute("SELECT * FROM leads ORDER BY timestart DESC")
+                cursor.execute(f"SELECT {columns} FROM leads ORDER BY timestart DESC")
             leads = cursor.fetchall()
             cursor.close()
-            conn.close()
             return leads
         except Error as e:
             print(f"[DB] Get error: {e}")
             return []
+        finally:
+            conn.close()
     
     @staticmethod
     def save_chatbot(chatbot_id, company_name, website_url, embed_code):
@@ -206,11 +329,12 @@ class DatabaseManager:
             cursor.execute(query, (chatbot_id, company_name, website_url, embed_code))
             conn.commit()
             cursor.close()
-            conn.close()
             return True
         except Error as e:
             print(f"[DB] Chatbot save error: {e}")
             return False
+        finally:
+            conn.close()
 
 class EnhancedScraper:
     """Enhanced web scraper with comprehensive content extraction"""
@@ -218,119 +342,48 @@ class EnhancedScraper:
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         }
-        self.timeout = 8
+        self.engine = get_scrape_engine()
+        self.extractor = get_extractor()
     
-    def extract_comprehensive_content(self, soup):
-        """Extract comprehensive structured content from page"""
-        content_parts = []
-        
-        # Extract page title
-        if soup.title:
-            content_parts.append(f"PAGE TITLE: {soup.title.string}")
-        
-        # Extract meta description
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        if meta_desc and meta_desc.get('content'):
-            content_parts.append(f"DESCRIPTION: {meta_desc.get('content')}")
-        
-        # Extract all headings with hierarchy
-        headings = soup.find_all(['h1', 'h2', 'h3', 'h4'])
-        if headings:
-            content_parts.append("\n=== HEADINGS ===")
-            for h in headings:
-                text = h.get_text(strip=True)
-                if text:
-                    content_parts.append(f"{h.name.upper()}: {text}")
-        
-        # Extract main content
-        content_parts.append("\n=== MAIN CONTENT ===")
-        
-        # Get paragraphs
-        paragraphs = soup.find_all('p')
-        for p in paragraphs[:30]:
-            text = p.get_text(strip=True)
-            if len(text) > 20:
-                content_parts.append(text)
-        
-        # Extract lists
-        lists = soup.find_all(['ul', 'ol'])
-        for lst in lists[:10]:
-            items = lst.find_all('li')
-            for item in items[:15]:
-                text = item.get_text(strip=True)
-                if text and len(text) > 5:
-                    content_parts.append(f"• {text}")
-        
-        # Extract tables
-        tables = soup.find_all('table')
-        if tables:
-            content_parts.append("\n=== TABLES ===")
-            for table in tables[:3]:
-                rows = table.find_all('tr')
-                for row in rows[:10]:
-                    cells = row.find_all(['td', 'th'])
-                    row_text = ' | '.join([cell.get_text(strip=True) for cell in cells if cell.get_text(strip=True)])
-                    if row_text:
-                        content_parts.append(row_text)
-        
-        full_content = '\n'.join(content_parts)
-        return full_content[:8000]
+    def scrape_pages(self, urls, progress_callback=None):
+        """Fetch the given URLs concurrently and parse each; pages with too little content are dropped"""
+        pages = []
+        for i, (url, result) in enumerate(zip(urls, self.engine.fetch_all(urls, self.headers))):
+            if progress_callback:
+                progress_callback(i+1, len(urls), url)
+            if result is not None and result.is_html:
+                page = self.parse_page_links(result.url, result.text)[0]
+                if page:
+                    pages.append(page)
+        return pages
     
-    def scrape_page(self, url):
-        """Scrape a single page with comprehensive extraction"""
-        try:
-            resp = requests.get(url, headers=self.headers, timeout=self.timeout, allow_redirects=True)
-            if resp.status_code != 200:
-                return None
-            
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            
-            # Remove unwanted tags
-            for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'iframe', 'noscript']):
-                tag.decompose()
-            
-            # Extract comprehensive content
-            content = self.extract_comprehensive_content(soup)
-            
-            if not content or len(content) < 100:
-                return None
-            
-            return {
-                "url": url,
-                "content": content,
-                "title": soup.title.string if soup.title else "No title"
-            }
-        except Exception as e:
-            print(f"[Scraper] Error scraping {url}: {e}")
-            return None
+    def parse_page_links(self, url, html):
+        """(page record or None, hrefs of its links); links are read before nav/footer are dropped"""
+        content, links, title = self.extractor.extract(html)
+        
+        if not content or len(content) < 100:
+            return None, links
+        
+        return {
+            "url": url,
+            "content": content,
+            "title": title or "No title"
+        }, links
     
     def scrape_website(self, base_url, progress_callback=None):
-        """Scrape website with automatic URL discovery"""
-        if not base_url.startswith('http'):
-            base_url = 'https://' + base_url
-        
-        # Try common pages
-        urls = [
-            base_url,
-            f"{base_url}/about",
-            f"{base_url}/about-us",
-            f"{base_url}/services",
-            f"{base_url}/products",
-            f"{base_url}/contact",
-            f"{base_url}/contact-us",
-            f"{base_url}/pricing",
-            f"{base_url}/faq"
-        ]
-        
-        pages = []
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = {executor.submit(self.scrape_page, url): url for url in urls}
-            for i, future in enumerate(as_completed(futures)):
-                if progress_callback:
-                    progress_callback(i+1, len(urls), futures[future])
-                result = future.result()
-                if result:
-                    pages.append(result)
+        """Crawl the site from robots.txt, sitemaps and same-site links within a page/byte/time budget.
+        progress_callback(done, total, url, info) follows each fetch (status, bytes, ms)."""
+        crawler = Crawler(
+            self.parse_page_links,
+            max_pages=int(os.getenv('CRAWL_MAX_PAGES', '15')),
+            max_bytes=int(os.getenv('CRAWL_MAX_BYTES', str(3 * 1024 * 1024))),
+            time_budget=float(os.getenv('CRAWL_TIME_BUDGET', '20')),
+            max_depth=int(os.getenv('CRAWL_MAX_DEPTH', '3')),
+            concurrency=int(os.getenv('CRAWL_CONCURRENCY', '4')),
+            progress_callback=progress_callback
+        )
+        pages = self.engine.crawl(crawler, base_url, self.headers)
+        print(f"[Scraper] Crawled {base_url}: {crawler.report}")
         
         # Extract contact info from all pages
         all_text = '\n'.join([p['content'] for p in pages])
@@ -349,10 +402,10 @@ class SmartAI:
         self.cache = {}
     
     @st.cache_data(ttl=3600)
-    def _cached_llm_call(_self, prompt_hash, prompt):
+    def _cached_llm_call(_self, prompt_hash, prompt, max_tokens):
         """Cached LLM call to avoid repeated API requests"""
         try:
-            resp = requests.post(
+            resp = get_llm_http().post(
                 OPENROUTER_API_BASE,
                 headers={
                     "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -363,10 +416,9 @@ class SmartAI:
                 json={
                     "model": MODEL,
                     "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 80,  # Ultra-fast 2-second responses
+                    "max_tokens": max_tokens,  # 80 by default: ultra-fast 2-second responses
                     "temperature": 0.5  # Lower for faster, focused answers
-                },
-                timeout=4  # Quick 2-second target
+                }
             )
             
             if resp.status_code == 200:
@@ -381,7 +433,7 @@ class SmartAI:
         except Exception as e:
             return f"⚠️ Connection error: {str(e)}"
     
-    def call_llm(self, prompt):
+    def call_llm(self, prompt, max_tokens=80):
         """Fast LLM call with caching"""
         if not OPENROUTER_API_KEY:
             return "⚠️ OpenRouter API key not set. Please add it to your .env file."
@@ -392,7 +444,7 @@ class SmartAI:
             return self.cache[cache_key]
         
         # Use Streamlit cache
-        result = self._cached_llm_call(cache_key, prompt)
+        result = self._cached_llm_call(cache_key, prompt, max_tokens)
         
         if result and not result.startswith("⚠️"):
             self.cache[cache_key] = result
@@ -406,6 +458,7 @@ class UniversalChatbot:
         self.website_url = website_url
         self.chatbot_id = chatbot_id
         self.pages = []
+        self.index = None  # BM25 chunk index over all scraped pages
         self.contact_info = {}
         self.ready = False
         self.ai = SmartAI()
@@ -415,6 +468,7 @@ class UniversalChatbot:
         try:
             scraper = EnhancedScraper()
             self.pages, self.contact_info = scraper.scrape_website(self.website_url, progress_callback)
+            self.index = ChunkIndex.build(self.pages)
             self.ready = True
             return True
         except Exception as e:
@@ -425,16 +479,7 @@ class UniversalChatbot:
         """Initialize with custom URLs"""
         try:
             scraper = EnhancedScraper()
-            pages = []
-            
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                futures = {executor.submit(scraper.scrape_page, url): url for url in custom_urls}
-                for i, future in enumerate(as_completed(futures)):
-                    if progress_callback:
-                        progress_callback(i+1, len(custom_urls), futures[future])
-                    result = future.result()
-                    if result:
-                        pages.append(result)
+            pages = scraper.scrape_pages(custom_urls, progress_callback)
             
             # Extract contact info
             all_text = '\n'.join([p['content'] for p in pages])
@@ -442,6 +487,7 @@ class UniversalChatbot:
             phones = list(set(re.findall(r'(?:\+?\d{1,3}[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)?\d{3}[-.\s]?\d{4}', all_text)))[:5]
             
             self.pages = pages
+            self.index = ChunkIndex.build(pages)
             self.contact_info = {"emails": emails, "phones": phones}
             self.ready = True
             return True
@@ -467,19 +513,23 @@ class UniversalChatbot:
             msg += f"🌐 {self.website_url}"
             return msg
         
-        # Ultra-optimized context for 2-second responses
-        context = self.pages[0]['content'][:600] if self.pages else "No content"  # Single page, 600 chars max
-        
-        prompt = f"""You have info from {self.company_name} website:
+        # Most relevant chunks, packed to the model's token budget, keep responses around 2 seconds
+        if self.index is None:
+            self.index = ChunkIndex.build(self.pages)
+        prompt = get_prompt_builder().build(
+            """You have info from {company_name} website:
 
 {context}
 
 Answer this briefly and accurately: {question}
 
 Answer (1 sentence):
-"""
-        
-        return self.ai.call_llm(prompt)
+""",
+            self.index.top_chunks(question, k=3),
+            company_name=self.company_name, question=question
+        )
+        text, max_tokens = prompt.for_model(MODEL)
+        return self.ai.call_llm(text, max_tokens)
 
 def generate_embed_code(chatbot_id, company_name):
     return f'''<!-- {company_name} AI Chatbot -->
@@ -532,7 +582,14 @@ def init_session():
 def main():
     st.set_page_config(page_title="AI Chatbot Lead Generator", page_icon="🤖", layout="wide")
     init_session()
-    DatabaseManager.initialize_database()
+    version = schema_version()
+    if version is not None and version < migrations.SCHEMA_VERSION:
+        print(f"[DB] Schema is at version {version}, expected {migrations.SCHEMA_VERSION} - run: python migrations.py")
+        st.warning(f"Database schema is at version {version}, this app needs {migrations.SCHEMA_VERSION}. "
+                   "Run `python migrations.py` to upgrade it; saving leads and chatbots may fail until then.")
+    # Replay leads and messages journaled before the last restart
+    get_lead_writer()
+    get_message_writer()
     
     st.title("🤖 Universal AI Chatbot with Lead Capture")
     st.caption("Paste any URL and get accurate answers! Automatic lead capture after 3 questions.")
@@ -572,9 +629,10 @@ def main():
                 progress = st.progress(0)
                 status = st.empty()
                 
-                def cb(done, total, url_str):
-                    progress.progress(done/total)
-                    status.text(f"{done}/{total}: {url_str[:40]}...")
+                def cb(done, total, url_str, info=None):
+                    progress.progress(min(1.0, done/total))
+                    timing = f" ({info['status']}, {info['ms']} ms)" if info and info.get('ms') is not None else ""
+                    status.text(f"{done}/{total}: {url_str[:40]}...{timing}")
                 
                 bot = UniversalChatbot(name, url, chatbot_id)
                 init_success = False
@@ -626,6 +684,7 @@ def main():
         st.subheader("📊 Captured Leads")
         leads = DatabaseManager.get_leads()
         if leads:
+            conversations = DatabaseManager.get_last_messages(lead['session_id'] for lead in leads)
             for lead in leads:
                 with st.expander(f"🎯 {lead['username']} - {lead['company_name']}"):
                     st.write(f"**User ID:** {lead['userid']}")
@@ -639,14 +698,19 @@ def main():
                         duration = lead['timeend'] - lead['timestart']
                         st.write(f"**Duration:** {duration}")
                     
-                    if lead['conversation']:
+                    conv = conversations.get(lead['session_id'])
+                    if isinstance(conv, list):
+                        st.write("**Conversation (latest turns):**")
+                        for msg in conv:
+                            st.write(f"- **{msg['role'].title()}:** {msg['content'][:100]}...")
+                    elif conv:
+                        # Leads captured before the messages table existed
                         st.write("**Conversation:**")
                         try:
-                            conv = json.loads(lead['conversation'])
-                            for msg in conv:
+                            for msg in json.loads(conv):
                                 st.write(f"- **{msg['role'].title()}:** {msg['content'][:100]}...")
                         except:
-                            st.write(lead['conversation'][:200])
+                            st.write(conv[:200])
         else:
             st.info("No leads yet")
         return
@@ -737,7 +801,7 @@ def main():
                     st.session_state.lead_data['phone'] = phone_value
                     
                     with st.spinner("Saving..."):
-                        success = DatabaseManager.save_lead(
+                        success = DatabaseManager.queue_lead(
                             bot.chatbot_id,
                             bot.company_name,
                             st.session_state.lead_data.get('name', 'Anonymous'),
@@ -754,7 +818,6 @@ def main():
                         st.session_state.lead_capture_mode = None
                         st.balloons()
                         st.success("✅ Thank you! Continuing chat...")
-                        time.sleep(0.5)
                         st.rerun()
                     else:
                         st.error("Database save failed.")
@@ -764,7 +827,7 @@ def main():
                     st.session_state.lead_data['phone'] = "Not provided"
                     
                     with st.spinner("Saving..."):
-                        success = DatabaseManager.save_lead(
+                        success = DatabaseManager.queue_lead(
                             bot.chatbot_id,
                             bot.company_name,
                             st.session_state.lead_data.get('name', 'Anonymous'),
@@ -781,7 +844,6 @@ def main():
                         st.session_state.lead_capture_mode = None
                         st.balloons()
                         st.success("✅ Thank you! Continuing chat...")
-                        time.sleep(0.5)
                         st.rerun()
                     else:
                         st.error("Database save failed.")
@@ -793,11 +855,13 @@ def main():
             st.warning("⚠️ Please complete the form above")
         else:
             st.session_state.chat_history.append({"role": "user", "content": question})
+            DatabaseManager.append_message(st.session_state.session_id, bot.chatbot_id, "user", question)
             
             with st.spinner("💭"):
                 answer = bot.ask(question)
             
             st.session_state.chat_history.append({"role": "assistant", "content": answer})
+            DatabaseManager.append_message(st.session_state.session_id, bot.chatbot_id, "assistant", answer)
             st.session_state.question_count += 1
             
             if st.session_state.question_count >= 3 and not st.session_state.lead_captured and not st.session_state.lead_capture_mode:
@@ -9,6 +9,7 @@ import json
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from retrieval import ChunkIndex
 
 # Load environment variables
 load_dotenv()
@@ -603,7 +604,8 @@ elif st.session_state.view == 'create':
                                 st.session_state.chatbot = {
                                     'name': company_name,
                                     'url': website_url,
-                                    'pages': pages
+                                    'pages': pages,
+                                    'index': ChunkIndex.build(pages)
                                 }
                                 st.session_state.view = 'chat'
                                 st.success("✅ Agent created!")
@@ -675,7 +677,10 @@ elif st.session_state.view == 'chat':
             if any(g in user_input.lower() for g in ['hi', 'hello', 'hey']):
                 response = f"👋 Hello! I'm the AI assistant for {bot['name']}. How can I help you?"
             else:
-                context = bot['pages'][0]['content'][:800] if bot.get('pages') and len(bot['pages']) > 0 else "No content available"
+                index = bot.get('index')
+                if index is None:
+                    index = bot['index'] = ChunkIndex.build(bot.get('pages', []))
+                context = "\n".join(index.top_chunks(user_input, k=3)) or "No content available"
                 prompt = f"""You are a helpful AI assistant for {bot['name']}.
 
 Context: {context}
@@ -0,0 +1,501 @@
+"""
+Asyncio serving mode
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+/api/chat, /api/chat/stream and /api/chatbot/create run on the event loop
+with an httpx.AsyncClient, so a request waiting on OpenRouter (or on a site
+being scraped) holds a coroutine rather than a worker, and one process can
+keep hundreds of LLM calls in flight. Every other route is the Flask app
+from app.py, run in a thread pool through a small WSGI bridge. Caches, the
+model router, hedging and the semantic cache are app.py's own objects;
+database and cache calls are pushed to threads so they never block the loop.
+Site crawls await app.py's shared fetch engine (fetch_engine.py), so its
+per-host limits cover crawls started from either side.
+"""
+import asyncio
+import contextvars
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+import app as api
+from cache import MISSING
+
+ASYNC_THREADS = int(os.getenv('ASYNC_THREADS', '64'))
+LLM_ASYNC_MAX_CONNECTIONS = int(os.getenv('LLM_ASYNC_MAX_CONNECTIONS', '500'))
+
+
+class AsyncLLM:
+    """Async twin of SmartAI: same cache, router and hedge policy, non-blocking I/O"""
+
+    def __init__(self, ai):
+        self.ai = ai
+        self._client = None
+        self._flights = {}  # (namespace, prompt) -> task
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    def client(self):
+        if self._client is None:
+            http = api.llm_http
+            self._client = httpx.AsyncClient(
+                headers=http.headers,
+                timeout=httpx.Timeout(http.read_timeout, connect=http.connect_timeout),
+                limits=httpx.Limits(max_connections=LLM_ASYNC_MAX_CONNECTIONS,
+                                    max_keepalive_connections=http.pool_size)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def call_llm(self, prompt, chatbot_id=None):
+        if not api.OPENROUTER_API_KEY:
+            return self.ai.NO_KEY_REPLY
+
+        namespace = chatbot_id or ''
+        cached = await asyncio.to_thread(self.ai.cache.get, namespace, prompt)
+        if cached is not MISSING:
+            return cached
+
+        # Identical prompts already in flight on this loop share one upstream call
+        key = (namespace, prompt)
+        task = self._flights.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(self._fetch(prompt, namespace))
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: one caller disconnecting must not cancel the call the others are waiting on
+        result = await asyncio.shield(task)
+        return self.ai.UNAVAILABLE_REPLY if result is None else result
+
+    async def _fetch(self, prompt, namespace):
+        cache = self.ai.cache
+        leased = False
+        if api.LLM_SINGLEFLIGHT_SHARED:
+            leased = await asyncio.to_thread(cache.acquire_lease, namespace, prompt, api.LLM_SINGLEFLIGHT_TIMEOUT)
+            if not leased:
+                shared = await asyncio.to_thread(cache.wait_for, namespace, prompt, api.LLM_SINGLEFLIGHT_TIMEOUT)
+                if shared is not MISSING:
+                    return shared
+        try:
+            # A flight that finished between the caller's cache check and this one may have stored it
+            cached = await asyncio.to_thread(cache.get, namespace, prompt)
+            if cached is not MISSING:
+                return cached
+            models = self.ai.router.candidates()
+            if self.ai.hedge and len(models) > 1:
+                result = await self._call_hedged(prompt, models, namespace)
+            else:
+                result = await self._call_sequential(prompt, models)
+            if result is not None:
+                await asyncio.to_thread(cache.set, namespace, prompt, result)
+            return result
+        finally:
+            if leased:
+                await asyncio.to_thread(cache.release_lease, namespace, prompt)
+
+    async def _complete(self, model, prompt):
+        """One completion from one model; None on failure. Cancelling the task aborts the request."""
+        router = self.ai.router
+        started = time.perf_counter()
+        try:
+            resp = await self.client().post(api.OPENROUTER_API_BASE, json=api.completion_request(model, prompt))
+        except asyncio.CancelledError:
+            router.release(model)
+            router.observe_latency(model, time.perf_counter() - started)
+            raise
+        except (httpx.HTTPError, OSError) as e:
+            print(f"[AI] Model {model} failed: {e!r}")
+            router.record_failure(model)
+            return None
+
+        if resp.status_code != 200:
+            self.ai.record_http_failure(model, resp)
+            return None
+        try:
+            data = resp.json()
+            result = data["choices"][0]["message"]["content"].strip()
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            # A 200 carrying an error, a non-JSON body or no choices: let the next model answer
+            print(f"[AI] Model {model} returned an unusable completion: {e!r}")
+            router.record_failure(model)
+            return None
+        router.record_success(model, time.perf_counter() - started)
+        api.prompt_builder.record_usage(model, data.get("usage"))
+        return result
+
+    async def _call_sequential(self, prompt, models):
+        i = 0
+        try:
+            for i, model in enumerate(models):
+                result = await self._complete(model, prompt)
+                if result is not None:
+                    i += 1
+                    return result
+            i = len(models)
+            return None
+        finally:
+            # Probe slots of models this call never reached
+            for model in models[i:]:
+                self.ai.router.release(model)
+
+    async def _call_hedged(self, prompt, models, chatbot_id):
+        """Same policy as SmartAI._call_hedged, with tasks instead of threads"""
+        hedge = self.ai.hedge
+        hedge.start(chatbot_id)
+        pending = list(models)
+        in_flight = {}  # task -> model
+
+        def launch(model):
+            in_flight[asyncio.ensure_future(self._complete(model, prompt))] = model
+
+        primary = pending.pop(0)
+        launch(primary)
+        hedge_timer = hedge.delay(primary)
+        hedged = False
+        try:
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, timeout=hedge_timer, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_timer = None
+                    if pending and hedge.allow(chatbot_id):
+                        hedged = True
+                        launch(pending.pop(0))
+                    continue
+
+                for task in done:
+                    model = in_flight.pop(task)
+                    result = task.result()
+                    if result is not None:
+                        hedge.record(hedge_won=(model != primary) if hedged else None, cancelled=len(in_flight))
+                        return result
+
+                if not in_flight and pending:
+                    hedge_timer = None
+                    launch(pending.pop(0))
+            return None
+        finally:
+            for task in in_flight:
+                task.cancel()
+            for model in pending:
+                self.ai.router.release(model)
+
+    async def stream_llm(self, prompt, chatbot_id=None, outcome=None):
+        """Async version of SmartAI.stream_llm"""
+        if not api.OPENROUTER_API_KEY:
+            yield self.ai.NO_KEY_REPLY
+            return
+
+        namespace = chatbot_id or ''
+        cached = await asyncio.to_thread(self.ai.cache.get, namespace, prompt)
+        if cached is not MISSING:
+            yield cached
+            return
+
+        router = self.ai.router
+        models = router.candidates()
+        i = 0
+        try:
+            for i, model in enumerate(models):
+                started = time.perf_counter()
+                parts = []
+                try:
+                    async with self.client().stream(
+                        "POST", api.OPENROUTER_API_BASE, json=api.completion_request(model, prompt, stream=True)
+                    ) as resp:
+                        if resp.status_code == 200:
+                            async for line in resp.aiter_lines():
+                                finished, delta = api.parse_stream_line(line)
+                                if finished:
+                                    break
+                                if not delta:
+                                    continue
+                                if not parts:
+                                    delta = delta.lstrip()
+                                    if not delta:
+                                        continue
+                                parts.append(delta)
+                                yield delta
+                            else:
+                                raise RuntimeError("completion stream ended before [DONE]")
+                            if parts:
+                                router.record_success(model, time.perf_counter() - started)
+                                await asyncio.to_thread(self.ai.cache.set, namespace, prompt, "".join(parts).strip())
+                                i += 1
+                                return
+                        else:
+                            await resp.aread()
+                        self.ai.record_http_failure(model, resp)
+                except (httpx.HTTPError, OSError, RuntimeError, ValueError) as e:
+                    print(f"[AI] Model {model} stream failed: {e!r}")
+                    router.record_failure(model)
+                    if parts:
+                        if outcome is not None:
+                            outcome["truncated"] = True
+                        return
+            i = len(models)
+        finally:
+            for model in models[i:]:
+                router.release(model)
+
+        yield self.ai.UNAVAILABLE_REPLY
+
+    def stats(self):
+        return {"in_flight": len(self._flights), "leaders": self.leaders, "coalesced": self.coalesced}
+
+
+llm = AsyncLLM(api.ai_engine)
+
+
+# ---- minimal ASGI plumbing ----
+
+CORS_HEADERS = [(b"access-control-allow-origin", b"*")]
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return body
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def read_json(receive):
+    try:
+        return json.loads(await read_body(receive) or b"null") or {}
+    except ValueError:
+        return None
+
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + CORS_HEADERS
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# ---- native async routes ----
+
+async def chat(scope, receive, send):
+    data = await read_json(receive)
+    if data is None:
+        return await send_json(send, {"success": False, "error": "Invalid JSON"}, 400)
+    chatbot_id = data.get('chatbot_id')
+    message = data.get('message')
+    if not chatbot_id or not message:
+        return await send_json(send, {"success": False, "error": "Missing required fields"}, 400)
+
+    text, prompt, namespace, suffix = await asyncio.to_thread(api.plan_reply, chatbot_id, message)
+    if text is None:
+        reply = await llm.call_llm(prompt, namespace)
+        api.remember_reply(namespace, message, reply)
+        text = reply + suffix
+
+    session_id = data.get('session_id')
+    if session_id:
+        await asyncio.to_thread(api.DatabaseManager.queue_messages, session_id, chatbot_id,
+                                [("user", message), ("assistant", text)])
+    await send_json(send, {"success": True, "response": text})
+
+
+async def chat_stream(scope, receive, send):
+    data = await read_json(receive)
+    if data is None:
+        return await send_json(send, {"success": False, "error": "Invalid JSON"}, 400)
+    chatbot_id = data.get('chatbot_id')
+    message = data.get('message')
+    if not chatbot_id or not message:
+        return await send_json(send, {"success": False, "error": "Missing required fields"}, 400)
+
+    session_id = data.get('session_id')
+    text, prompt, namespace, suffix = await asyncio.to_thread(api.plan_reply, chatbot_id, message)
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no")] + CORS_HEADERS
+    })
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+
+    async def emit(chunk):
+        await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+
+    try:
+        response = text
+        if response is None:
+            await emit(": stream open\n\n")
+            parts, outcome = [], {}
+            deltas = llm.stream_llm(prompt, namespace, outcome)
+            try:
+                async for delta in deltas:
+                    if disconnected.is_set():
+                        return
+                    parts.append(delta)
+                    await emit(api.sse_event("delta", {"text": delta}))
+            finally:
+                await deltas.aclose()
+            if outcome.get("truncated"):
+                response = "".join(parts)
+                await emit(api.sse_event("done", {"response": response, "truncated": True}))
+            else:
+                api.remember_reply(namespace, message, "".join(parts))
+                if suffix:
+                    parts.append(suffix)
+                    await emit(api.sse_event("delta", {"text": suffix}))
+                response = "".join(parts)
+                await emit(api.sse_event("done", {"response": response}))
+        else:
+            await emit(api.sse_event("done", {"response": response}))
+        if session_id:
+            await asyncio.to_thread(api.DatabaseManager.queue_messages, session_id, chatbot_id,
+                                    [("user", message), ("assistant", response)])
+    finally:
+        watcher.cancel()
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def create_chatbot(scope, receive, send):
+    data = await read_json(receive)
+    if data is None:
+        return await send_json(send, {"success": False, "error": "Invalid JSON"}, 400)
+    company_name = data.get('company_name')
+    website_url = data.get('website_url')
+    if not company_name or not website_url:
+        return await send_json(send, {"success": False, "error": "Missing required fields"}, 400)
+
+    scraper = api.EnhancedScraper()
+    try:
+        crawler = scraper.crawler()
+        pages = await api.scrape_engine.crawl_async(crawler, website_url, scraper.headers)
+        print(f"[Scraper] Crawled {website_url}: {crawler.report}")
+        contact_info = scraper.extract_contacts(pages)
+        payload, status = await asyncio.to_thread(api.register_chatbot, company_name, website_url, pages, contact_info)
+    except Exception as e:
+        payload, status = {"success": False, "error": str(e)}, 500
+    await send_json(send, payload, status)
+
+
+ROUTES = {
+    ("POST", "/api/chat"): chat,
+    ("POST", "/api/chat/stream"): chat_stream,
+    ("POST", "/api/chatbot/create"): create_chatbot,
+}
+
+
+# ---- everything else: the Flask app through a WSGI bridge ----
+
+def wsgi_environ(scope, body):
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            continue
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def call_wsgi(scope, receive, send):
+    body = await read_body(receive)
+    environ = wsgi_environ(scope, body)
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return lambda data: None
+
+    # One context for the whole response: streamed Flask responses keep their request
+    # context in context variables between chunks, and asyncio.to_thread would copy a fresh one per call
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+
+    def in_context(fn, *args):
+        return loop.run_in_executor(None, context.run, fn, *args)
+
+    iterable = await in_context(api.app, environ, start_response)
+    try:
+        # Pull chunks in threads so streaming responses (e.g. /api/leads/export) stay streamed
+        iterator = iter(iterable)
+        chunk = await in_context(next, iterator, None)
+        await send({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+        while chunk is not None:
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await in_context(next, iterator, None)
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(iterable, "close"):
+            await in_context(iterable.close)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Room for DB/cache calls and bridged Flask requests alongside the event loop
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=ASYNC_THREADS, thread_name_prefix="asgi"))
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await llm.aclose()
+            await asyncio.to_thread(api.scrape_engine.close)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler is not None:
+        return await handler(scope, receive, send)
+    await call_wsgi(scope, receive, send)
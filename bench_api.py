@@ -0,0 +1,141 @@
+"""
+Load test for the chat, lead and stats paths
+Runs app.py against a throwaway SQLite database (DB_BACKEND=sqlite) in a
+local threaded server, so no MySQL server is needed.
+
+    python bench_api.py --requests 2000 --concurrency 16
+    python bench_api.py --profile profiles/    # per-request cProfile dumps
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(app, chatbots, leads_per_bot):
+    pages = [{"url": f"https://example.com/p{i}", "content": ("Example Co builds widgets and offers support. " * 40)}
+             for i in range(8)]
+    contact = {"emails": ["hello@example.com"], "phones": ["555-123-4567"]}
+    start = datetime.now() - timedelta(days=30)
+    for b in range(chatbots):
+        chatbot_id = f"bench{b:04d}"
+        app.DatabaseManager.save_chatbot(chatbot_id, f"Company {b}", "https://example.com", pages, contact, "<script></script>")
+        for i in range(leads_per_bot):
+            app.DatabaseManager.queue_lead(
+                chatbot_id, f"Company {b}", f"user{i}", f"user{i}@example.com" if i % 3 else None, None,
+                f"{chatbot_id}-s{i}", i % 7, [{"role": "user", "content": "hello"}],
+                start + timedelta(minutes=i)
+            )
+    app.lead_writer.flush(60)
+
+
+def run_scenario(base_url, name, make_request, total, concurrency):
+    import requests
+    session_local = threading.local()
+
+    def one(i):
+        session = getattr(session_local, 'session', None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        t0 = time.perf_counter()
+        resp = make_request(session, base_url, i)
+        elapsed = time.perf_counter() - t0
+        return elapsed, resp.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = [r[0] * 1000 for r in results]
+    errors = sum(1 for r in results if r[1] >= 400)
+    print(f"{name:<14} {total / wall:>9.1f} req/s   p50 {percentile(latencies, 50):7.2f} ms   "
+          f"p95 {percentile(latencies, 95):7.2f} ms   p99 {percentile(latencies, 99):7.2f} ms   "
+          f"mean {statistics.mean(latencies):7.2f} ms   errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--chatbots", type=int, default=20)
+    parser.add_argument("--leads", type=int, default=500, help="seeded leads per chatbot")
+    parser.add_argument("--db", help="SQLite file to use (default: a temp file)")
+    parser.add_argument("--profile", help="directory for per-request cProfile dumps of the server")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="chatbot-bench-")
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = args.db or os.path.join(workdir, "bench.db")
+    os.environ["LEAD_SPOOL_DIR"] = os.path.join(workdir, "spool")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db")
+    os.environ.setdefault("MYSQL_POOL_SIZE", str(args.concurrency))
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+    import migrations
+    from werkzeug.serving import make_server
+
+    conn = app.DatabaseManager.create_connection()
+    try:
+        migrations.migrate(conn, app.db_backend)
+    finally:
+        conn.close()
+
+    print(f"Seeding {args.chatbots} chatbots x {args.leads} leads into {os.environ['SQLITE_PATH']} ...")
+    seed(app, args.chatbots, args.leads)
+
+    wsgi_app = app.app
+    if args.profile:
+        from werkzeug.middleware.profiler import ProfilerMiddleware
+        os.makedirs(args.profile, exist_ok=True)
+        wsgi_app = ProfilerMiddleware(app.app, stream=None, profile_dir=args.profile)
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, wsgi_app, threaded=True)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    bots = [f"bench{b:04d}" for b in range(args.chatbots)]
+    scenarios = [
+        ("chat/greeting", lambda s, u, i: s.post(f"{u}/api/chat", json={
+            "chatbot_id": bots[i % len(bots)], "message": "hello", "session_id": f"bench-{i % 50}"})),
+        ("chat/contact", lambda s, u, i: s.post(f"{u}/api/chat", json={
+            "chatbot_id": bots[i % len(bots)], "message": "what is your email?"})),
+        ("lead/capture", lambda s, u, i: s.post(f"{u}/api/lead/capture", json={
+            "chatbot_id": bots[i % len(bots)], "company_name": "Bench", "session_id": f"cap-{i}",
+            "conversation": [{"role": "user", "content": "hi"}], "email": "lead@example.com"})),
+        ("leads/page", lambda s, u, i: s.get(f"{u}/api/leads", params={"chatbot_id": bots[i % len(bots)], "limit": 50})),
+        ("stats", lambda s, u, i: s.get(f"{u}/api/stats", params={"chatbot_id": bots[i % len(bots)]})),
+        ("stats/all", lambda s, u, i: s.get(f"{u}/api/stats", params={"group_by": "chatbot", "interval": "day"})),
+    ]
+
+    print(f"\n{args.requests} requests per scenario, concurrency {args.concurrency}\n")
+    for name, make_request in scenarios:
+        run_scenario(base_url, name, make_request, args.requests, args.concurrency)
+    if args.profile:
+        print(f"\nProfiles written to {args.profile} (inspect with: python -m pstats <file>)")
+
+    app.lead_writer.flush(30)
+    app.message_writer.flush(30)
+    print(f"\nPool: {app.DatabaseManager.pool_stats()}")
+    print(f"Chatbot cache: {app.chatbot_cache.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
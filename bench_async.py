@@ -0,0 +1,149 @@
+"""
+Chat throughput: gunicorn (sync workers) vs uvicorn (asgi.py)
+Both servers run against a local fake OpenRouter that answers after a fixed
+delay, so the numbers show how many slow LLM calls each mode keeps in flight
+rather than how fast the real provider is.
+
+    python bench_async.py --requests 400 --concurrency 200 --llm-latency 1.0
+    python bench_async.py --modes uvicorn      # only one of them
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from bench_api import percentile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def fake_openrouter(latency):
+    """Threaded stand-in for the chat completions endpoint"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            body = json.dumps({"choices": [{"message": {"content": "We build widgets and offer support."}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base_url, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def run(base_url, chatbot_id, total, concurrency):
+    session_local = threading.local()
+
+    def one(i):
+        session = getattr(session_local, 'session', None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        t0 = time.perf_counter()
+        # Unique questions so every request really reaches the (fake) model
+        resp = session.post(f"{base_url}/api/chat", json={"chatbot_id": chatbot_id, "message": f"question {i} about widgets"})
+        return time.perf_counter() - t0, resp.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+    latencies = [r[0] * 1000 for r in results]
+    errors = sum(1 for r in results if r[1] >= 400)
+    return total / wall, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="seconds the fake OpenRouter takes per call")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn sync workers")
+    parser.add_argument("--modes", default="gunicorn,uvicorn")
+    args = parser.parse_args()
+
+    llm = fake_openrouter(args.llm_latency)
+    workdir = tempfile.mkdtemp(prefix="chatbot-bench-async-")
+    env = dict(os.environ,
+               DB_BACKEND="sqlite",
+               SQLITE_PATH=os.path.join(workdir, "bench.db"),
+               LEAD_SPOOL_DIR=os.path.join(workdir, "spool"),
+               OPENROUTER_API_KEY="bench",
+               OPENROUTER_API_BASE=f"http://127.0.0.1:{llm.server_port}/chat/completions",
+               LLM_CACHE_BACKEND="memory",
+               LLM_HTTP_POOL_SIZE=str(args.concurrency),
+               SEMANTIC_CACHE_THRESHOLD="2")  # > 1: never a semantic hit
+
+    # Seed one chatbot in a child process so this one stays free of app.py's globals
+    subprocess.run([sys.executable, "-c",
+                    "import app, migrations\n"
+                    "conn = app.DatabaseManager.create_connection(); migrations.migrate(conn, app.db_backend); conn.close()\n"
+                    "app.DatabaseManager.save_chatbot('benchasync', 'Example Co', 'https://example.com',"
+                    " [{'url': 'https://example.com', 'content': 'Example Co builds widgets. ' * 40}],"
+                    " {'emails': [], 'phones': []}, '')"],
+                   cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    commands = {
+        "gunicorn": lambda port: [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "-b", f"127.0.0.1:{port}",
+                                  "--log-level", "warning", "app:app"],
+        "uvicorn": lambda port: [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+                                 "--log-level", "warning"],
+    }
+
+    print(f"{args.requests} chat requests, concurrency {args.concurrency}, LLM latency {args.llm_latency:.2f}s\n")
+    for mode in args.modes.split(","):
+        port = free_port()
+        proc = subprocess.Popen(commands[mode](port), cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_ready(base_url, proc)
+            rps, latencies, errors = run(base_url, "benchasync", args.requests, args.concurrency)
+            print(f"{mode:<10} {rps:>8.1f} req/s   p50 {percentile(latencies, 50):8.1f} ms   "
+                  f"p95 {percentile(latencies, 95):8.1f} ms   p99 {percentile(latencies, 99):8.1f} ms   errors {errors}")
+        finally:
+            proc.terminate()
+            proc.wait(10)
+    llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
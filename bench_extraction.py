@@ -0,0 +1,179 @@
+"""
+Page extraction benchmark: lxml one-pass path vs BeautifulSoup html.parser
+Runs both engines of extraction.Extractor over a fixture corpus, using the
+app.py and app_complete.py page layouts. It reports time per page, peak
+memory per page (tracemalloc) and how often the two engines produce the
+same text. tracemalloc only sees Python allocations; libxml2 builds its
+tree with malloc, so the lxml figures cover the Python side only (the
+tree is freed as soon as each extraction returns).
+
+Differences in the text come from malformed markup, where the two parsers
+build different trees. For example, html.parser nests unclosed <p> and
+<li> tags inside each other, and libxml2 closes them.
+
+    python bench_extraction.py                     # generated corpus of 60 pages
+    python bench_extraction.py --pages 200 --seed 7
+    python bench_extraction.py --corpus saved_pages/   # every *.html file in a directory
+"""
+import argparse
+import glob
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+from bench_api import percentile
+from extraction import Extractor
+
+LAYOUTS = {
+    "app": {},
+    "complete": dict(title_label="PAGE TITLE", desc_label="DESCRIPTION", heading_tags=("h1", "h2", "h3", "h4"),
+                     max_headings=None, max_paragraphs=30, max_lists=10, max_items=15, max_tables=3, max_rows=10,
+                     sections=True, drop_tags=("script", "style", "nav", "footer", "header", "iframe", "noscript"),
+                     max_chars=8000),
+}
+
+WORDS = ("service pricing support team customer plan office hours delivery quality install repair consult "
+         "project design garden kitchen roof window solar energy insurance dental clinic booking estimate "
+         "warranty local family trusted certified emergency weekend appointment").split()
+
+
+def sentence(rng, words):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def inline(rng, words):
+    """A run of text with the inline markup real pages are full of"""
+    parts = []
+    for _ in range(max(1, words // 8)):
+        piece = sentence(rng, 8)
+        kind = rng.random()
+        if kind < 0.15:
+            piece = f'<a href="/{rng.choice(WORDS)}">{piece}</a>'
+        elif kind < 0.25:
+            piece = f"<strong>{piece}</strong>"
+        elif kind < 0.3:
+            piece = f"{piece}&nbsp;&amp; <em>more</em><br>"
+        parts.append(piece)
+    return " ".join(parts)
+
+
+def fixture_page(rng, sections):
+    """One synthetic small-business page: head scripts and styles, header/nav, content sections
+    with lists and tables, comments, noscript, an iframe and a link-heavy footer"""
+    title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} Co"
+    nav = "".join(f'<li><a href="/{w}">{w.title()}</a></li>' for w in rng.sample(WORDS, 12))
+    out = [
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\">",
+        f"<title>{title} | Home</title>",
+        f'<meta name="description" content="{sentence(rng, 20)}">',
+        '<meta name="viewport" content="width=device-width">',
+        "<style>" + "".join(f".c{i}{{margin:{i}px;padding:0}}" for i in range(rng.randint(50, 400))) + "</style>",
+        "<script>window.__DATA__=" + repr([sentence(rng, 6) for _ in range(rng.randint(20, 200))]) + ";</script>",
+        "</head><body>",
+        f'<header><div class="logo">{title}</div><nav><ul>{nav}</ul></nav></header>',
+        "<!-- main content -->",
+        f"<main><h1>{title}</h1>",
+    ]
+    for s in range(sections):
+        out.append(f"<section><h2>{sentence(rng, 3)}</h2>")
+        for _ in range(rng.randint(1, 4)):
+            out.append(f"<p>{inline(rng, rng.randint(10, 80))}</p>")
+        if rng.random() < 0.3:
+            out.append("<h3></h3><p>Short.</p>")
+        if rng.random() < 0.5:
+            items = "".join(f"<li>{inline(rng, rng.randint(3, 15))}</li>" for _ in range(rng.randint(3, 12)))
+            nested = "<li>Options<ul><li>Standard package</li><li>Premium package</li></ul></li>" if rng.random() < 0.3 else ""
+            out.append(f"<ul>{items}{nested}</ul>")
+        if rng.random() < 0.25:
+            rows = "".join(f"<tr><td>{rng.choice(WORDS).title()}</td><td>${rng.randint(10, 900)}</td><td></td></tr>"
+                           for _ in range(rng.randint(3, 15)))
+            out.append(f"<table><thead><tr><th>Item</th><th>Price</th></tr></thead><tbody>{rows}</tbody></table>")
+        if rng.random() < 0.1:
+            out.append(f"<h4>{sentence(rng, 4)}</h4><div><p>{sentence(rng, 12)}</p></div>")
+        out.append("</section>")
+    out.append('<noscript><p>Please enable JavaScript to use the booking widget.</p></noscript>')
+    out.append('<iframe src="https://maps.example.com/embed"><p>Map of our office location.</p></iframe></main>')
+    footer_links = "".join(f'<li><a href="/{w}" rel="nofollow">{w.title()}</a></li>' for w in rng.sample(WORDS, 15))
+    out.append(f"<footer><h3>Contact</h3><p>{sentence(rng, 15)}</p><ul>{footer_links}</ul></footer>")
+    out.append("<script>" + "function f(){return 1}" * rng.randint(50, 500) + "</script></body></html>")
+    return "\n".join(out)
+
+
+def fixture_corpus(pages, seed):
+    rng = random.Random(seed)
+    return [fixture_page(rng, rng.choice((2, 4, 8, 16, 30))) for _ in range(pages)]
+
+
+def load_corpus(directory):
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.htm*"))):
+        with open(path, "rb") as f:
+            corpus.append(f.read().decode("utf-8", errors="replace"))
+    return corpus
+
+
+def measure(extractor, corpus, repeat):
+    """(per-page seconds, per-page tracemalloc peaks in bytes, outputs)"""
+    times, outputs = [], []
+    for html in corpus:
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = extractor.extract(html)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best)
+        outputs.append(result)
+
+    # Separate pass: tracing allocations slows everything down, so it is not timed
+    peaks = []
+    for html in corpus:
+        tracemalloc.start()
+        extractor.extract(html)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return times, peaks, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60, help="size of the generated corpus")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--corpus", help="directory of saved .html pages to use instead")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per page (best is kept)")
+    parser.add_argument("--layouts", default="app,complete")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else fixture_corpus(args.pages, args.seed)
+    if not corpus:
+        parser.error("empty corpus")
+    sizes = [len(html.encode("utf-8")) for html in corpus]
+    print(f"Corpus: {len(corpus)} pages, {sum(sizes) / 1024:.0f} KB total, "
+          f"median {statistics.median(sizes) / 1024:.0f} KB, largest {max(sizes) / 1024:.0f} KB")
+
+    for layout in args.layouts.split(","):
+        results = {}
+        for engine in ("bs4", "lxml"):
+            results[engine] = measure(Extractor(engine=engine, **LAYOUTS[layout]), corpus, args.repeat)
+
+        print(f"\n[{layout} layout]")
+        print(f"{'engine':<6} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'pages/s':>9} {'peak KB avg':>12} {'peak KB max':>12}")
+        for engine, (times, peaks, _) in results.items():
+            ms = [t * 1000 for t in times]
+            print(f"{engine:<6} {statistics.mean(ms):>9.2f} {percentile(ms, 50):>8.2f} {percentile(ms, 95):>8.2f} "
+                  f"{len(times) / sum(times):>9.0f} {statistics.mean(peaks) / 1024:>12.0f} {max(peaks) / 1024:>12.0f}")
+
+        bs4_times, bs4_peaks, bs4_out = results["bs4"]
+        lxml_times, lxml_peaks, lxml_out = results["lxml"]
+        same_text = sum(a[0] == b[0] for a, b in zip(bs4_out, lxml_out))
+        same_links = sum(a[1] == b[1] for a, b in zip(bs4_out, lxml_out))
+        print(f"speedup {sum(bs4_times) / sum(lxml_times):.1f}x, "
+              f"Python heap peak {statistics.mean(bs4_peaks) / statistics.mean(lxml_peaks):.1f}x lower; "
+              f"identical text {same_text}/{len(corpus)}, identical links {same_links}/{len(corpus)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+Caches
+LRU + TTL cache with an optional memory bound, used to keep hot records
+(e.g. parsed chatbot rows) out of the database round trip, and the LLM
+response caches (per-process or shared across workers through SQLite).
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL, entry/byte bounds and negative caching"""
+
+    def __init__(self, max_entries=1000, max_bytes=None, ttl=300, negative_ttl=30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value, None for a cached negative entry, or MISSING"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value, size=0, ttl=None):
+        if ttl is None:
+            ttl = self.ttl
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Never let a single oversized record flush the whole cache
+            self.invalidate(key)
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or
+                                  (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def set_missing(self, key):
+        """Remember that key does not exist, for negative_ttl seconds"""
+        self.set(key, None, ttl=self.negative_ttl)
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0
+            }
+
+
+def response_key(namespace, version, prompt):
+    """Full-length digest of the prompt, scoped to a namespace (chatbot) version"""
+    digest = hashlib.sha256()
+    digest.update(f"{namespace}\0{version}\0".encode('utf-8'))
+    digest.update(prompt.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MemoryResponseCache:
+    """Per-process LLM response cache; each worker keeps its own copy"""
+
+    backend = 'memory'
+
+    def __init__(self, max_entries=5000, ttl=86400):
+        self._entries = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, prompt):
+        return self._entries.get(response_key(namespace, self._versions.get(namespace, 0), prompt))
+
+    def set(self, namespace, prompt, value):
+        self._entries.set(response_key(namespace, self._versions.get(namespace, 0), prompt), value)
+
+    def acquire_lease(self, namespace, prompt, ttl):
+        """Leases only coordinate workers through a shared backend; a local cache always leads"""
+        return True
+
+    def release_lease(self, namespace, prompt):
+        pass
+
+    def wait_for(self, namespace, prompt, timeout):
+        return MISSING
+
+    def invalidate_namespace(self, namespace):
+        """Orphan every cached response for namespace; the stale entries age out of the LRU"""
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def stats(self):
+        stats = self._entries.stats()
+        return {
+            "backend": self.backend,
+            "entries": stats["entries"],
+            "max_entries": stats["max_entries"],
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "evictions": stats["evictions"],
+            "errors": 0,
+            "hit_rate": stats["hit_rate"]
+        }
+
+
+class SQLiteResponseCache:
+    """LLM response cache in a local SQLite file (WAL), shared by every worker on the host.
+    Eviction is approximate LRU: last_used is refreshed at most once per touch_interval,
+    and the table is trimmed back to max_entries every prune_every writes."""
+
+    backend = 'sqlite'
+
+    def __init__(self, path, max_entries=5000, ttl=86400, touch_interval=60, prune_every=32):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self.prune_every = prune_every
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS namespaces (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, pid INTEGER NOT NULL, expires_at REAL NOT NULL)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _version(self, conn, namespace):
+        row = conn.execute("SELECT version FROM namespaces WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, namespace, prompt):
+        now = time.time()
+        try:
+            conn = self._conn()
+            key = response_key(namespace, self._version(conn, namespace), prompt)
+            row = conn.execute("SELECT value, expires_at, last_used FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                self._count('misses')
+                return MISSING
+            if now - row[2] > self.touch_interval:
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"[Cache] Response cache read failed: {e}")
+            self._count('errors')
+            self._count('misses')
+            return MISSING
+        self._count('hits')
+        return row[0]
+
+    def set(self, namespace, prompt, value):
+        now = time.time()
+        try:
+            conn = self._conn()
+            key = response_key(namespace, self._version(conn, namespace), prompt)
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now)
+            )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % self.prune_every == 0
+            if prune:
+                self._prune(conn, now)
+        except sqlite3.Error as e:
+            print(f"[Cache] Response cache write failed: {e}")
+            self._count('errors')
+
+    def _prune(self, conn, now):
+        removed = conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,)).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (excess,)
+            ).rowcount
+        with self._lock:
+            self.evictions += removed
+
+    def acquire_lease(self, namespace, prompt, ttl):
+        """Claim the right to compute this response for ttl seconds. Returns False while
+        another worker holds an unexpired lease; errors fail open (we compute it ourselves)."""
+        now = time.time()
+        try:
+            conn = self._conn()
+            key = response_key(namespace, self._version(conn, namespace), prompt)
+            cursor = conn.execute(
+                "INSERT INTO leases (key, pid, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET pid = excluded.pid, expires_at = excluded.expires_at "
+                "WHERE leases.expires_at <= ?",
+                (key, os.getpid(), now + ttl, now)
+            )
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"[Cache] Lease acquire failed: {e}")
+            self._count('errors')
+            return True
+
+    def release_lease(self, namespace, prompt):
+        try:
+            conn = self._conn()
+            key = response_key(namespace, self._version(conn, namespace), prompt)
+            conn.execute("DELETE FROM leases WHERE key = ? AND pid = ?", (key, os.getpid()))
+        except sqlite3.Error as e:
+            print(f"[Cache] Lease release failed: {e}")
+            self._count('errors')
+
+    def wait_for(self, namespace, prompt, timeout, poll=0.05):
+        """Poll for a response another worker is computing. Returns it, or MISSING if the
+        lease is released or expires without a result, or timeout passes."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(poll)
+            try:
+                conn = self._conn()
+                key = response_key(namespace, self._version(conn, namespace), prompt)
+                row = conn.execute("SELECT value FROM responses WHERE key = ? AND expires_at > ?",
+                                   (key, time.time())).fetchone()
+                if row is not None:
+                    self._count('hits')
+                    return row[0]
+                lease = conn.execute("SELECT expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+                if lease is None or lease[0] <= time.time():
+                    return MISSING
+            except sqlite3.Error as e:
+                print(f"[Cache] Lease wait failed: {e}")
+                self._count('errors')
+                return MISSING
+        return MISSING
+
+    def invalidate_namespace(self, namespace):
+        """Bump the namespace version so every worker stops seeing its old responses"""
+        try:
+            self._conn().execute(
+                "INSERT INTO namespaces (namespace, version) VALUES (?, 1) "
+                "ON CONFLICT(namespace) DO UPDATE SET version = version + 1",
+                (namespace,)
+            )
+        except sqlite3.Error as e:
+            print(f"[Cache] Response cache invalidation failed: {e}")
+            self._count('errors')
+
+    def stats(self):
+        try:
+            entries = self._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0
+            }
+
+
+def create_response_cache():
+    """LLM_CACHE_BACKEND=sqlite (default, shared by all workers) or memory"""
+    backend = os.getenv('LLM_CACHE_BACKEND', 'sqlite').strip().lower()
+    max_entries = int(os.getenv('LLM_CACHE_SIZE', '5000'))
+    ttl = int(os.getenv('LLM_CACHE_TTL', '86400'))
+    if backend == 'memory':
+        return MemoryResponseCache(max_entries=max_entries, ttl=ttl)
+    if backend != 'sqlite':
+        raise ValueError(f"Unknown LLM_CACHE_BACKEND '{backend}' (expected 'sqlite' or 'memory')")
+    return SQLiteResponseCache(os.getenv('LLM_CACHE_PATH', 'llm_cache.db'), max_entries=max_entries, ttl=ttl)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key: one caller (the leader) runs the
+    function, everyone else arriving meanwhile waits for and shares its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> [done event, result, exception]
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = [threading.Event(), None, None]
+                self.leaders += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1]
+
+        try:
+            call[1] = fn()
+            return call[1]
+        except Exception as e:
+            call[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call[0].set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced
+            }
@@ -0,0 +1,92 @@
+"""
+Compressed storage for scraped pages
+Layout (format version 1):
+    1 byte   version
+    4 bytes  page count N (big endian)
+    4*N      compressed length of each page
+    ...      N zlib frames, each the JSON of one page
+
+Pages are compressed independently, so readers only inflate the pages
+they touch. Rows written before compression (plain JSON text) are still
+readable.
+"""
+import json
+import struct
+import zlib
+
+FORMAT_VERSION = 1
+COMPRESS_LEVEL = 6
+
+
+def pack_pages(pages, frames=None):
+    """frames optionally maps a page's position to its already-compressed frame
+    (PackedPages.frame), which is copied instead of compressing the page again"""
+    frames = [frames[i] if frames and i in frames else zlib.compress(json.dumps(page).encode('utf-8'), COMPRESS_LEVEL)
+              for i, page in enumerate(pages)]
+    header = struct.pack(f">BI{len(frames)}I", FORMAT_VERSION, len(frames), *(len(f) for f in frames))
+    return header + b''.join(frames)
+
+
+def is_packed(value):
+    return isinstance(value, (bytes, bytearray)) and len(value) >= 5 and value[0] == FORMAT_VERSION
+
+
+class PackedPages:
+    """Read-only sequence over a packed blob; each page is inflated on first access"""
+
+    def __init__(self, blob):
+        blob = bytes(blob)
+        version, count = struct.unpack_from(">BI", blob, 0)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported scraped content format {version}")
+        lengths = struct.unpack_from(f">{count}I", blob, 5)
+        self._blob = blob
+        self._offsets = []
+        offset = 5 + 4 * count
+        for length in lengths:
+            self._offsets.append((offset, length))
+            offset += length
+        self._pages = [None] * count
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __bool__(self):
+        return bool(self._offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        page = self._pages[index]
+        if page is None:
+            offset, length = self._offsets[index]
+            page = json.loads(zlib.decompress(self._blob[offset:offset + length]))
+            self._pages[index] = page
+        return page
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def frame(self, index):
+        """The compressed bytes of one page, as stored"""
+        offset, length = self._offsets[index]
+        return self._blob[offset:offset + length]
+
+    @property
+    def packed_size(self):
+        return len(self._blob)
+
+    def to_list(self):
+        return list(self)
+
+
+def load_pages(value):
+    """Decode a scraped_content column value: packed blob, legacy JSON text, or NULL"""
+    if value is None:
+        return []
+    if is_packed(value):
+        return PackedPages(value)
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value).decode('utf-8')
+    return json.loads(value) if value else []
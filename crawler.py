@@ -0,0 +1,304 @@
+"""
+Crawl frontier
+Discovers a site's pages from robots.txt, its sitemaps and same-origin links
+instead of guessing paths, and crawls them best-first within a page, byte
+and time budget, honouring robots rules and Crawl-delay.
+
+Crawler.plan() holds all crawl decisions as a generator that yields batches
+of URLs and is sent back their fetch results; fetch_engine.py drives it from
+both synchronous and asyncio code.
+"""
+import hashlib
+import heapq
+import re
+import time
+import xml.etree.ElementTree as ElementTree
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|source)$", re.I)
+SKIP_EXTENSIONS = re.compile(
+    r"\.(pdf|jpe?g|png|gif|svg|webp|ico|css|js|json|xml|zip|gz|rar|mp3|mp4|avi|mov|woff2?|ttf|eot|docx?|xlsx?|pptx?)$",
+    re.I)
+# Paths that usually answer what visitors ask, and paths that rarely do
+VALUABLE_PATHS = re.compile(r"about|service|product|pricing|price|plan|contact|faq|feature|solution|team|company|"
+                            r"support|help|location|hours|menu|shop", re.I)
+LOW_VALUE_PATHS = re.compile(r"blog/.|news/.|/tag/|/category/|/author/|/page/\d|login|signin|sign-in|register|"
+                             r"cart|checkout|account|privacy|terms|cookie|legal|wp-|feed|search", re.I)
+
+CRAWL_DELAY_RE = re.compile(r"^\s*crawl-delay\s*:\s*(\d+(?:\.\d+)?)", re.I | re.M)
+
+SITEMAP_BYTES = 1024 * 1024
+PAGE_BYTES = 512 * 1024
+
+
+def normalize_url(url, base=None):
+    """Canonical absolute http(s) URL without fragment, default port, tracking parameters
+    or trailing slash; None for anything that is not a crawlable web page"""
+    try:
+        parts = urlsplit(urljoin(base, url.strip()) if base else url.strip())
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return None
+        host = parts.hostname.lower()
+        port = parts.port
+    except ValueError:
+        return None
+    if port and port != {"http": 80, "https": 443}[parts.scheme]:
+        host = f"{host}:{port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if SKIP_EXTENSIONS.search(path):
+        return None
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(k)))
+    return urlunsplit((parts.scheme, host, path, query, ""))
+
+
+def site_key(url):
+    """Host without a leading www., for same-site checks"""
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def url_priority(url, depth):
+    """Lower is crawled sooner: shallow pages first, likely-useful paths ahead of archives"""
+    path = urlsplit(url).path
+    score = depth * 10
+    if VALUABLE_PATHS.search(path):
+        score -= 6
+    if LOW_VALUE_PATHS.search(path):
+        score += 8
+    if urlsplit(url).query:
+        score += 3
+    return score + path.count("/")
+
+
+class FetchResult:
+    """One HTTP response as the crawler sees it"""
+
+    def __init__(self, url, status, text, content_type="", nbytes=0, elapsed=0.0, headers=None):
+        self.url = url  # after redirects
+        self.status = status
+        self.text = text
+        self.content_type = content_type
+        self.nbytes = nbytes
+        self.elapsed = elapsed
+        self.headers = headers or {}
+
+    @property
+    def is_html(self):
+        return self.status == 200 and ("html" in self.content_type.lower() or not self.content_type)
+
+
+def validators(result):
+    """The response's ETag / Last-Modified as page fields, for conditional re-fetches"""
+    headers = {k.lower(): v for k, v in result.headers.items()}
+    return {field: headers[header] for field, header in (("etag", "etag"), ("last_modified", "last-modified"))
+            if headers.get(header)}
+
+
+def conditional_headers(etag=None, last_modified=None):
+    """Request headers that let the server answer 304 Not Modified"""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def parse_sitemap(text):
+    """(page URLs with their <priority>, nested sitemap URLs) from a sitemap or sitemap index"""
+    try:
+        root = ElementTree.fromstring(text.encode("utf-8"))
+    except ElementTree.ParseError:
+        return [], []
+    pages, sitemaps = [], []
+    for node in root:
+        tag = node.tag.rsplit("}", 1)[-1]
+        fields = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in node}
+        if not fields.get("loc"):
+            continue
+        if tag == "sitemap":
+            sitemaps.append(fields["loc"])
+        elif tag == "url":
+            try:
+                priority = float(fields.get("priority") or 0.5)
+            except ValueError:
+                priority = 0.5
+            pages.append((fields["loc"], priority))
+    return pages, sitemaps
+
+
+class Crawler:
+    """Bounded best-first crawl of one site"""
+
+    def __init__(self, parse, max_pages=15, max_bytes=3 * 1024 * 1024, time_budget=20.0, max_depth=3,
+                 concurrency=4, page_bytes=PAGE_BYTES, max_crawl_delay=5.0, max_sitemaps=3,
+                 user_agent="*", progress_callback=None):
+        self.parse = parse  # (url, html) -> (page dict or None, links)
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.page_bytes = page_bytes
+        self.max_crawl_delay = max_crawl_delay
+        self.max_sitemaps = max_sitemaps
+        self.user_agent = user_agent
+        self.progress_callback = progress_callback
+
+        self.deadline = None
+        self.bytes = 0
+        self.report = {}
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic()) if self.deadline else self.time_budget
+
+    def page_limit(self):
+        """Bytes the next page may use, so no single response overruns the byte budget"""
+        return max(1, min(self.page_bytes, self.max_bytes - self.bytes))
+
+    def _exhausted(self, pages):
+        if len(pages) >= self.max_pages:
+            return "page budget"
+        if self.bytes >= self.max_bytes:
+            return "byte budget"
+        if self.remaining() <= 0:
+            return "time budget"
+        return None
+
+    def plan(self, base_url):
+        """The crawl as a generator: yields (urls, delay, max_bytes) - fetch these, after sleeping
+        delay seconds, reading at most max_bytes each and giving up after self.remaining()
+        seconds - and expects their FetchResults (None on failure) sent back in order.
+        Returns the crawled pages, best first; self.report describes the crawl."""
+        started = time.monotonic()
+        self.deadline = started + self.time_budget
+        self.bytes = 0
+        if not base_url.startswith("http"):
+            base_url = "https://" + base_url
+        root = normalize_url(base_url)
+        site = site_key(root)
+        origin = urlunsplit(urlsplit(root)[:2] + ("", "", ""))
+        report = self.report = {"pages": 0, "fetched": 0, "failed": 0, "robots_disallowed": 0,
+                                "duplicates": 0, "sitemap_urls": 0, "bytes": 0, "crawl_delay": 0,
+                                "stopped": "frontier exhausted", "elapsed_ms": 0}
+
+        # robots.txt: access rules, Crawl-delay and sitemap locations
+        robots = RobotFileParser()
+        (result,) = yield [origin + "/robots.txt"], 0, SITEMAP_BYTES
+        self._account(result)
+        if result is not None and result.status == 200:
+            robots.parse(result.text.splitlines())
+        else:
+            robots.parse([])
+        delay = robots.crawl_delay(self.user_agent)
+        if delay is None and result is not None and result.status == 200:
+            # robotparser only understands whole seconds; plenty of sites write "Crawl-delay: 0.5"
+            match = CRAWL_DELAY_RE.search(result.text)
+            delay = float(match.group(1)) if match else 0
+        delay = min(self.max_crawl_delay, float(delay or 0))
+        report["crawl_delay"] = delay
+        concurrency = 1 if delay else self.concurrency
+
+        frontier, seen, order = [], set(), 0
+
+        def push(url, depth, bonus=0.0):
+            nonlocal order
+            if url is None or url in seen or site_key(url) != site or depth > self.max_depth:
+                return False
+            seen.add(url)
+            order += 1
+            heapq.heappush(frontier, (url_priority(url, depth) - bonus, order, url, depth))
+            return True
+
+        push(root, 0, bonus=100)
+
+        # Sitemaps named in robots.txt, else the conventional location; one level of sitemap indexes
+        sitemap_queue = list(robots.site_maps() or [origin + "/sitemap.xml"])[:self.max_sitemaps]
+        fetched_sitemaps = 0
+        while sitemap_queue and fetched_sitemaps < self.max_sitemaps and not self._exhausted([]):
+            batch = sitemap_queue[:self.max_sitemaps - fetched_sitemaps]
+            sitemap_queue = sitemap_queue[len(batch):]
+            fetched_sitemaps += len(batch)
+            results = yield batch, delay, SITEMAP_BYTES
+            for result in results:
+                self._account(result)
+                if result is None or result.status != 200:
+                    continue
+                urls, nested = parse_sitemap(result.text)
+                sitemap_queue.extend(nested)
+                for loc, priority in urls:
+                    # Sitemap pages are one click from home; <priority> breaks ties
+                    if push(normalize_url(loc), 1, bonus=priority * 4):
+                        report["sitemap_urls"] += 1
+
+        pages, hashes = [], set()
+        while frontier:
+            stop = self._exhausted(pages)
+            if stop:
+                report["stopped"] = stop
+                break
+            batch = []
+            while frontier and len(batch) < min(concurrency, self.max_pages - len(pages)):
+                _, _, url, depth = heapq.heappop(frontier)
+                if not robots.can_fetch(self.user_agent, url):
+                    report["robots_disallowed"] += 1
+                    continue
+                batch.append((url, depth))
+            if not batch:
+                continue
+            results = yield [url for url, _ in batch], delay, self.page_limit()
+
+            for (url, depth), result in zip(batch, results):
+                self._account(result)
+                kept = False
+                if result is not None and result.is_html:
+                    final_url = normalize_url(result.url) or url
+                    if site_key(final_url) == site:
+                        seen.add(final_url)
+                        page, links = self.parse(final_url, result.text)
+                        for link in links:
+                            push(normalize_url(link, final_url), depth + 1)
+                        if page:
+                            digest = hashlib.sha1(page["content"].encode("utf-8")).digest()
+                            if digest in hashes:
+                                report["duplicates"] += 1
+                            elif len(pages) < self.max_pages:
+                                hashes.add(digest)
+                                page.update(validators(result))
+                                pages.append(page)
+                                kept = True
+                if self.progress_callback:
+                    self.progress_callback(len(pages), max(1, len(pages), min(self.max_pages, len(pages) + len(frontier))),
+                                           url, {
+                                               "status": result.status if result is not None else None,
+                                               "bytes": result.nbytes if result is not None else 0,
+                                               "ms": round(result.elapsed * 1000) if result is not None else None,
+                                               "kept": kept,
+                                               "queued": len(frontier),
+                                               "elapsed_ms": round((time.monotonic() - started) * 1000)
+                                           })
+
+        report["pages"] = len(pages)
+        report["bytes"] = self.bytes
+        report["elapsed_ms"] = round((time.monotonic() - started) * 1000)
+        return pages
+
+    def _account(self, result):
+        if result is None:
+            self.report["failed"] += 1
+            return
+        self.report["fetched"] += 1
+        self.bytes += result.nbytes
+
+    @staticmethod
+    def advance(steps, results):
+        """steps.send(results) as (next batch, None), or (None, pages) once the crawl is over.
+        Drivers use this rather than catching StopIteration, which cannot cross a Future."""
+        try:
+            return steps.send(results), None
+        except StopIteration as done:
+            return None, done.value
@@ -18,7 +18,8 @@ CREATE TABLE IF NOT EXISTS leads (
     company_name VARCHAR(255),
     session_id VARCHAR(255),
     questions_asked INT DEFAULT 0,
-    INDEX idx_chatbot_id (chatbot_id),
+    INDEX idx_leads_chatbot_timestart (chatbot_id, timestart, userid),
+    INDEX idx_leads_timestart (timestart, userid),
     INDEX idx_mailid (mailid),
     INDEX idx_session_id (session_id)
 );
@@ -31,7 +32,41 @@ CREATE TABLE IF NOT EXISTS chatbots (
     website_url TEXT NOT NULL,
     embed_code TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    INDEX idx_chatbot_id (chatbot_id)
+    INDEX idx_chatbots_created_at (created_at, id)
+);
+
+-- Create messages table (one row per chat turn, appended as the chat happens)
+CREATE TABLE IF NOT EXISTS messages (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    session_id VARCHAR(255) NOT NULL,
+    chatbot_id VARCHAR(255),
+    role VARCHAR(20) NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_session_id_id (session_id, id)
+);
+
+-- Create faq_answers table (precomputed answers to each chatbot's likely questions)
+CREATE TABLE IF NOT EXISTS faq_answers (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    chatbot_id VARCHAR(255) NOT NULL,
+    question VARCHAR(255) NOT NULL,
+    answer TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_faq_answers_chatbot_id (chatbot_id, id)
+);
+
+-- Create scraped_pages table (per-page ETag / Last-Modified and content hash for incremental refresh)
+CREATE TABLE IF NOT EXISTS scraped_pages (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    chatbot_id VARCHAR(255) NOT NULL,
+    url_hash CHAR(40) NOT NULL,
+    url TEXT NOT NULL,
+    etag VARCHAR(255),
+    last_modified VARCHAR(64),
+    content_hash CHAR(40) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_scraped_pages_chatbot_url (chatbot_id, url_hash)
 );
 
 -- Show tables
@@ -40,3 +75,6 @@ SHOW TABLES;
 -- Describe tables structure
 DESCRIBE leads;
 DESCRIBE chatbots;
+DESCRIBE messages;
+DESCRIBE faq_answers;
+DESCRIBE scraped_pages;
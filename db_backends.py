@@ -0,0 +1,282 @@
+"""
+Storage backends for DatabaseManager
+DB_BACKEND=mysql (default) uses mysql.connector; DB_BACKEND=sqlite uses a
+local SQLite file in WAL mode so the API can run and be load-tested on a
+single machine without a MySQL server. Queries are written once with %s
+placeholders; each backend supplies the few dialect-specific fragments.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+try:
+    import mysql.connector
+    from mysql.connector import Error as MySQLError
+except ImportError:  # SQLite-only installs
+    mysql = None
+    MySQLError = None
+
+# Catch-all for DatabaseManager's `except Error` blocks, whichever backend is active.
+# It is a tuple: add other exceptions with `except Error + (Other,)`, never `except (Error, Other)`.
+Error = tuple(e for e in (MySQLError, sqlite3.Error) if e is not None)
+
+
+# Baseline schema, applied as migration 1; later changes belong in migrations.py
+MYSQL_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS leads (
+        userid INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(255) NOT NULL,
+        mailid VARCHAR(255),
+        phonenumber VARCHAR(100),
+        conversation TEXT,
+        timestart TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        timeend TIMESTAMP NULL,
+        chatbot_id VARCHAR(255),
+        company_name VARCHAR(255),
+        session_id VARCHAR(255),
+        questions_asked INT DEFAULT 0,
+        INDEX idx_chatbot_id (chatbot_id),
+        INDEX idx_mailid (mailid),
+        INDEX idx_session_id (session_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chatbots (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        chatbot_id VARCHAR(255) UNIQUE NOT NULL,
+        company_name VARCHAR(255) NOT NULL,
+        website_url TEXT NOT NULL,
+        scraped_content MEDIUMBLOB,
+        contact_info TEXT,
+        embed_code TEXT,
+        status VARCHAR(50) DEFAULT 'active',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_chatbot_id (chatbot_id)
+    )
+    """,
+    # One row per chat turn, appended as the conversation happens
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        session_id VARCHAR(255) NOT NULL,
+        chatbot_id VARCHAR(255),
+        role VARCHAR(20) NOT NULL,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+        INDEX idx_session_id_id (session_id, id)
+    )
+    """
+]
+
+# Same tables for SQLite; index names are database-wide there, so they carry the table name
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS leads (
+        userid INTEGER PRIMARY KEY AUTOINCREMENT,
+        username VARCHAR(255) NOT NULL,
+        mailid VARCHAR(255),
+        phonenumber VARCHAR(100),
+        conversation TEXT,
+        timestart TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+        timeend TIMESTAMP NULL,
+        chatbot_id VARCHAR(255),
+        company_name VARCHAR(255),
+        session_id VARCHAR(255),
+        questions_asked INTEGER DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_leads_chatbot_id ON leads (chatbot_id)",
+    "CREATE INDEX IF NOT EXISTS idx_leads_mailid ON leads (mailid)",
+    "CREATE INDEX IF NOT EXISTS idx_leads_session_id ON leads (session_id)",
+    """
+    CREATE TABLE IF NOT EXISTS chatbots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chatbot_id VARCHAR(255) UNIQUE NOT NULL,
+        company_name VARCHAR(255) NOT NULL,
+        website_url TEXT NOT NULL,
+        scraped_content BLOB,
+        contact_info TEXT,
+        embed_code TEXT,
+        status VARCHAR(50) DEFAULT 'active',
+        created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id VARCHAR(255) NOT NULL,
+        chatbot_id VARCHAR(255),
+        role VARCHAR(20) NOT NULL,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_messages_session_id_id ON messages (session_id, id)"
+]
+
+
+class MySQLBackend:
+    name = 'mysql'
+    SCHEMA = MYSQL_SCHEMA
+
+    def __init__(self, config):
+        if mysql is None:
+            raise RuntimeError("mysql-connector-python is not installed; set DB_BACKEND=sqlite or install it")
+        self.config = config
+
+    def connect(self):
+        return mysql.connector.connect(**self.config)
+
+    def ping(self, raw):
+        raw.ping(reconnect=True, attempts=1, delay=0)
+
+    def upsert(self, key, columns):
+        return "ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in columns)
+
+    def seconds_between(self, start, end):
+        return f"TIMESTAMPDIFF(SECOND, {start}, {end})"
+
+    def time_bucket(self, interval, column):
+        return {
+            'hour': f"DATE_FORMAT({column}, '%Y-%m-%d %H:00:00')",
+            'day': f"DATE({column})",
+            'month': f"DATE_FORMAT({column}, '%Y-%m-01')"
+        }[interval]
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over sqlite3: %s placeholders and dictionary rows"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace('%s', '?'), tuple(params or ()))
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(query.replace('%s', '?'), [tuple(r) for r in rows])
+
+    def _convert(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {d[0]: v for d, v in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._convert(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._convert(r) for r in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convert(r) for r in self._cursor.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Just enough of the mysql.connector connection API for DatabaseManager"""
+
+    def __init__(self, path, busy_timeout=5.0):
+        self._conn = sqlite3.connect(
+            path, timeout=busy_timeout, check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, **kwargs):
+        self._conn.execute("SELECT 1")
+
+    def is_connected(self):
+        return True
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def close(self):
+        self._conn.close()
+
+
+def _parse_timestamp(value):
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", _parse_timestamp)
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+    SCHEMA = SQLITE_SCHEMA
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        return SQLiteConnection(self.path)
+
+    def ping(self, raw):
+        raw.ping()
+
+    def upsert(self, key, columns):
+        return f"ON CONFLICT({key}) DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in columns)
+
+    def seconds_between(self, start, end):
+        return f"CAST(ROUND((julianday({end}) - julianday({start})) * 86400) AS INTEGER)"
+
+    def time_bucket(self, interval, column):
+        return {
+            'hour': f"strftime('%Y-%m-%d %H:00:00', {column})",
+            'day': f"date({column})",
+            'month': f"strftime('%Y-%m-01', {column})"
+        }[interval]
+
+
+def mysql_config():
+    """mysql.connector settings from MYSQL_HOST, MYSQL_DATABASE, MYSQL_USER, MYSQL_PASSWORD and MYSQL_PORT"""
+    return {
+        'host': os.getenv('MYSQL_HOST', 'localhost'),
+        'database': os.getenv('MYSQL_DATABASE', 'chatbot_db'),
+        'user': os.getenv('MYSQL_USER', 'root'),
+        'password': os.getenv('MYSQL_PASSWORD', ''),
+        'port': int(os.getenv('MYSQL_PORT', '3306'))
+    }
+
+
+def create_backend(mysql_config):
+    backend = os.getenv('DB_BACKEND', 'mysql').strip().lower()
+    if backend == 'sqlite':
+        return SQLiteBackend(os.getenv('SQLITE_PATH', 'chatbot.db'))
+    if backend != 'mysql':
+        raise ValueError(f"Unknown DB_BACKEND '{backend}' (expected 'mysql' or 'sqlite')")
+    return MySQLBackend(mysql_config)
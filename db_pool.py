@@ -0,0 +1,201 @@
+"""
+Database connection pool
+Keeps connections open between requests so DatabaseManager does not pay a
+TCP + auth handshake for every query.
+"""
+import os
+import threading
+import time
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection frees up within the checkout timeout"""
+
+
+class PooledConnection:
+    """Wraps a raw connection; close() hands it back to the pool instead of disconnecting"""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool._release(self._raw, self._created_at)
+
+    def discard(self):
+        """Close the underlying connection instead of reusing it, e.g. after an abandoned streaming read"""
+        if not self._released:
+            self._released = True
+            self._pool._discard(self._raw)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe LIFO connection pool with health checks and checkout stats"""
+
+    def __init__(self, connect, size=5, timeout=5.0, recycle=3600, ping_interval=30, ping=None):
+        self._connect = connect
+        self._ping = ping or self._default_ping
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition()
+        self._idle = []  # (raw, created_at, last_used)
+        self._open = 0
+        self._in_use = 0
+        self._pid = os.getpid()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    @staticmethod
+    def _default_ping(raw):
+        if hasattr(raw, 'ping'):
+            raw.ping(reconnect=True, attempts=1, delay=0)
+        elif hasattr(raw, 'is_connected') and not raw.is_connected():
+            raise ConnectionError("connection lost")
+
+    def _reset_after_fork(self):
+        # Connections inherited from a parent process must never be shared
+        if self._pid != os.getpid():
+            self._idle = []
+            self._open = 0
+            self._in_use = 0
+            self._pid = os.getpid()
+
+    def get_connection(self):
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        waited = False
+
+        with self._cond:
+            self._reset_after_fork()
+            while True:
+                if self._idle:
+                    raw, created_at, last_used = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    raw, created_at, last_used = None, None, None
+                    break
+                if not waited:
+                    waited = True
+                    self._waits += 1
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolExhausted(f"no connection available after {self.timeout}s (size={self.size})")
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            now = time.time()
+            if raw is not None and not self._is_healthy(raw, created_at, last_used, now):
+                self._close_quietly(raw)
+                raw = None
+                with self._cond:
+                    self._reconnects += 1
+            if raw is None:
+                raw = self._connect()
+                created_at = now
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+
+        return PooledConnection(self, raw, created_at)
+
+    def _is_healthy(self, raw, created_at, last_used, now):
+        if self.recycle and now - created_at > self.recycle:
+            return False
+        if now - last_used > self.ping_interval:
+            try:
+                self._ping(raw)
+            except Exception:
+                return False
+        return True
+
+    def _release(self, raw, created_at):
+        healthy = True
+        try:
+            # End any open transaction so the next borrower doesn't read a stale snapshot
+            raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, created_at, time.time()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+        if not healthy:
+            self._close_quietly(raw)
+
+    def _discard(self, raw):
+        with self._cond:
+            if self._pid == os.getpid():
+                self._in_use -= 1
+                self._open -= 1
+                self._cond.notify()
+        self._close_quietly(raw)
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for raw, _, _ in idle:
+            self._close_quietly(raw)
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "checkouts": checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+                "avg_checkout_ms": round(self._checkout_time_total / checkouts * 1000, 3) if checkouts else 0,
+                "max_checkout_ms": round(self._checkout_time_max * 1000, 3)
+            }
@@ -0,0 +1,185 @@
+"""
+Page text extraction
+Turns fetched HTML into the plain-text layout EnhancedScraper stores
+(title, description, headings, paragraphs, list items, table rows) plus
+the page's links for the crawler.
+
+The lxml path parses once with libxml2, drops script/style/navigation
+subtrees in C and collects every section in a single walk over the
+remaining elements. The BeautifulSoup path is the original
+html.parser + find_all implementation, kept as a fallback
+(SCRAPE_EXTRACTOR=bs4) and as the reference for bench_extraction.py.
+"""
+import threading
+from itertools import islice
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+ENGINES = ("lxml", "bs4")
+
+
+def _text(element):
+    """BeautifulSoup's get_text(strip=True) for an lxml element"""
+    return "".join(piece.strip() for piece in element.itertext())
+
+
+class Extractor:
+    """Extraction limits and labels for one page layout.
+    extract(html) -> (text, links, title); links are read before anything is dropped."""
+
+    def __init__(self, engine="lxml", title_label="TITLE", desc_label="DESC", heading_tags=("h1", "h2", "h3"),
+                 max_headings=15, max_paragraphs=20, max_lists=5, max_items=10, max_tables=0, max_rows=10,
+                 sections=False, drop_tags=("script", "style", "nav", "footer", "header", "iframe"),
+                 max_chars=4000):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown extraction engine: {engine}")
+        self.engine = engine
+        self.title_label = title_label
+        self.desc_label = desc_label
+        self.heading_tags = tuple(heading_tags)
+        self.max_headings = max_headings  # None for all
+        self.max_paragraphs = max_paragraphs
+        self.max_lists = max_lists
+        self.max_items = max_items
+        self.max_tables = max_tables
+        self.max_rows = max_rows
+        self.sections = sections  # "=== HEADINGS ===" style section markers
+        self.drop_tags = tuple(drop_tags)
+        self.max_chars = max_chars
+
+        self._local = threading.local()
+        self._walk_tags = ("title", "meta", "p", "ul", "ol", "table") + self.heading_tags
+
+    def parser(self):
+        # lxml parsers must not be used by two threads at once, so each thread keeps its own
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            parser = self._local.parser = etree.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+        return parser
+
+    def extract(self, html):
+        if self.engine == "bs4":
+            return self.extract_soup(html)
+        return self.extract_lxml(html)
+
+    def _layout(self, title, desc, headings_found, headings, paragraphs, items, rows):
+        parts = []
+        if title:
+            parts.append(f"{self.title_label}: {title}")
+        if desc:
+            parts.append(f"{self.desc_label}: {desc}")
+        if self.sections and headings_found:
+            parts.append("\n=== HEADINGS ===")
+        parts.extend(f"{tag.upper()}: {text}" for tag, text in headings)
+        if self.sections:
+            parts.append("\n=== MAIN CONTENT ===")
+        parts.extend(paragraphs)
+        parts.extend(f"• {item}" for item in items)
+        if self.sections and rows is not None:
+            parts.append("\n=== TABLES ===")
+        parts.extend(rows or ())
+        return "\n".join(parts)[:self.max_chars]
+
+    # ---- lxml ----
+
+    def extract_lxml(self, html):
+        root = etree.fromstring(html.encode("utf-8", errors="replace"), self.parser()) if html.strip() else None
+        if root is None:
+            return "", [], None
+        links = [a.get("href") for a in root.iter("a")
+                 if a.get("href") is not None and "nofollow" not in (a.get("rel") or "").split()]
+        etree.strip_elements(root, *self.drop_tags, with_tail=False)
+
+        title = desc = None
+        headings, paragraphs, lists, tables = [], [], [], []
+        heading_count = paragraph_count = 0
+        heading_tags = self.heading_tags
+        for element in root.iter(*self._walk_tags):
+            tag = element.tag
+            # Limits count every element seen, including empty ones that are then skipped
+            if tag in heading_tags:
+                heading_count += 1
+                if self.max_headings is None or heading_count <= self.max_headings:
+                    text = _text(element)
+                    if text:
+                        headings.append((tag, text))
+            elif tag == "p":
+                paragraph_count += 1
+                if paragraph_count <= self.max_paragraphs:
+                    text = _text(element)
+                    if len(text) > 20:
+                        paragraphs.append(text)
+            elif tag in ("ul", "ol"):
+                if len(lists) < self.max_lists:
+                    lists.append(element)
+            elif tag == "table":
+                if len(tables) < self.max_tables:
+                    tables.append(element)
+            elif tag == "title":
+                if title is None:
+                    title = element.text if len(element) == 0 else _text(element)
+                    title = title or ""
+            elif desc is None and element.get("name") == "description":
+                desc = element.get("content") or ""
+
+        # Nested lists and tables are walked again from each ancestor, as find_all does
+        items = []
+        for element in lists:
+            for item in islice(element.iter("li"), self.max_items):
+                text = _text(item)
+                if len(text) > 5:
+                    items.append(text)
+        rows = None
+        if tables:
+            rows = []
+            for table in tables:
+                for row in islice(table.iter("tr"), self.max_rows):
+                    row_text = " | ".join(text for text in (_text(cell) for cell in row.iter("td", "th")) if text)
+                    if row_text:
+                        rows.append(row_text)
+        return self._layout(title, desc, heading_count > 0, headings, paragraphs, items, rows), links, title
+
+    # ---- BeautifulSoup (reference) ----
+
+    def extract_soup(self, html):
+        soup = BeautifulSoup(html, "html.parser")
+        links = [a["href"] for a in soup.find_all("a", href=True) if "nofollow" not in (a.get("rel") or [])]
+        for tag in soup(list(self.drop_tags)):
+            tag.decompose()
+
+        title = soup.title.string if soup.title else None
+        meta_desc = soup.find("meta", attrs={"name": "description"})
+        desc = meta_desc.get("content") if meta_desc else None
+
+        found = soup.find_all(list(self.heading_tags))
+        headings = []
+        for h in found[:self.max_headings]:
+            text = h.get_text(strip=True)
+            if text:
+                headings.append((h.name, text))
+
+        paragraphs = []
+        for p in soup.find_all("p")[:self.max_paragraphs]:
+            text = p.get_text(strip=True)
+            if len(text) > 20:
+                paragraphs.append(text)
+
+        items = []
+        for lst in soup.find_all(["ul", "ol"])[:self.max_lists]:
+            for item in lst.find_all("li")[:self.max_items]:
+                text = item.get_text(strip=True)
+                if text and len(text) > 5:
+                    items.append(text)
+
+        rows = None
+        tables = soup.find_all("table")[:self.max_tables] if self.max_tables else []
+        if tables:
+            rows = []
+            for table in tables:
+                for row in table.find_all("tr")[:self.max_rows]:
+                    cells = row.find_all(["td", "th"])
+                    row_text = " | ".join([cell.get_text(strip=True) for cell in cells if cell.get_text(strip=True)])
+                    if row_text:
+                        rows.append(row_text)
+        return self._layout(title, desc, bool(found), headings, paragraphs, items, rows), links, title
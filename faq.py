@@ -0,0 +1,136 @@
+"""
+Precomputed FAQ answers
+After a chatbot is created, a background stage guesses the questions its
+first visitors are most likely to ask (services, pricing, hours, location,
+the site's own headings and list items), answers them through the normal
+LLM path and stores the pairs with the chatbot. Chat messages that match
+one of those questions closely enough are answered from the store with no
+LLM call.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+from semantic_cache import ChatbotIndex, hash_vector, question_features, question_numbers
+
+# (question, words that make it worth asking when they appear in the scraped content)
+TOPIC_QUESTIONS = [
+    ("What services does {company} offer?", ("service", "solution", "product", "offer")),
+    ("How much does {company} cost?", ("price", "pricing", "plan", "cost", "$", "€", "£")),
+    ("What are your opening hours?", ("opening hours", "business hours", "hours:", "monday", "mon-fri", "open daily")),
+    ("Where is {company} located?", ("address", "located", "location", "street", "office")),
+    ("How do I get started with {company}?", ("get started", "sign up", "signup", "book a", "book now", "free trial")),
+]
+
+# Headings too generic to make a useful question
+GENERIC_HEADINGS = frozenset([
+    "home", "menu", "contact", "contact us", "about", "about us", "welcome", "blog", "news", "login",
+    "sign in", "search", "more", "read more", "learn more", "follow us", "subscribe", "newsletter",
+    "privacy policy", "terms", "cookies", "faq", "faqs",
+])
+
+HEADING_RE = re.compile(r"^H[123]:\s*(.+)$")
+
+
+def likely_questions(company_name, pages, limit=8):
+    """Questions visitors are likely to ask, most predictable first"""
+    text = "\n".join(page['content'] for page in pages)
+    lowered = text.lower()
+
+    questions = [f"What does {company_name} do?"]
+    for template, keywords in TOPIC_QUESTIONS:
+        if any(k in lowered for k in keywords):
+            questions.append(template.format(company=company_name))
+
+    headings, items = [], []
+    for line in text.splitlines():
+        line = line.strip()
+        match = HEADING_RE.match(line)
+        if match:
+            heading = match.group(1).strip().rstrip(":")
+            if 3 <= len(heading) <= 60 and heading.lower() not in GENERIC_HEADINGS \
+                    and company_name.lower() not in heading.lower():
+                headings.append(heading)
+        elif line.startswith("• "):
+            item = line[2:].strip().rstrip(".")
+            if 3 <= len(item) <= 40:
+                items.append(item)
+
+    questions.extend(f"Tell me about {heading}" for heading in headings)
+    questions.extend(f"Do you offer {item}?" for item in items)
+
+    unique, seen = [], set()
+    for question in questions:
+        key = question.lower()
+        if key not in seen:
+            seen.add(key)
+            unique.append(question)
+    return unique[:limit]
+
+
+class FAQStore:
+    """Per-worker matcher over each chatbot's precomputed answers.
+    The answers themselves live in the chatbot record; an index is rebuilt
+    whenever the record it was built from is reloaded."""
+
+    def __init__(self, threshold=0.8, dim=1024, max_chatbots=1000):
+        self.threshold = threshold
+        self.dim = dim
+        self.max_chatbots = max_chatbots
+
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()  # chatbot_id -> (faqs it was built from, ChatbotIndex)
+
+        self.lookups = 0
+        self.hits = 0
+        self.jobs = 0
+        self.answers_stored = 0
+
+    def _index(self, chatbot_id, faqs):
+        entry = self._indexes.get(chatbot_id)
+        if entry is None or entry[0] is not faqs:
+            index = ChatbotIndex(self.dim, max(1, len(faqs)))
+            for question, answer in faqs:
+                vec = hash_vector(question_features(question), self.dim)
+                if vec.any():
+                    index.add(vec, question, answer, 0.0, question_numbers(question))
+            entry = self._indexes[chatbot_id] = (faqs, index)
+            while len(self._indexes) > self.max_chatbots:
+                self._indexes.popitem(last=False)
+        self._indexes.move_to_end(chatbot_id)
+        return entry[1]
+
+    def match(self, chatbot_id, faqs, question):
+        """Stored answer to the FAQ closest to question, or None"""
+        if not faqs:
+            return None
+        vec = hash_vector(question_features(question), self.dim)
+        with self._lock:
+            self.lookups += 1
+            index = self._index(chatbot_id, faqs)
+            row, similarity = index.nearest(vec, question_numbers(question))
+            if row is None or similarity < self.threshold:
+                return None
+            self.hits += 1
+            return index.answers[row]
+
+    def record_job(self, answers):
+        with self._lock:
+            self.jobs += 1
+            self.answers_stored += answers
+
+    def invalidate(self, chatbot_id):
+        with self._lock:
+            self._indexes.pop(chatbot_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "chatbots": len(self._indexes),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0,
+                "jobs": self.jobs,
+                "answers_stored": self.answers_stored
+            }
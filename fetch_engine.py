@@ -0,0 +1,238 @@
+"""
+Asyncio fetch engine for the scraper
+One event loop per process, on a background thread, with one httpx
+connection pool shared by every crawl. Fetches pass a per-host and a global
+semaphore, so ten chatbots created for the same site at once still open at
+most SCRAPE_PER_HOST connections to it, and the whole process never has more
+than SCRAPE_MAX_CONNECTIONS fetches in flight. DNS lookups and TLS sessions
+are reused through the pool's kept-alive connections.
+
+Synchronous callers (Flask workers, Streamlit) drive crawler.Crawler.plan()
+on their own thread and hand each batch of URLs to the loop; asyncio callers
+(asgi.py) await the same batches without blocking their loop. Either way a
+crawl costs no threads of its own.
+"""
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from crawler import Crawler, FetchResult
+
+
+def decode_body(body, charset):
+    """Response text; bad bytes and unknown charset labels (charset=x-foo) fall back to UTF-8 replacement"""
+    try:
+        return body.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+class FetchEngine:
+    """Process-wide async fetcher with per-host and global concurrency limits"""
+
+    def __init__(self, max_connections=100, per_host=4, keepalive=10, connect_timeout=3.05,
+                 read_timeout=8, headers=None):
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.headers = dict(headers or {})
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+        self._client = None
+        self._slots = None
+        self._hosts = {}  # host -> [semaphore, fetches holding or waiting for it]
+
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waiting = 0
+        self.crawls = 0
+        self.active_crawls = 0
+
+    # ---- event loop ----
+
+    def loop(self):
+        # A forked child does not inherit the parent's loop thread, so each process starts its own
+        if self._loop is None or self._pid != os.getpid():
+            with self._lock:
+                if self._loop is None or self._pid != os.getpid():
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="fetch-engine", daemon=True).start()
+                    self._client = None
+                    self._slots = None
+                    self._hosts = {}
+                    self._loop = loop
+                    self._pid = os.getpid()
+        return self._loop
+
+    def submit(self, coro):
+        """Schedule coro on the engine's loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop())
+
+    def client(self):
+        # Created lazily on the engine loop, as are the semaphores
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.keepalive),
+                follow_redirects=True
+            )
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._client
+
+    # ---- fetching (engine loop only) ----
+
+    async def _fetch(self, url, headers, max_bytes):
+        client = self.client()
+        host = urlsplit(url).netloc.lower()
+        entry = self._hosts.setdefault(host, [asyncio.Semaphore(self.per_host), 0])
+        entry[1] += 1
+        self.waiting += 1
+        waiting = True
+        try:
+            async with entry[0], self._slots:
+                self.waiting -= 1
+                waiting = False
+                self.requests += 1
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                started = time.perf_counter()
+                try:
+                    async with client.stream("GET", url, headers=headers) as resp:
+                        body = bytearray()
+                        async for chunk in resp.aiter_bytes():
+                            body += chunk
+                            if len(body) >= max_bytes:
+                                del body[max_bytes:]
+                                break
+                        return FetchResult(str(resp.url), resp.status_code,
+                                           decode_body(body, resp.charset_encoding),
+                                           resp.headers.get("content-type", ""), len(body),
+                                           time.perf_counter() - started, dict(resp.headers))
+                finally:
+                    self.in_flight -= 1
+        finally:
+            if waiting:
+                self.waiting -= 1
+            entry[1] -= 1
+            if not entry[1]:
+                del self._hosts[host]
+
+    async def fetch(self, url, headers=None, timeout=None, max_bytes=512 * 1024):
+        """FetchResult for url, or None on a network error or when timeout (seconds,
+        including time spent waiting for a connection slot) runs out"""
+        try:
+            return await asyncio.wait_for(self._fetch(url, headers, max_bytes), max(0.5, timeout or self.read_timeout))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            print(f"[Scraper] Fetch timed out for {url}")
+        except (httpx.HTTPError, OSError) as e:
+            self.errors += 1
+            print(f"[Scraper] Fetch error for {url}: {e!r}")
+        return None
+
+    async def fetch_batch(self, urls, headers=None, timeout=None, max_bytes=512 * 1024):
+        """headers is one dict for every URL, or a list with one dict per URL"""
+        if not isinstance(headers, list):
+            headers = [headers] * len(urls)
+        return await asyncio.gather(*(self.fetch(url, h, timeout, max_bytes) for url, h in zip(urls, headers)))
+
+    # ---- crawl drivers ----
+
+    def fetch_all(self, urls, headers=None, timeout=None, max_bytes=512 * 1024):
+        """Blocking fetch of urls on the engine; results in order"""
+        return self.submit(self.fetch_batch(urls, headers, timeout, max_bytes)).result()
+
+    def _started(self):
+        with self._lock:
+            self.crawls += 1
+            self.active_crawls += 1
+
+    def _finished(self):
+        with self._lock:
+            self.active_crawls -= 1
+
+    def crawl(self, crawler, base_url, headers=None):
+        """Run crawler from the calling thread; parsing and progress callbacks stay on it"""
+        self._started()
+        try:
+            steps = crawler.plan(base_url)
+            results = None
+            while True:
+                batch, pages = Crawler.advance(steps, results)
+                if batch is None:
+                    return pages
+                urls, delay, max_bytes = batch
+                if delay:
+                    time.sleep(min(delay, crawler.remaining()))
+                results = self.fetch_all(urls, headers, crawler.remaining(), max_bytes)
+        finally:
+            self._finished()
+
+    async def crawl_async(self, crawler, base_url, headers=None):
+        """crawl() for asyncio callers: fetches run on the engine, parsing in a worker thread"""
+        self._started()
+        try:
+            steps = crawler.plan(base_url)
+            results = None
+            while True:
+                batch, pages = await asyncio.to_thread(Crawler.advance, steps, results)
+                if batch is None:
+                    return pages
+                urls, delay, max_bytes = batch
+                if delay:
+                    await asyncio.sleep(min(delay, crawler.remaining()))
+                results = await asyncio.wrap_future(
+                    self.submit(self.fetch_batch(urls, headers, crawler.remaining(), max_bytes)))
+        finally:
+            self._finished()
+
+    def close(self):
+        with self._lock:
+            loop, client = self._loop, self._client
+            self._loop = self._client = None
+        if loop is None:
+            return
+        if client is not None and self._pid == os.getpid():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+
+    def stats(self):
+        return {
+            "max_connections": self.max_connections,
+            "per_host": self.per_host,
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "waiting": self.waiting,
+            "hosts": len(self._hosts),
+            "crawls": self.crawls,
+            "active_crawls": self.active_crawls
+        }
+
+
+def create_engine(prefix, max_connections=100, per_host=4, connect_timeout=3.05, read_timeout=8, headers=None):
+    """Build an engine configured from {prefix}_MAX_CONNECTIONS, {prefix}_PER_HOST,
+    {prefix}_HTTP_POOL_SIZE, {prefix}_CONNECT_TIMEOUT and {prefix}_READ_TIMEOUT"""
+    return FetchEngine(
+        max_connections=int(os.getenv(f"{prefix}_MAX_CONNECTIONS", str(max_connections))),
+        per_host=int(os.getenv(f"{prefix}_PER_HOST", str(per_host))),
+        keepalive=int(os.getenv(f"{prefix}_HTTP_POOL_SIZE", "10")),
+        connect_timeout=float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", str(connect_timeout))),
+        read_timeout=float(os.getenv(f"{prefix}_READ_TIMEOUT", str(read_timeout))),
+        headers=headers
+    )
@@ -0,0 +1,89 @@
+"""
+Shared outbound HTTP client
+One requests.Session per process with a sized urllib3 connection pool, so
+repeated calls to the same host (OpenRouter, a site being scraped) reuse
+kept-alive TLS connections instead of handshaking every time.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HTTPClient:
+    """Thread-safe keep-alive client with separate connect and read timeouts"""
+
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=10, headers=None):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.headers = dict(headers or {})
+
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def session(self):
+        # Sockets must not be shared with a forked parent, so each process builds its own session
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers.update(self.headers)
+                    self._session = session
+                    self._pid = os.getpid()
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self.requests += 1
+        try:
+            return self.session().request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "connect_timeout": self.connect_timeout,
+                "read_timeout": self.read_timeout,
+                "requests": self.requests,
+                "errors": self.errors
+            }
+
+
+def create_client(prefix, pool_size=10, connect_timeout=3.05, read_timeout=10, headers=None):
+    """Build a client configured from {prefix}_HTTP_POOL_SIZE, {prefix}_CONNECT_TIMEOUT and {prefix}_READ_TIMEOUT"""
+    return HTTPClient(
+        pool_size=int(os.getenv(f"{prefix}_HTTP_POOL_SIZE", str(pool_size))),
+        connect_timeout=float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", str(connect_timeout))),
+        read_timeout=float(os.getenv(f"{prefix}_READ_TIMEOUT", str(read_timeout))),
+        headers=headers
+    )
@@ -0,0 +1,303 @@
+"""
+Versioned schema migrations
+Run once per deploy, before the workers start:
+
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # show applied / pending versions
+
+Applied versions are recorded in schema_migrations. Workers never run DDL;
+at boot they only compare the recorded version with SCHEMA_VERSION.
+To change the schema, append a new (version, description, function) entry
+to MIGRATIONS - never edit one that has already shipped.
+"""
+import sys
+from pathlib import Path
+
+from content_store import pack_pages, load_pages, is_packed
+from retrieval import ChunkIndex
+
+
+def _index_exists(cursor, backend, table, index):
+    if backend.name == 'mysql':
+        cursor.execute("""
+            SELECT 1 FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1
+        """, (table, index))
+    else:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s",
+                       (table, index))
+    return cursor.fetchone() is not None
+
+
+def _create_index(cursor, backend, table, index, columns):
+    if not _index_exists(cursor, backend, table, index):
+        cursor.execute(f"CREATE INDEX {index} ON {table} ({', '.join(columns)})")
+
+
+def _drop_index(cursor, backend, table, index):
+    if _index_exists(cursor, backend, table, index):
+        if backend.name == 'mysql':
+            cursor.execute(f"DROP INDEX {index} ON {table}")
+        else:
+            cursor.execute(f"DROP INDEX {index}")
+
+
+def create_base_tables(cursor, backend):
+    # CREATE ... IF NOT EXISTS, so databases created before migrations existed are adopted as-is
+    for statement in backend.SCHEMA:
+        cursor.execute(statement)
+
+
+def compress_scraped_content(cursor, backend, batch_size=100):
+    """Widen chatbots.scraped_content to MEDIUMBLOB and repack legacy JSON rows"""
+    if backend.name == 'mysql':
+        cursor.execute("""
+            SELECT DATA_TYPE FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'chatbots' AND COLUMN_NAME = 'scraped_content'
+        """)
+        row = cursor.fetchone()
+        if row and row[0].lower() != 'mediumblob':
+            print(f"[DB] Converting chatbots.scraped_content from {row[0]} to MEDIUMBLOB")
+            cursor.execute("ALTER TABLE chatbots MODIFY scraped_content MEDIUMBLOB")
+
+    converted = 0
+    last_id = 0
+    while True:
+        cursor.execute(
+            "SELECT id, scraped_content FROM chatbots WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for row_id, raw in rows:
+            if raw and not is_packed(raw):
+                cursor.execute(
+                    "UPDATE chatbots SET scraped_content = %s WHERE id = %s",
+                    (pack_pages(load_pages(raw)), row_id)
+                )
+                converted += 1
+        last_id = rows[-1][0]
+    if converted:
+        print(f"[DB] Repacked scraped content for {converted} chatbot(s)")
+
+
+def add_listing_indexes(cursor, backend):
+    """Indexes matching the real access paths: per-chatbot lead pages, exports and stats
+    (WHERE chatbot_id = ? [AND timestart range] ORDER BY timestart, userid), the
+    unfiltered lead feed, and the chatbot list (ORDER BY created_at, id)."""
+    leads_chatbot_idx = 'idx_chatbot_id' if backend.name == 'mysql' else 'idx_leads_chatbot_id'
+    _create_index(cursor, backend, 'leads', 'idx_leads_chatbot_timestart', ('chatbot_id', 'timestart', 'userid'))
+    _create_index(cursor, backend, 'leads', 'idx_leads_timestart', ('timestart', 'userid'))
+    _create_index(cursor, backend, 'chatbots', 'idx_chatbots_created_at', ('created_at', 'id'))
+    # Both are prefixes of an index that now exists (the composite above, the UNIQUE key on chatbots)
+    _drop_index(cursor, backend, 'leads', leads_chatbot_idx)
+    if backend.name == 'mysql':
+        _drop_index(cursor, backend, 'chatbots', 'idx_chatbot_id')
+
+
+def create_faq_table(cursor, backend):
+    """Precomputed answers to each chatbot's likely questions, read back in insertion order"""
+    if backend.name == 'mysql':
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS faq_answers (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                chatbot_id VARCHAR(255) NOT NULL,
+                question VARCHAR(255) NOT NULL,
+                answer TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_faq_answers_chatbot_id (chatbot_id, id)
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS faq_answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chatbot_id VARCHAR(255) NOT NULL,
+                question VARCHAR(255) NOT NULL,
+                answer TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+            )
+        """)
+        _create_index(cursor, backend, 'faq_answers', 'idx_faq_answers_chatbot_id', ('chatbot_id', 'id'))
+
+
+def _column_exists(cursor, backend, table, column):
+    if backend.name == 'mysql':
+        cursor.execute("""
+            SELECT 1 FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s LIMIT 1
+        """, (table, column))
+        return cursor.fetchone() is not None
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def add_search_index(cursor, backend, batch_size=50):
+    """Add chatbots.search_index (serialized BM25 chunk index) and build it for existing chatbots"""
+    if not _column_exists(cursor, backend, 'chatbots', 'search_index'):
+        column_type = 'MEDIUMBLOB' if backend.name == 'mysql' else 'BLOB'
+        cursor.execute(f"ALTER TABLE chatbots ADD COLUMN search_index {column_type}")
+
+    built = 0
+    last_id = 0
+    while True:
+        cursor.execute(
+            "SELECT id, scraped_content FROM chatbots WHERE id > %s AND search_index IS NULL ORDER BY id LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for row_id, raw in rows:
+            index = ChunkIndex.build(load_pages(raw))
+            cursor.execute("UPDATE chatbots SET search_index = %s WHERE id = %s", (index.to_bytes(), row_id))
+            built += 1
+        last_id = rows[-1][0]
+    if built:
+        print(f"[DB] Built search indexes for {built} chatbot(s)")
+
+
+def create_page_state_table(cursor, backend):
+    """Per-page HTTP validators and content hash, for incremental refresh.
+    Existing chatbots get their rows on their first refresh."""
+    if backend.name == 'mysql':
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scraped_pages (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                chatbot_id VARCHAR(255) NOT NULL,
+                url_hash CHAR(40) NOT NULL,
+                url TEXT NOT NULL,
+                etag VARCHAR(255),
+                last_modified VARCHAR(64),
+                content_hash CHAR(40) NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                UNIQUE KEY uq_scraped_pages_chatbot_url (chatbot_id, url_hash)
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scraped_pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chatbot_id VARCHAR(255) NOT NULL,
+                url_hash CHAR(40) NOT NULL,
+                url TEXT NOT NULL,
+                etag VARCHAR(255),
+                last_modified VARCHAR(64),
+                content_hash CHAR(40) NOT NULL,
+                updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                UNIQUE (chatbot_id, url_hash)
+            )
+        """)
+
+
+MIGRATIONS = [
+    (1, "base tables", create_base_tables),
+    (2, "compressed scraped content", compress_scraped_content),
+    (3, "composite indexes for lead and chatbot listings", add_listing_indexes),
+    (4, "precomputed FAQ answers", create_faq_table),
+    (5, "BM25 chunk index per chatbot", add_search_index),
+    (6, "per-page validators and content hashes", create_page_state_table),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def current_version(conn):
+    """Highest applied version, 0 for a fresh database. Cheap enough to run at every worker boot."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_migrations")
+        row = cursor.fetchone()
+        return row[0] or 0
+    finally:
+        cursor.close()
+
+
+def migrate(conn, backend, target=None):
+    """Apply pending migrations in order, committing each one with its version row.
+    Returns the list of versions applied."""
+    cursor = conn.cursor()
+    cursor.execute(VERSION_TABLE)
+    conn.commit()
+    cursor.close()
+
+    applied = []
+    version = current_version(conn)
+    for number, description, apply in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        print(f"[DB] Applying migration {number}: {description}")
+        cursor = conn.cursor()
+        try:
+            apply(cursor, backend)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (number, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        applied.append(number)
+    return applied
+
+
+def main(argv):
+    # Connection settings only: importing app would start its pools, writer threads and HTTP clients
+    from dotenv import load_dotenv
+    from db_backends import create_backend, mysql_config, Error
+
+    command = argv[1] if len(argv) > 1 else 'upgrade'
+    if command not in ('upgrade', 'status'):
+        print("Usage: python migrations.py [upgrade|status]")
+        return 2
+
+    if Path('.env.local').exists():
+        load_dotenv('.env.local')
+    else:
+        load_dotenv()
+    db_backend = create_backend(mysql_config())
+    try:
+        conn = db_backend.connect()
+    except Error as e:
+        print(f"[ERROR] Could not connect to the database: {e}")
+        return 1
+
+    try:
+        if command == 'status':
+            try:
+                version = current_version(conn)
+            except Error:
+                version = 0
+            print(f"Backend: {db_backend.name}")
+            for number, description, _ in MIGRATIONS:
+                state = "applied" if number <= version else "pending"
+                print(f"  {number:>3}  {state:<8} {description}")
+            return 0
+
+        applied = migrate(conn, db_backend)
+        if applied:
+            print(f"[OK] Applied migration(s) {', '.join(map(str, applied))}; schema is at version {SCHEMA_VERSION}")
+        else:
+            print(f"[OK] Schema already at version {SCHEMA_VERSION}")
+        return 0
+    except Error as e:
+        print(f"[ERROR] Migration failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,253 @@
+"""
+Model routing
+Tracks latency and failures per model and picks, for each request, the
+order in which models are tried: fastest healthy model first. A model
+that keeps failing (or answers 429) has its circuit opened and receives
+no traffic until a cooldown passes; then a single probe request is let
+through (half-open) and decides whether the circuit closes again.
+
+HedgePolicy decides when a slow request gets a second (hedge) request to
+another model: after the primary model's latency percentile has passed,
+and only while the chatbot still has hedge budget.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ModelHealth:
+    """Rolling health of one model"""
+
+    def __init__(self, model, index):
+        self.model = model
+        self.index = index
+        self.latency = None  # EWMA seconds of successful calls
+        self.samples = deque(maxlen=200)  # recent successful latencies, for percentiles
+        self.error_rate = 0.0  # EWMA of failures (0..1)
+        self.requests = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = None
+        self.cooldown = 0
+        self.probing = False
+
+    def score(self):
+        # Unmeasured models score 0 so each one gets tried (and measured) once
+        if self.latency is None:
+            return 0.0
+        return self.latency / max(0.05, 1.0 - self.error_rate)
+
+    def to_dict(self):
+        return {
+            "state": self.state,
+            "ewma_latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "requests": self.requests,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "consecutive_failures": self.consecutive_failures,
+            "cooldown_remaining": round(max(0.0, self.opened_at + self.cooldown - time.monotonic()), 1)
+                                  if self.state == OPEN else 0
+        }
+
+
+class ModelRouter:
+    """Thread-safe per-process router with EWMA latency and circuit breakers"""
+
+    def __init__(self, models, alpha=0.2, failure_threshold=3, error_rate_threshold=0.5,
+                 min_requests=10, cooldown=30, max_cooldown=300):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_requests = min_requests
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self._lock = threading.Lock()
+        self._health = {model: ModelHealth(model, i) for i, model in enumerate(models)}
+
+    def candidates(self):
+        """Models to try for one request, best first. At most one model whose cooldown
+        has elapsed is offered first as the half-open probe, to one request at a time."""
+        now = time.monotonic()
+        with self._lock:
+            probes, healthy, cooling = [], [], []
+            for h in self._health.values():
+                if h.state == CLOSED:
+                    healthy.append(h)
+                elif h.probing:
+                    continue
+                elif now - h.opened_at >= h.cooldown and not probes:
+                    h.state = HALF_OPEN
+                    h.probing = True
+                    probes.append(h)
+                else:
+                    cooling.append(h)
+            healthy.sort(key=lambda h: (h.score(), h.index))
+            ordered = probes + healthy
+            if not ordered:
+                # Every circuit is open: still try, soonest-to-recover first, rather than fail outright
+                cooling.sort(key=lambda h: h.opened_at + h.cooldown)
+                ordered = cooling
+            return [h.model for h in ordered]
+
+    def candidates_preview(self):
+        """Current routing order of the healthy models, without claiming a probe slot"""
+        with self._lock:
+            healthy = sorted((h for h in self._health.values() if h.state == CLOSED),
+                             key=lambda h: (h.score(), h.index))
+            return [h.model for h in healthy]
+
+    def record_success(self, model, latency):
+        with self._lock:
+            h = self._health[model]
+            h.requests += 1
+            h.consecutive_failures = 0
+            h.latency = latency if h.latency is None else h.latency + self.alpha * (latency - h.latency)
+            h.samples.append(latency)
+            h.error_rate -= self.alpha * h.error_rate
+            if h.state != CLOSED:
+                print(f"[AI] Circuit closed for {model}")
+            h.state = CLOSED
+            h.probing = False
+            h.cooldown = 0
+
+    def record_failure(self, model, rate_limited=False, retry_after=None):
+        with self._lock:
+            h = self._health[model]
+            h.requests += 1
+            h.failures += 1
+            h.consecutive_failures += 1
+            h.error_rate += self.alpha * (1.0 - h.error_rate)
+            if rate_limited:
+                h.rate_limited += 1
+
+            # Honour the provider's Retry-After as a floor for the cooldown
+            floor = min(self.max_cooldown, retry_after) if rate_limited and retry_after else 0
+            if h.state == HALF_OPEN:
+                # Failed probe: back off harder before the next one
+                self._open(h, max(floor, min(self.max_cooldown, max(self.base_cooldown, h.cooldown * 2))))
+            elif h.state == CLOSED and (
+                    rate_limited or
+                    h.consecutive_failures >= self.failure_threshold or
+                    (h.requests >= self.min_requests and h.error_rate >= self.error_rate_threshold)):
+                self._open(h, max(floor, self.base_cooldown))
+            elif h.state == OPEN:
+                h.cooldown = max(h.cooldown, floor)
+
+    def observe_latency(self, model, latency):
+        """Fold in a lower bound on latency, e.g. from a request cancelled because a hedge won,
+        so a model that keeps losing races stops ranking as fast"""
+        with self._lock:
+            h = self._health[model]
+            h.latency = latency if h.latency is None else h.latency + self.alpha * max(0.0, latency - h.latency)
+            h.samples.append(latency)
+
+    def latency_percentile(self, model, pct, min_samples=20):
+        """pct-th percentile of recent successful latencies, or None while there are too few"""
+        with self._lock:
+            samples = sorted(self._health[model].samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+    def release(self, model):
+        """Give back a half-open probe slot that was handed out but never used"""
+        with self._lock:
+            h = self._health[model]
+            if h.state == HALF_OPEN and h.probing:
+                h.state = OPEN
+                h.probing = False
+
+    def _open(self, h, cooldown):
+        if h.state != OPEN:
+            print(f"[AI] Circuit opened for {h.model} for {cooldown:.0f}s "
+                  f"({h.consecutive_failures} consecutive failure(s), error rate {h.error_rate:.2f})")
+        h.state = OPEN
+        h.probing = False
+        h.opened_at = time.monotonic()
+        h.cooldown = cooldown
+
+    def stats(self):
+        with self._lock:
+            return {model: h.to_dict() for model, h in self._health.items()}
+
+
+class HedgePolicy:
+    """When to send a hedge request, and how many each chatbot may spend.
+    Every request earns the chatbot `ratio` hedge tokens (up to `burst`); a hedge costs one,
+    so hedges stay below roughly ratio x that chatbot's traffic."""
+
+    def __init__(self, router, percentile=95, default_delay=2.0, min_delay=0.25,
+                 ratio=0.1, burst=3, max_chatbots=10000):
+        self.router = router
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.ratio = ratio
+        self.burst = burst
+        self.max_chatbots = max_chatbots
+
+        self._lock = threading.Lock()
+        self._tokens = OrderedDict()  # chatbot_id -> tokens, LRU-bounded
+
+        self.requests = 0
+        self.fired = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.budget_denied = 0
+        self.cancelled = 0
+
+    def delay(self, model):
+        """Seconds to wait on model before hedging: its latency percentile once known"""
+        observed = self.router.latency_percentile(model, self.percentile)
+        if observed is None:
+            return self.default_delay
+        return max(self.min_delay, observed)
+
+    def start(self, chatbot_id):
+        with self._lock:
+            self.requests += 1
+            tokens = self._tokens.pop(chatbot_id, 1.0)
+            self._tokens[chatbot_id] = min(self.burst, tokens + self.ratio)
+            while len(self._tokens) > self.max_chatbots:
+                self._tokens.popitem(last=False)
+
+    def allow(self, chatbot_id):
+        """Spend one hedge token for chatbot_id; False once its budget is used up"""
+        with self._lock:
+            tokens = self._tokens.get(chatbot_id, 0.0)
+            if tokens < 1.0:
+                self.budget_denied += 1
+                return False
+            self._tokens[chatbot_id] = tokens - 1.0
+            self.fired += 1
+            return True
+
+    def record(self, hedge_won=None, cancelled=0):
+        with self._lock:
+            if hedge_won is True:
+                self.hedge_wins += 1
+            elif hedge_won is False:
+                self.primary_wins += 1
+            self.cancelled += cancelled
+
+    def stats(self):
+        with self._lock:
+            return {
+                "percentile": self.percentile,
+                "requests": self.requests,
+                "fired": self.fired,
+                "fire_rate": round(self.fired / self.requests, 4) if self.requests else 0,
+                "hedge_wins": self.hedge_wins,
+                "primary_wins": self.primary_wins,
+                "win_rate": round(self.hedge_wins / self.fired, 4) if self.fired else 0,
+                "budget_denied": self.budget_denied,
+                "cancelled": self.cancelled
+            }
@@ -0,0 +1,172 @@
+"""
+Token-budgeted prompts
+Replaces fixed character slices of scraped content with context packed up
+to a per-model token budget. Models differ in context window and in how
+much each input token costs in latency, so each gets its own budget; the
+fast default stays small. Token counts are estimated (no tokenizer
+dependency) and recorded per model, next to the provider's reported
+prompt_tokens when a response includes usage, so the estimate and the
+size/latency tradeoff can be checked on /api/health.
+"""
+import math
+import os
+import re
+import threading
+
+WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """Rough BPE token count: ~4 characters per token for prose, at least one per word or symbol"""
+    if not text:
+        return 0
+    return math.ceil(max(len(text) / 4, len(WORD_RE.findall(text)) * 0.75))
+
+
+class ModelBudget:
+    """Prompt limits for one model"""
+
+    def __init__(self, context_window, context_tokens, reply_tokens=150):
+        self.context_window = context_window
+        self.context_tokens = context_tokens  # scraped context packed into the prompt
+        self.reply_tokens = reply_tokens  # max_tokens requested for the answer
+
+
+# Context windows from the providers' model cards. Budgets are kept well below them:
+# a few hundred tokens of context answers most questions, and every extra input token
+# adds latency - most on the 405B model, least on the small ones.
+MODEL_BUDGETS = {
+    "meta-llama/llama-3.2-3b-instruct:free": ModelBudget(131072, 300),
+    "microsoft/phi-3-mini-128k-instruct:free": ModelBudget(128000, 300),
+    "google/gemma-2-9b-it:free": ModelBudget(8192, 250),
+    "nousresearch/hermes-3-llama-3.1-405b:free": ModelBudget(131072, 150),
+}
+
+
+class Prompt(str):
+    """A prompt whose context can be re-packed per model.
+    The string value is the prompt at the builder's default budget, so it works
+    unchanged as a cache and coalescing key; for_model() renders the request text."""
+
+    def __new__(cls, builder, template, sections, fields):
+        text, _, _ = builder.pack(template, sections, fields, builder.default_context_tokens)
+        prompt = super().__new__(cls, text)
+        prompt.builder = builder
+        prompt.template = template
+        prompt.sections = sections
+        prompt.fields = fields
+        return prompt
+
+    def for_model(self, model):
+        return self.builder.render(self, model)
+
+
+class PromptBuilder:
+    """Builds prompts within per-model token budgets and keeps per-model size statistics"""
+
+    def __init__(self, budgets=None, default_context_tokens=200, reply_tokens=150):
+        self.budgets = dict(MODEL_BUDGETS if budgets is None else budgets)
+        self.default_context_tokens = default_context_tokens
+        self.reply_tokens = reply_tokens
+
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def budget(self, model):
+        return self.budgets.get(model) or ModelBudget(8192, self.default_context_tokens, self.reply_tokens)
+
+    @staticmethod
+    def pack_context(sections, max_tokens):
+        """Whole lines of sections, in order and without repeats, up to max_tokens;
+        the line that does not fit is cut at a word boundary. Returns (context, tokens, truncated)."""
+        parts, used, seen = [], 0, set()
+        for section in sections:
+            for line in section.splitlines():
+                line = line.strip()
+                if not line or line in seen:
+                    continue
+                seen.add(line)
+                cost = estimate_tokens(line)
+                if used + cost <= max_tokens:
+                    parts.append(line)
+                    used += cost
+                    continue
+                remaining = max_tokens - used
+                if remaining >= 8:
+                    cut = line[:remaining * 4].rsplit(" ", 1)[0]
+                    parts.append(cut)
+                    used += estimate_tokens(cut)
+                return "\n".join(parts), used, True
+        return "\n".join(parts), used, False
+
+    def pack(self, template, sections, fields, context_tokens):
+        """template filled with fields and {context}; returns (text, context tokens, truncated)"""
+        context, used, truncated = self.pack_context(sections, context_tokens)
+        return template.format(context=context or "No content available", **fields), used, truncated
+
+    def build(self, template, sections=(), **fields):
+        """Prompt from a template with a {context} slot filled from sections (page texts, best first)"""
+        return Prompt(self, template, tuple(sections), fields)
+
+    def render(self, prompt, model):
+        """(text, max_tokens) for one request to model; plain strings pass through as-is"""
+        budget = self.budget(model)
+        if isinstance(prompt, Prompt):
+            # The context budget can never crowd the answer out of the model's window
+            fixed = estimate_tokens(prompt.template.format(context="", **prompt.fields))
+            context_tokens = max(0, min(budget.context_tokens, budget.context_window - budget.reply_tokens - fixed))
+            text, used, truncated = self.pack(prompt.template, prompt.sections, prompt.fields, context_tokens)
+        else:
+            text, used, truncated = prompt, 0, False
+        tokens = estimate_tokens(text)
+        max_tokens = max(1, min(budget.reply_tokens, budget.context_window - tokens))
+        self._record(model, tokens, used, truncated)
+        return text, max_tokens
+
+    def _record(self, model, tokens, context_tokens, truncated):
+        with self._lock:
+            s = self._stats.get(model)
+            if s is None:
+                s = self._stats[model] = {"prompts": 0, "prompt_tokens": 0, "max_prompt_tokens": 0,
+                                          "context_tokens": 0, "truncated": 0,
+                                          "reported": 0, "reported_prompt_tokens": 0}
+            s["prompts"] += 1
+            s["prompt_tokens"] += tokens
+            s["max_prompt_tokens"] = max(s["max_prompt_tokens"], tokens)
+            s["context_tokens"] += context_tokens
+            s["truncated"] += truncated
+
+    def record_usage(self, model, usage):
+        """Fold in the provider's own prompt_tokens from a completion's usage block"""
+        if not usage or not usage.get("prompt_tokens"):
+            return
+        with self._lock:
+            s = self._stats.get(model)
+            if s is not None:
+                s["reported"] += 1
+                s["reported_prompt_tokens"] += usage["prompt_tokens"]
+
+    def stats(self):
+        with self._lock:
+            return {
+                model: {
+                    "context_budget": self.budget(model).context_tokens,
+                    "prompts": s["prompts"],
+                    "avg_prompt_tokens": round(s["prompt_tokens"] / s["prompts"], 1),
+                    "max_prompt_tokens": s["max_prompt_tokens"],
+                    "avg_context_tokens": round(s["context_tokens"] / s["prompts"], 1),
+                    "truncated_rate": round(s["truncated"] / s["prompts"], 4),
+                    "avg_reported_prompt_tokens": round(s["reported_prompt_tokens"] / s["reported"], 1)
+                                                  if s["reported"] else None
+                }
+                for model, s in self._stats.items()
+            }
+
+
+def create_prompt_builder(reply_tokens=150):
+    """Builder configured from PROMPT_CONTEXT_TOKENS (default budget, also used for models
+    without an entry in MODEL_BUDGETS) and PROMPT_CONTEXT_SCALE (multiplies every per-model budget)"""
+    scale = float(os.getenv("PROMPT_CONTEXT_SCALE", "1"))
+    budgets = {model: ModelBudget(b.context_window, int(b.context_tokens * scale), reply_tokens)
+               for model, b in MODEL_BUDGETS.items()}
+    return PromptBuilder(budgets, int(os.getenv("PROMPT_CONTEXT_TOKENS", "200")), reply_tokens)
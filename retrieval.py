@@ -0,0 +1,201 @@
+"""
+Chunked BM25 retrieval
+Scraped pages are split into small chunks of whole lines and indexed once,
+when the chatbot is created; at question time the best-scoring chunks go
+into the prompt instead of the start of whichever page was scraped first.
+
+The inverted index is a few flat NumPy arrays (CSR layout): postings of
+term t are doc_ids[offsets[t]:offsets[t + 1]] with matching term
+frequencies, so a query touches only its own terms' postings and the
+whole index serializes to one compact blob stored with the chatbot.
+"""
+import io
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from semantic_cache import STOPWORDS, TOKEN_RE, stem
+
+FORMAT_VERSION = 1
+
+
+def terms(text):
+    return [stem(w) for w in TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+def chunk_pages(pages, max_words=60):
+    """Lines of each page grouped into chunks of up to max_words words (long lines are split).
+    Lines repeated across pages - navigation, footers - are kept only once."""
+    chunks, seen = [], set()
+    for page in pages:
+        current, words = [], 0
+        for line in page['content'].splitlines():
+            line = line.strip()
+            if not line or line in seen:
+                continue
+            seen.add(line)
+            pieces = line.split()
+            while pieces:
+                room = max_words - words
+                if current and len(pieces) > room and words >= max_words // 2:
+                    chunks.append("\n".join(current))
+                    current, words = [], 0
+                    continue
+                # A short chunk (say, just a heading) is topped up with the start of the next line
+                current.append(" ".join(pieces[:room]))
+                words += len(pieces[:room])
+                pieces = pieces[room:]
+                if words >= max_words:
+                    chunks.append("\n".join(current))
+                    current, words = [], 0
+        if current:
+            chunks.append("\n".join(current))
+    return chunks
+
+
+class ChunkIndex:
+    """Immutable BM25 index over one chatbot's chunks"""
+
+    def __init__(self, chunks, vocab, offsets, doc_ids, tfs, doc_len, build_ms=0.0):
+        self.chunks = chunks
+        self.vocab = vocab  # term -> term id
+        self.offsets = offsets  # int64[V + 1]
+        self.doc_ids = doc_ids  # int32[P], grouped by term
+        self.tfs = tfs  # float32[P]
+        self.doc_len = doc_len  # float32[N], terms per chunk
+        self.avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+        self.build_ms = build_ms
+
+        n = len(chunks)
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def nbytes(self):
+        """Approximate memory held by the index"""
+        arrays = (self.offsets, self.doc_ids, self.tfs, self.doc_len, self.idf)
+        return sum(a.nbytes for a in arrays) + sum(len(c) for c in self.chunks) + 16 * len(self.vocab)
+
+    @classmethod
+    def build(cls, pages, max_words=60):
+        started = time.perf_counter()
+        chunks = chunk_pages(pages, max_words)
+
+        vocab, term_ids, doc_ids, tfs = {}, [], [], []
+        doc_len = np.zeros(len(chunks), dtype=np.float32)
+        for doc, chunk in enumerate(chunks):
+            counts = {}
+            for term in terms(chunk):
+                counts[term] = counts.get(term, 0) + 1
+            doc_len[doc] = sum(counts.values())
+            for term, count in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc)
+                tfs.append(count)
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")  # stable keeps each posting list in chunk order
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+        return cls(
+            chunks, vocab, offsets,
+            np.asarray(doc_ids, dtype=np.int32)[order],
+            np.asarray(tfs, dtype=np.float32)[order],
+            doc_len,
+            build_ms=(time.perf_counter() - started) * 1000
+        )
+
+    def search(self, query, k=4, k1=1.2, b=0.75):
+        """[(chunk id, BM25 score)] of the k best chunks for query, best first"""
+        if not self.chunks:
+            return []
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        norm = k1 * (1 - b + b * self.doc_len / max(self.avg_len, 1e-6))
+        for term in set(terms(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs, tf = self.doc_ids[start:end], self.tfs[start:end]
+            # Each chunk appears at most once per posting list, so plain fancy-index += is safe
+            scores[docs] += self.idf[t] * tf * (k1 + 1) / (tf + norm[docs])
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    def top_chunks(self, query, k=4):
+        """Texts of the best chunks for query; the leading chunks when nothing matches"""
+        hits = self.search(query, k)
+        if not hits:
+            return self.chunks[:k]
+        return [self.chunks[i] for i, _ in hits]
+
+    def to_bytes(self):
+        text = "\0".join(self.chunks).encode("utf-8")
+        vocab = "\0".join(sorted(self.vocab, key=self.vocab.get)).encode("utf-8")
+        buffer = io.BytesIO()
+        np.savez(buffer, version=np.int32(FORMAT_VERSION), offsets=self.offsets, doc_ids=self.doc_ids,
+                 tfs=self.tfs, doc_len=self.doc_len,
+                 text=np.frombuffer(text, dtype=np.uint8), vocab=np.frombuffer(vocab, dtype=np.uint8))
+        return zlib.compress(buffer.getvalue(), 6)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        """Index stored by to_bytes, or None for an unknown format"""
+        arrays = np.load(io.BytesIO(zlib.decompress(blob)), allow_pickle=False)
+        if int(arrays["version"]) != FORMAT_VERSION:
+            return None
+        text = arrays["text"].tobytes().decode("utf-8")
+        vocab = arrays["vocab"].tobytes().decode("utf-8")
+        return cls(
+            text.split("\0") if text else [],
+            {term: i for i, term in enumerate(vocab.split("\0"))} if vocab else {},
+            arrays["offsets"], arrays["doc_ids"], arrays["tfs"], arrays["doc_len"]
+        )
+
+
+class RetrievalStats:
+    """Build and query timings, for /api/health"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.build_ms = 0.0
+        self.max_build_ms = 0.0
+        self.queries = 0
+        self.query_ms = 0.0
+        self.max_query_ms = 0.0
+
+    def record_build(self, ms):
+        with self._lock:
+            self.builds += 1
+            self.build_ms += ms
+            self.max_build_ms = max(self.max_build_ms, ms)
+
+    def search(self, index, query, k):
+        """index.top_chunks(query, k), timed"""
+        started = time.perf_counter()
+        chunks = index.top_chunks(query, k)
+        ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.queries += 1
+            self.query_ms += ms
+            self.max_query_ms = max(self.max_query_ms, ms)
+        return chunks
+
+    def stats(self):
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "avg_build_ms": round(self.build_ms / self.builds, 2) if self.builds else 0,
+                "max_build_ms": round(self.max_build_ms, 2),
+                "queries": self.queries,
+                "avg_query_ms": round(self.query_ms / self.queries, 3) if self.queries else 0,
+                "max_query_ms": round(self.max_query_ms, 3)
+            }
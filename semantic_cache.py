@@ -0,0 +1,207 @@
+"""
+Semantic answer cache
+Catches rephrasings of questions a chatbot has already answered ("what are
+your prices?" / "pricing?") that the exact-prompt response cache misses.
+Questions become hashed TF-IDF vectors (word stems + character trigrams,
+NumPy only); a lookup is one matrix-vector product over that chatbot's
+stored questions, and the nearest one above the threshold is a hit.
+Numbers must match exactly: "2 bedroom" and "3 bedroom" look alike to the
+vectors but need different answers.
+
+Each index is tied to a version of the chatbot's content. invalidate() only
+reaches the worker that ran it; other workers see the new version once they
+reload the chatbot record, and drop their old answers then.
+"""
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+STOPWORDS = frozenset("""
+a about an and any are as at be can could do does for from give have how i in is it me my of on or
+please tell the there this to us we what whats when where which who why will with would you your
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+NUMBER_WORDS = {word: str(i) for i, word in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve".split())}
+
+
+def stem(word):
+    for suffix in ("ing", "ies", "es", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+def question_features(text):
+    """Normalized features of a question: content-word stems and their character trigrams"""
+    stems = [stem(w) for w in TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+    features = list(stems)
+    for word in stems:
+        padded = f"<{word}>"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+def question_numbers(text):
+    """The numbers in a question (digits or number words up to twelve), for exact matching"""
+    lowered = text.lower()
+    numbers = {n.replace(",", "") for n in NUMBER_RE.findall(lowered)}
+    numbers.update(NUMBER_WORDS[w] for w in TOKEN_RE.findall(lowered) if w in NUMBER_WORDS)
+    return frozenset(numbers)
+
+
+def hash_vector(features, dim):
+    """Sublinear term frequencies in a fixed number of hashed buckets"""
+    vec = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        vec[zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    np.log1p(vec, out=vec)
+    return vec
+
+
+class ChatbotIndex:
+    """Questions and answers for one chatbot, stored as rows of a growable matrix"""
+
+    def __init__(self, dim, max_entries, version=None):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.vectors = np.zeros((min(16, max_entries), dim), dtype=np.float32)
+        self.doc_freq = np.zeros(dim, dtype=np.float32)
+        self.last_used = np.zeros(len(self.vectors), dtype=np.float64)
+        self.answers = []
+        self.questions = []
+        self.numbers = []
+        self.version = version
+
+    def __len__(self):
+        return len(self.answers)
+
+    def idf(self):
+        n = len(self)
+        return np.log((1.0 + n) / (1.0 + self.doc_freq)) + 1.0
+
+    def nearest(self, vec, numbers=None):
+        """(row, cosine similarity) of the stored question closest to vec under current IDF weights.
+        With numbers given, only questions containing exactly those numbers are considered."""
+        n = len(self)
+        if n == 0 or not vec.any():
+            return None, 0.0
+        idf_sq = self.idf() ** 2
+        rows = self.vectors[:n]
+        dots = rows @ (vec * idf_sq)
+        norms = np.sqrt((rows * rows) @ idf_sq) * np.sqrt((vec * vec) @ idf_sq)
+        sims = np.divide(dots, norms, out=np.zeros(n, dtype=np.float32), where=norms > 0)
+        if numbers is not None:
+            allowed = np.fromiter((stored == numbers for stored in self.numbers), dtype=bool, count=n)
+            if not allowed.any():
+                return None, 0.0
+            sims[~allowed] = -1.0
+        best = int(np.argmax(sims))
+        return best, float(sims[best])
+
+    def add(self, vec, question, answer, now, numbers=frozenset()):
+        n = len(self)
+        if n < self.max_entries:
+            if n == len(self.vectors):
+                grow = min(self.max_entries, len(self.vectors) * 2)
+                self.vectors = np.vstack([self.vectors, np.zeros((grow - n, self.dim), dtype=np.float32)])
+                self.last_used = np.concatenate([self.last_used, np.zeros(grow - n)])
+            row = n
+            self.answers.append(answer)
+            self.questions.append(question)
+            self.numbers.append(numbers)
+        else:
+            # Full: replace the least recently used question
+            row = int(np.argmin(self.last_used[:n]))
+            self.doc_freq -= self.vectors[row] > 0
+            self.answers[row] = answer
+            self.questions[row] = question
+            self.numbers[row] = numbers
+        self.vectors[row] = vec
+        self.doc_freq += vec > 0
+        self.last_used[row] = now
+        return row == n
+
+
+class SemanticCache:
+    """Per-process, per-chatbot nearest-question cache with bounded memory:
+    at most max_chatbots indexes (LRU) of at most max_entries questions each"""
+
+    def __init__(self, threshold=0.85, dim=1024, max_entries=200, max_chatbots=100):
+        self.threshold = threshold
+        self.dim = dim
+        self.max_entries = max_entries
+        self.max_chatbots = max_chatbots
+
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()  # chatbot_id -> ChatbotIndex
+
+        self.lookups = 0
+        self.hits = 0
+        self.entries = 0
+
+    def lookup(self, chatbot_id, question, version=None):
+        """Cached answer to the most similar earlier question, or None.
+        Answers cached under a different content version are dropped."""
+        vec = hash_vector(question_features(question), self.dim)
+        with self._lock:
+            self.lookups += 1
+            index = self._indexes.get(chatbot_id)
+            if index is None:
+                return None
+            if index.version != version:
+                self._drop(chatbot_id)
+                return None
+            self._indexes.move_to_end(chatbot_id)
+            row, similarity = index.nearest(vec, question_numbers(question))
+            if row is None or similarity < self.threshold:
+                return None
+            index.last_used[row] = time.monotonic()
+            self.hits += 1
+            return index.answers[row]
+
+    def add(self, chatbot_id, question, answer, version=None):
+        vec = hash_vector(question_features(question), self.dim)
+        if not vec.any():
+            return
+        with self._lock:
+            index = self._indexes.get(chatbot_id)
+            if index is not None and index.version != version:
+                self._drop(chatbot_id)
+                index = None
+            if index is None:
+                index = self._indexes[chatbot_id] = ChatbotIndex(self.dim, self.max_entries, version)
+                while len(self._indexes) > self.max_chatbots:
+                    _, evicted = self._indexes.popitem(last=False)
+                    self.entries -= len(evicted)
+            self._indexes.move_to_end(chatbot_id)
+            if index.add(vec, question, answer, time.monotonic(), question_numbers(question)):
+                self.entries += 1
+
+    def invalidate(self, chatbot_id):
+        """Forget a chatbot's answers, e.g. after its site is re-scraped"""
+        with self._lock:
+            self._drop(chatbot_id)
+
+    def _drop(self, chatbot_id):
+        index = self._indexes.pop(chatbot_id, None)
+        if index is not None:
+            self.entries -= len(index)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "chatbots": len(self._indexes),
+                "entries": self.entries,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0
+            }
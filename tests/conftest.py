@@ -0,0 +1,146 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeOpenRouter:
+    """Local stand-in for the OpenRouter chat completions endpoint.
+    Tests set per-model delays, replies, error statuses and raw 200 bodies;
+    every request is recorded as (model, streamed)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.0"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.handle(self, body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/chat/completions"
+
+    def reset(self):
+        with self.lock:
+            self.requests = []
+        self.delays = {}
+        self.replies = {}
+        self.status = {}
+        self.bodies = {}
+        self.reply = "We build widgets."
+        self.prompt_tokens = 42
+
+    def handle(self, handler, body):
+        model = body["model"]
+        with self.lock:
+            self.requests.append((model, bool(body.get("stream"))))
+        time.sleep(self.delays.get(model, 0))
+        reply = self.replies.get(model, self.reply)
+        usage = {"prompt_tokens": self.prompt_tokens, "completion_tokens": len(reply.split())}
+        try:
+            status = self.status.get(model, 200)
+            if status != 200:
+                handler.send_response(status)
+                handler.end_headers()
+                return
+            if model in self.bodies:
+                handler.send_response(200)
+                handler.send_header("Content-Length", str(len(self.bodies[model])))
+                handler.end_headers()
+                handler.wfile.write(self.bodies[model])
+                return
+            if not body.get("stream"):
+                payload = json.dumps({"choices": [{"message": {"content": reply}}], "usage": usage}).encode()
+                handler.send_response(200)
+                handler.send_header("Content-Type", "application/json")
+                handler.send_header("Content-Length", str(len(payload)))
+                handler.end_headers()
+                handler.wfile.write(payload)
+                return
+            handler.send_response(200)
+            handler.send_header("Content-Type", "text/event-stream")
+            handler.end_headers()
+            for word in reply.split(" "):
+                chunk = {"choices": [{"delta": {"content": word + " "}}]}
+                handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            handler.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode())
+            handler.wfile.write(b"data: [DONE]\n\n")
+        except OSError:
+            pass  # the client hung up, e.g. a cancelled hedge
+
+    def models_called(self):
+        with self.lock:
+            return [model for model, _ in self.requests]
+
+
+@pytest.fixture(scope="session")
+def fake_openrouter():
+    fake = FakeOpenRouter()
+    yield fake
+    fake.server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def app_module(fake_openrouter, tmp_path_factory):
+    """app.py on a throwaway SQLite database, talking to the fake OpenRouter"""
+    workdir = tmp_path_factory.mktemp("app")
+    os.environ.update(
+        DB_BACKEND="sqlite",
+        SQLITE_PATH=str(workdir / "chatbot.db"),
+        LEAD_SPOOL_DIR=str(workdir / "spool"),
+        LLM_CACHE_BACKEND="memory",
+        OPENROUTER_API_KEY="test",
+        OPENROUTER_API_BASE=fake_openrouter.url,
+        LLM_HEDGE="true",
+        FAQ_PRECOMPUTE="false",
+    )
+    import app
+    import migrations
+    conn = app.DatabaseManager.create_connection()
+    try:
+        migrations.migrate(conn, app.db_backend)
+    finally:
+        conn.close()
+    app.DatabaseManager.check_schema()
+    return app
+
+
+@pytest.fixture
+def llm(fake_openrouter):
+    fake_openrouter.reset()
+    return fake_openrouter
+
+
+@pytest.fixture
+def seed_leads(app_module):
+    """Insert lead rows (dicts of leads columns) straight into the test database"""
+    def seed(rows):
+        columns = sorted({column for row in rows for column in row})
+        conn = app_module.DatabaseManager.create_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(
+                f"INSERT INTO leads ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                [tuple(row.get(column) for column in columns) for row in rows]
+            )
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+    return seed
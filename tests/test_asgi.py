@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from cache import MemoryResponseCache
+from model_router import ModelRouter
+
+BROKEN, BACKUP = "broken/model", "backup/model"
+
+
+@pytest.fixture
+def async_llm(app_module):
+    import asgi
+    return asgi.AsyncLLM(app_module.SmartAI(MemoryResponseCache(), ModelRouter([BROKEN, BACKUP])))
+
+
+def ask(async_llm, prompt):
+    async def run():
+        try:
+            return await async_llm.call_llm(prompt, "bot")
+        finally:
+            await async_llm.aclose()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("body", [
+    b'{"error": {"message": "Provider returned error", "code": 502}}',
+    b'<html>Bad gateway</html>',
+    b'{"choices": []}',
+    b'{"choices": [{"message": {"content": null}}]}',
+])
+def test_unusable_200_falls_back_to_the_next_model(app_module, llm, async_llm, body):
+    llm.bodies[BROKEN] = body
+    assert ask(async_llm, "What do you build?") == "We build widgets."
+    assert llm.models_called() == [BROKEN, BACKUP]
+    health = async_llm.ai.router.stats()
+    assert health[BROKEN]["failures"] == 1 and health[BACKUP]["failures"] == 0
+
+
+def test_every_model_unusable_gives_the_unavailable_reply(app_module, llm, async_llm):
+    llm.bodies[BROKEN] = llm.bodies[BACKUP] = b"not json"
+    assert ask(async_llm, "What do you build?") == app_module.SmartAI.UNAVAILABLE_REPLY
@@ -0,0 +1,43 @@
+from cache import MISSING, LRUCache
+
+
+def test_byte_bound_evicts_oldest_entries():
+    cache = LRUCache(max_entries=10, max_bytes=100, ttl=60)
+    cache.set("a", "A", size=40)
+    cache.set("b", "B", size=40)
+    cache.set("c", "C", size=40)
+    assert cache.get("a") is MISSING
+    assert cache.get("b") == "B" and cache.get("c") == "C"
+    stats = cache.stats()
+    assert stats["bytes"] == 80 and stats["evictions"] == 1
+
+
+def test_oversized_record_is_not_cached_and_keeps_the_rest():
+    cache = LRUCache(max_entries=10, max_bytes=100, ttl=60)
+    cache.set("small", "S", size=10)
+    cache.set("big", "stale", size=10)
+    cache.set("big", "B", size=500)
+    assert cache.get("big") is MISSING  # the stale copy is dropped too
+    assert cache.get("small") == "S"
+
+
+def test_replacing_and_invalidating_keep_byte_count():
+    cache = LRUCache(max_entries=10, max_bytes=100, ttl=60)
+    cache.set("a", 1, size=30)
+    cache.set("a", 2, size=50)
+    assert cache.get("a") == 2 and cache.stats()["bytes"] == 50
+    cache.invalidate("a")
+    cache.invalidate("unknown")
+    assert cache.get("a") is MISSING and cache.stats()["bytes"] == 0
+
+
+def test_stats_count_negative_hits_as_hits():
+    cache = LRUCache(ttl=60)
+    cache.set("bot", {"company_name": "Acme"})
+    cache.set_missing("gone")
+    cache.get("bot")
+    cache.get("gone")
+    cache.get("never-seen")
+    stats = cache.stats()
+    assert (stats["hits"], stats["negative_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == round(2 / 3, 4)
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from content_store import PackedPages, is_packed, load_pages, pack_pages
+
+PAGES = [{"url": f"https://example.com/{i}", "title": f"Page {i}", "content": f"Content of page {i}. " * 200}
+         for i in range(5)]
+
+
+def test_round_trip():
+    blob = pack_pages(PAGES)
+    assert is_packed(blob)
+    pages = load_pages(blob)
+    assert isinstance(pages, PackedPages)
+    assert len(pages) == 5 and pages.to_list() == PAGES
+    assert pages[1:3] == PAGES[1:3]
+    assert pages.packed_size < len(json.dumps(PAGES)) / 10
+
+
+def test_pages_are_inflated_lazily():
+    pages = load_pages(pack_pages(PAGES))
+    assert pages[3] == PAGES[3]
+    assert [page is not None for page in pages._pages] == [False, False, False, True, False]
+
+
+def test_frames_are_reused_without_recompressing():
+    old = load_pages(pack_pages(PAGES))
+    changed = dict(PAGES[2], content="New content")
+    blob = pack_pages(PAGES[:2] + [changed] + PAGES[3:], frames={i: old.frame(i) for i in (0, 1, 3, 4)})
+    pages = load_pages(blob)
+    assert pages[2] == changed and pages[4] == PAGES[4]
+    assert pages.frame(0) == old.frame(0)
+
+
+def test_legacy_and_empty_values():
+    assert load_pages(None) == [] and load_pages("") == []
+    assert load_pages(json.dumps(PAGES)) == PAGES
+    assert load_pages(json.dumps(PAGES).encode("utf-8")) == PAGES
+    empty = load_pages(pack_pages([]))
+    assert len(empty) == 0 and not empty
+
+
+def test_unknown_format_version_is_rejected():
+    with pytest.raises(ValueError):
+        PackedPages(b"\x09" + pack_pages(PAGES)[1:])
@@ -0,0 +1,125 @@
+import re
+
+from crawler import Crawler, FetchResult, conditional_headers, normalize_url, parse_sitemap, validators
+
+ORIGIN = "https://example.com"
+LINK_RE = re.compile(r'href="([^"]+)"')
+
+
+def sitemap(*urls):
+    entries = "".join(f"<url><loc>{url}</loc></url>" for url in urls)
+    return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+
+
+def page(text, *links):
+    return "<html><body><p>" + text + "</p>" + "".join(f'<a href="{link}">x</a>' for link in links) + "</body></html>"
+
+
+def parse(url, html):
+    text = re.sub(r"<[^>]+>", " ", html).strip()
+    return ({"url": url, "content": text} if text else None), LINK_RE.findall(html)
+
+
+def crawl(site, **kwargs):
+    """Run a crawl against a dict of url -> (status, body), recording the fetch batches"""
+    crawler = Crawler(parse, **kwargs)
+    steps = crawler.plan(ORIGIN)
+    batches, results = [], None
+    while True:
+        batch, pages = Crawler.advance(steps, results)
+        if batch is None:
+            return crawler, pages, batches
+        urls, delay, max_bytes = batch
+        batches.append((urls, delay))
+        results = []
+        for url in urls:
+            status, body = site.get(url, (404, "not found"))
+            content_type = "application/xml" if url.endswith(".xml") else "text/html"
+            results.append(FetchResult(url, status, body, content_type, len(body)))
+
+
+def fetched(batches):
+    return [url for urls, _ in batches for url in urls]
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Example.com:443/About/?utm_source=x&b=2&a=1#top") == "https://example.com/About?a=1&b=2"
+    assert normalize_url("/pricing/", "https://example.com/about") == "https://example.com/pricing"
+    assert normalize_url("http://example.com:8080//a//b") == "http://example.com:8080/a/b"
+    assert normalize_url("mailto:sales@example.com") is None
+    assert normalize_url("https://example.com/brochure.pdf") is None
+
+
+def test_parse_sitemap_and_index():
+    with_priority = sitemap("https://example.com/a").replace("</loc>", "</loc><priority>0.9</priority>")
+    pages, nested = parse_sitemap(with_priority)
+    assert pages == [("https://example.com/a", 0.9)] and nested == []
+    index = ('<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+             '<sitemap><loc>https://example.com/s1.xml</loc></sitemap></sitemapindex>')
+    assert parse_sitemap(index) == ([], ["https://example.com/s1.xml"])
+    assert parse_sitemap("<not xml") == ([], [])
+
+
+def test_robots_sitemaps_and_links_drive_the_crawl():
+    site = {
+        f"{ORIGIN}/robots.txt": (200, f"User-agent: *\nDisallow: /private\nSitemap: {ORIGIN}/index.xml\n"),
+        f"{ORIGIN}/index.xml": (200, '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                                     f'<sitemap><loc>{ORIGIN}/pages.xml</loc></sitemap></sitemapindex>'),
+        f"{ORIGIN}/pages.xml": (200, sitemap(f"{ORIGIN}/services", f"{ORIGIN}/private/admin")),
+        f"{ORIGIN}/": (200, page("Home page", "/about", "https://other.example.org/x")),
+        f"{ORIGIN}/services": (200, page("Our services")),
+        f"{ORIGIN}/about": (200, page("About us", "/private/secret")),
+    }
+    crawler, pages, batches = crawl(site)
+    urls = fetched(batches)
+    assert urls[:3] == [f"{ORIGIN}/robots.txt", f"{ORIGIN}/index.xml", f"{ORIGIN}/pages.xml"]
+    assert {p["url"] for p in pages} == {f"{ORIGIN}/", f"{ORIGIN}/services", f"{ORIGIN}/about"}
+    assert pages[0]["url"] == f"{ORIGIN}/"
+    assert not any("/private" in url or "other.example.org" in url for url in urls)
+    assert crawler.report["robots_disallowed"] == 2
+    assert crawler.report["sitemap_urls"] == 2
+
+
+def test_default_sitemap_location_when_robots_is_missing():
+    site = {
+        f"{ORIGIN}/sitemap.xml": (200, sitemap(f"{ORIGIN}/contact")),
+        f"{ORIGIN}/": (200, page("Home")),
+        f"{ORIGIN}/contact": (200, page("Call us")),
+    }
+    _, pages, batches = crawl(site)
+    assert fetched(batches)[1] == f"{ORIGIN}/sitemap.xml"
+    assert [p["url"] for p in pages] == [f"{ORIGIN}/", f"{ORIGIN}/contact"]
+
+
+def test_fractional_crawl_delay_serializes_fetches():
+    site = {
+        f"{ORIGIN}/robots.txt": (200, "User-agent: *\nCrawl-delay: 0.5\n"),
+        f"{ORIGIN}/": (200, page("Home", "/a", "/b")),
+        f"{ORIGIN}/a": (200, page("A")),
+        f"{ORIGIN}/b": (200, page("B")),
+    }
+    crawler, _, batches = crawl(site)
+    assert crawler.report["crawl_delay"] == 0.5
+    page_batches = [(urls, delay) for urls, delay in batches if not urls[0].endswith((".txt", ".xml"))]
+    assert all(len(urls) == 1 and delay == 0.5 for urls, delay in page_batches)
+
+
+def test_page_budget_and_duplicate_content():
+    links = [f"/p{i}" for i in range(10)]
+    site = {f"{ORIGIN}/": (200, page("Home", *links))}
+    site.update({f"{ORIGIN}/p{i}": (200, page("Same text on every page")) for i in range(10)})
+    crawler, pages, _ = crawl(site, max_pages=3)
+    assert len(pages) == 2  # home plus one copy of the duplicated page
+    assert crawler.report["duplicates"] >= 1
+    crawler, pages, _ = crawl({**site, **{f"{ORIGIN}/p{i}": (200, page(f"Page {i}")) for i in range(10)}},
+                              max_pages=3)
+    assert len(pages) == 3 and crawler.report["stopped"] == "page budget"
+
+
+def test_validators_round_trip_to_conditional_headers():
+    result = FetchResult(ORIGIN, 200, "", headers={"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    fields = validators(result)
+    assert fields == {"etag": '"abc"', "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert conditional_headers(**fields) == {"If-None-Match": '"abc"',
+                                             "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert conditional_headers() == {}
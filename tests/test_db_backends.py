@@ -0,0 +1,37 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from db_pool import PoolExhausted
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FailingPool:
+    def __init__(self, error):
+        self.error = error
+
+    def get_connection(self):
+        raise self.error
+
+
+@pytest.mark.parametrize("error", [sqlite3.OperationalError("unable to open database file"),
+                                   PoolExhausted("no connection available")])
+def test_failed_checkout_returns_none(app_module, monkeypatch, error):
+    monkeypatch.setattr(app_module.DatabaseManager, "get_pool", staticmethod(lambda: FailingPool(error)))
+    assert app_module.DatabaseManager.create_connection() is None
+    assert app_module.DatabaseManager.get_chatbot("no-db-bot") is None
+
+
+def test_app_starts_without_a_reachable_mysql(tmp_path):
+    env = dict(os.environ, DB_BACKEND="mysql", MYSQL_HOST="127.0.0.1", MYSQL_PORT="1",
+               LEAD_SPOOL_DIR=str(tmp_path / "spool"), PYTHONPATH=ROOT)
+    script = "import app; print(app.DatabaseManager.create_connection())"
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "[DB] Error" in result.stdout
+    assert result.stdout.strip().splitlines()[-1] == "None"
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from db_backends import SQLiteConnection
+from db_pool import ConnectionPool, PoolExhausted
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / "pool.db")
+    opened = []
+
+    def connect():
+        conn = SQLiteConnection(path)
+        opened.append(conn)
+        return conn
+
+    pool = ConnectionPool(connect, size=2, timeout=0.2, ping=lambda raw: raw.ping())
+    pool.opened = opened
+    yield pool
+    pool.close_all()
+
+
+def test_connections_are_reused(pool):
+    for _ in range(5):
+        conn = pool.get_connection()
+        conn.cursor().execute("SELECT 1")
+        conn.close()
+    assert len(pool.opened) == 1
+    assert pool.stats()["checkouts"] == 5
+
+
+def test_checkout_times_out_when_exhausted(pool):
+    held = [pool.get_connection(), pool.get_connection()]
+    started = time.perf_counter()
+    with pytest.raises(PoolExhausted):
+        pool.get_connection()
+    assert 0.15 <= time.perf_counter() - started < 2
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["waits"] == 1 and stats["in_use"] == 2
+    for conn in held:
+        conn.close()
+
+
+def test_waiter_gets_connection_released_before_timeout(pool):
+    pool.timeout = 2
+    held = [pool.get_connection(), pool.get_connection()]
+    threading.Timer(0.1, held[0].close).start()
+    conn = pool.get_connection()
+    assert conn._raw is held[0]._raw
+    assert pool.stats()["timeouts"] == 0
+    conn.close()
+    held[1].close()
+
+
+def test_failed_connect_frees_its_slot(pool):
+    pool._connect = lambda: (_ for _ in ()).throw(ConnectionError("down"))
+    with pytest.raises(ConnectionError):
+        pool.get_connection()
+    assert pool.stats()["open"] == 0 and pool.stats()["in_use"] == 0
+
+
+def test_old_connections_are_recycled(pool):
+    pool.get_connection().close()
+    pool.recycle = 0.01
+    time.sleep(0.05)
+    pool.get_connection().close()
+    assert len(pool.opened) == 2
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_discard_closes_instead_of_reusing(pool):
+    conn = pool.get_connection()
+    conn.discard()
+    conn.close()  # no-op after discard
+    assert pool.stats()["open"] == 0
+    pool.get_connection().close()
+    assert len(pool.opened) == 2
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from bench_extraction import LAYOUTS, fixture_page
+from extraction import Extractor
+
+HTML = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>Acme Roofing</title>
+<meta name="description" content="Roof repair in Springfield">
+<style>.x{color:red}</style><script>var tracking = "ignore me";</script></head>
+<body><header><nav><a href="/home">Home</a></nav></header>
+<h1>Acme Roofing</h1><h2></h2><h3>Our services</h3>
+<p>We repair and replace roofs across Springfield since 1990.</p>
+<p>Short.</p>
+<!-- a comment that should never show up -->
+<ul><li>Emergency leak repair</li><li>Gutter cleaning and repair</li><li>Tiny</li></ul>
+<table><tr><th>Service</th><th>Price</th></tr><tr><td>Inspection</td><td>$99</td><td></td></tr></table>
+<a href="/pricing">Pricing</a><a href="/partner" rel="nofollow sponsored">Partner</a><a>No href</a>
+<footer><p>Copyright Acme Roofing, all rights reserved.</p></footer></body></html>"""
+
+
+@pytest.mark.parametrize("engine", ["lxml", "bs4"])
+def test_extracts_the_app_layout(engine):
+    text, links, title = Extractor(engine=engine).extract(HTML)
+    assert title == "Acme Roofing"
+    assert text.splitlines() == [
+        "TITLE: Acme Roofing",
+        "DESC: Roof repair in Springfield",
+        "H1: Acme Roofing",
+        "H3: Our services",
+        "We repair and replace roofs across Springfield since 1990.",
+        "• Emergency leak repair",
+        "• Gutter cleaning and repair",
+    ]
+    # Links are read before navigation is dropped; nofollow links are skipped
+    assert links == ["/home", "/pricing"]
+
+
+@pytest.mark.parametrize("engine", ["lxml", "bs4"])
+def test_comprehensive_layout_has_sections_and_tables(engine):
+    text, _, _ = Extractor(engine=engine, **LAYOUTS["complete"]).extract(HTML)
+    assert "=== HEADINGS ===" in text and "=== MAIN CONTENT ===" in text
+    assert text.endswith("=== TABLES ===\nService | Price\nInspection | $99")
+    assert "ignore me" not in text and "comment" not in text and "Copyright" not in text
+
+
+def test_limits_and_max_chars():
+    html = "<html><body>" + "".join(f"<p>Paragraph number {i} with enough text.</p>" for i in range(50)) + "</body></html>"
+    text, _, _ = Extractor(max_paragraphs=5, max_chars=10000).extract(html)
+    assert text.count("Paragraph number") == 5
+    text, _, _ = Extractor(max_paragraphs=50, max_chars=100).extract(html)
+    assert len(text) == 100
+
+
+def test_empty_and_non_utf8_declared_input():
+    assert Extractor().extract("") == ("", [], None)
+    html = '<?xml version="1.0" encoding="iso-8859-1"?><html><head><title>Café</title></head></html>'
+    assert Extractor().extract(html)[2] == "Café"
+
+
+def test_engines_agree_on_generated_pages():
+    rng = random.Random(3)
+    for layout in LAYOUTS.values():
+        lxml, soup = Extractor(engine="lxml", **layout), Extractor(engine="bs4", **layout)
+        for _ in range(10):
+            html = fixture_page(rng, rng.choice((2, 8)))
+            assert lxml.extract(html) == soup.extract(html)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        Extractor(engine="regex")
@@ -0,0 +1,45 @@
+from faq import FAQStore, likely_questions
+
+PAGES = [
+    {"url": "https://acme.test/", "content": "H1: Acme\nWe offer plumbing services.\nPricing starts at $50.\n"
+                                             "H2: Emergency repairs\n• Boiler installation\n• Leak detection."},
+    {"url": "https://acme.test/contact", "content": "H2: Contact us\nOur office address is 1 Main Street.\n"
+                                                    "H2: Emergency repairs"},
+]
+
+
+def test_likely_questions_follow_the_content():
+    questions = likely_questions("Acme", PAGES, limit=20)
+    assert questions == [
+        "What does Acme do?",
+        "What services does Acme offer?",
+        "How much does Acme cost?",
+        "Where is Acme located?",
+        "Tell me about Emergency repairs",
+        "Do you offer Boiler installation?",
+        "Do you offer Leak detection?",
+    ]
+    assert likely_questions("Acme", PAGES, limit=3) == questions[:3]
+
+
+def test_likely_questions_for_a_bare_site():
+    assert likely_questions("Acme", [{"url": "u", "content": "Hello world"}]) == ["What does Acme do?"]
+
+
+def test_store_answers_rephrased_questions_only():
+    store = FAQStore()
+    faqs = [("How much does Acme cost?", "From $50."), ("Where is Acme located?", "1 Main Street.")]
+    assert store.match("acme", faqs, "how much does acme cost") == "From $50."
+    assert store.match("acme", faqs, "Where is Acme located") == "1 Main Street."
+    assert store.match("acme", faqs, "Do you repair boilers on Sundays?") is None
+    assert store.match("acme", [], "how much does acme cost") is None
+    assert store.stats()["hits"] == 2 and store.stats()["lookups"] == 3
+
+
+def test_store_rebuilds_when_the_record_is_reloaded():
+    store = FAQStore()
+    store.match("acme", [("Where is Acme located?", "1 Main Street.")], "Where is Acme located?")
+    reloaded = [("Where is Acme located?", "2 High Street.")]
+    assert store.match("acme", reloaded, "Where is Acme located?") == "2 High Street."
+    store.invalidate("acme")
+    assert store.stats()["chatbots"] == 0
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from crawler import Crawler
+from fetch_engine import FetchEngine, decode_body
+
+
+class Site:
+    """Local site that counts how many requests it is serving at once"""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with site.lock:
+                    site.active += 1
+                    site.peak = max(site.peak, site.active)
+                try:
+                    time.sleep(site.delay)
+                    if self.path == "/big":
+                        body = b"x" * 300000
+                    elif self.path == "/slow":
+                        time.sleep(2)
+                        body = b"late"
+                    elif self.path == "/robots.txt":
+                        self.send_response(404)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    elif self.path == "/":
+                        body = b'<p>Home</p><a href="/a">a</a><a href="/b">b</a>'
+                    else:
+                        body = f"<p>Page {self.path}</p>".encode()
+                    charset = "x-foo" if self.path == "/x-foo" else "utf-8"
+                    self.send_response(200)
+                    self.send_header("Content-Type", f"text/html; charset={charset}")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.send_header("ETag", '"v1"')
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with site.lock:
+                        site.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+
+@pytest.fixture
+def site():
+    site = Site()
+    yield site
+    site.server.shutdown()
+
+
+@pytest.fixture
+def engine():
+    engine = FetchEngine(max_connections=10, per_host=2, read_timeout=5)
+    yield engine
+    engine.close()
+
+
+def test_fetch_returns_text_status_and_headers(site, engine):
+    (result,) = engine.fetch_all([f"{site.base}/a"])
+    assert result.status == 200 and result.text == "<p>Page /a</p>"
+    assert result.is_html and result.headers["etag"] == '"v1"'
+
+
+def test_per_host_limit_caps_concurrent_connections(site, engine):
+    results = engine.fetch_all([f"{site.base}/p{i}" for i in range(8)])
+    assert all(r.status == 200 for r in results)
+    assert site.peak == 2
+    assert engine.stats()["peak_in_flight"] == 2 and engine.stats()["hosts"] == 0
+
+
+def test_global_limit_spans_hosts(engine):
+    sites = [Site() for _ in range(3)]
+    engine.per_host = 10
+    engine.max_connections = 4
+    try:
+        urls = [f"{s.base}/p{i}" for s in sites for i in range(4)]
+        assert all(r.status == 200 for r in engine.fetch_all(urls))
+        assert engine.stats()["peak_in_flight"] == 4
+    finally:
+        for s in sites:
+            s.server.shutdown()
+
+
+def test_bodies_are_cut_at_max_bytes(site, engine):
+    (result,) = engine.fetch_all([f"{site.base}/big"], max_bytes=100000)
+    assert len(result.text) == 100000 and result.nbytes == 100000
+
+
+def test_timeout_and_connection_errors_return_none(site, engine):
+    closed = Site()
+    closed.server.shutdown()
+    closed.server.server_close()
+    results = engine.fetch_all([f"{site.base}/slow", f"{closed.base}/a"], timeout=0.5)
+    assert results == [None, None]
+    stats = engine.stats()
+    assert stats["timeouts"] == 1 and stats["errors"] == 1
+
+
+def test_crawl_from_sync_and_async_callers(site, engine):
+    def parse(url, html):
+        return {"url": url, "content": html}, ["/a", "/b"]
+
+    pages = engine.crawl(Crawler(parse, max_pages=3), site.base)
+    assert sorted(p["url"] for p in pages) == sorted([f"{site.base}/", f"{site.base}/a", f"{site.base}/b"])
+    assert all(p["etag"] == '"v1"' for p in pages)
+
+    async def crawl_twice():
+        return await asyncio.gather(engine.crawl_async(Crawler(parse, max_pages=3), site.base),
+                                    engine.crawl_async(Crawler(parse, max_pages=3), site.base))
+
+    assert [len(pages) for pages in asyncio.run(crawl_twice())] == [3, 3]
+    assert site.peak <= 2
+    assert engine.stats()["crawls"] == 3 and engine.stats()["active_crawls"] == 0
+
+
+def test_unknown_charset_label_decodes_as_utf8(site, engine):
+    (result,) = engine.fetch_all([f"{site.base}/x-foo"])
+    assert result.status == 200 and result.text == "<p>Page /x-foo</p>"
+    assert decode_body("caf\u00e9".encode("latin-1"), "latin-1") == "caf\u00e9"
+    assert decode_body(b"caf\xc3\xa9 \xff", "no-such-charset") == "caf\u00e9 \ufffd"
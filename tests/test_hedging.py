@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from cache import MemoryResponseCache
+from model_router import HedgePolicy, ModelRouter
+
+PRIMARY, SECONDARY = "primary/model", "secondary/model"
+
+
+@pytest.fixture
+def hedged(app_module, llm, monkeypatch):
+    # Cancelled losers give their thread back within half a second
+    monkeypatch.setattr(app_module, "LLM_HEDGE_READ_TIMEOUT", 0.5)
+    router = ModelRouter([PRIMARY, SECONDARY])
+    policy = HedgePolicy(router, default_delay=0.2, ratio=1.0)
+    return app_module.SmartAI(MemoryResponseCache(), router, policy)
+
+
+def idle_hedge_threads(app_module):
+    executor = app_module.hedge_executor
+    return executor._idle_semaphore._value == len(executor._threads)
+
+
+def test_hedge_budget_limits_extra_requests():
+    policy = HedgePolicy(ModelRouter([PRIMARY, SECONDARY]), ratio=0.1, burst=3)
+    policy.start("bot")
+    assert policy.allow("bot")
+    # 0.1 token earned per request: the next hedge needs ten more requests
+    for _ in range(5):
+        policy.start("bot")
+        assert not policy.allow("bot")
+    assert policy.stats()["budget_denied"] == 5
+
+
+def test_fast_primary_is_not_hedged(app_module, llm, hedged):
+    assert hedged.call_llm("What do you build?", "bot") == "We build widgets."
+    assert llm.models_called() == [PRIMARY]
+    assert hedged.hedge.stats()["fired"] == 0
+
+
+def test_slow_primary_loses_to_hedge(app_module, llm, hedged):
+    llm.delays[PRIMARY] = 5
+    llm.replies[SECONDARY] = "Hedge answer."
+    started = time.perf_counter()
+    assert hedged.call_llm("What do you build?", "bot") == "Hedge answer."
+    assert time.perf_counter() - started < 2
+    assert llm.models_called() == [PRIMARY, SECONDARY]
+    stats = hedged.hedge.stats()
+    assert stats["fired"] == 1 and stats["hedge_wins"] == 1 and stats["cancelled"] == 1
+
+
+def test_cancelled_loser_frees_its_thread_within_read_timeout(app_module, llm, hedged):
+    llm.delays[PRIMARY] = 5
+    hedged.call_llm("What do you build?", "bot")
+    deadline = time.monotonic() + 2
+    while not idle_hedge_threads(app_module) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert idle_hedge_threads(app_module)
+    # The loser was cancelled, not failed: its circuit stays closed
+    assert hedged.router.stats()[PRIMARY]["state"] == "closed"
+
+
+def test_winning_hedge_records_usage(app_module, llm, hedged):
+    winner = "usage/model"
+    router = ModelRouter([PRIMARY, winner])
+    ai = app_module.SmartAI(MemoryResponseCache(), router, HedgePolicy(router, default_delay=0.2, ratio=1.0))
+    llm.delays[PRIMARY] = 5
+    llm.prompt_tokens = 321
+    ai.call_llm("What do you build?", "bot")
+    assert app_module.prompt_builder.stats()[winner]["avg_reported_prompt_tokens"] == 321
+
+
+def test_failed_primary_falls_back_without_waiting(app_module, llm, hedged):
+    llm.status[PRIMARY] = 500
+    started = time.perf_counter()
+    assert hedged.call_llm("What do you build?", "bot") == "We build widgets."
+    assert time.perf_counter() - started < 1
+    assert llm.models_called() == [PRIMARY, SECONDARY]
@@ -0,0 +1,70 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from http_client import HTTPClient, create_client
+
+
+@pytest.fixture
+def server():
+    """HTTP/1.1 server that records the client port of every request"""
+    ports = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            ports.append(self.client_address[1])
+            body = self.headers.get("X-Token", "").encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/", ports
+    httpd.shutdown()
+
+
+def test_requests_reuse_one_kept_alive_connection(server):
+    url, ports = server
+    client = HTTPClient(headers={"X-Token": "secret"})
+    for _ in range(5):
+        resp = client.get(url)
+        assert resp.text == "secret"
+    assert len(ports) == 5 and len(set(ports)) == 1
+    assert client.stats()["requests"] == 5
+    client.close()
+
+
+def test_new_process_gets_its_own_session(server):
+    url, ports = server
+    client = HTTPClient()
+    client.get(url)
+    first = client.session()
+    client._pid = -1  # as seen from a forked worker
+    client.get(url)
+    assert client.session() is not first
+    assert len(set(ports)) == 2
+
+
+def test_failed_requests_are_counted():
+    client = HTTPClient(connect_timeout=0.5, read_timeout=0.5)
+    with pytest.raises(requests.RequestException):
+        client.get("http://127.0.0.1:1/")
+    assert client.stats()["errors"] == 1
+
+
+def test_create_client_reads_prefixed_settings(monkeypatch):
+    monkeypatch.setenv("TEST_HTTP_POOL_SIZE", "3")
+    monkeypatch.setenv("TEST_CONNECT_TIMEOUT", "1.5")
+    monkeypatch.setenv("TEST_READ_TIMEOUT", "7")
+    client = create_client("TEST")
+    assert (client.pool_size, client.timeout) == (3, (1.5, 7.0))
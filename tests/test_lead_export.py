@@ -0,0 +1,54 @@
+import json
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def chatbot_id(seed_leads):
+    chatbot_id = f"export-{uuid.uuid4().hex[:8]}"
+    seed_leads([{"username": f"Visitor {i}", "chatbot_id": chatbot_id, "company_name": "Acme",
+                 "timestart": f"2026-01-0{i + 1} 10:00:00", "conversation": "[]"} for i in range(3)])
+    return chatbot_id
+
+
+def in_use(app_module):
+    return app_module.DatabaseManager.pool_stats()["in_use"]
+
+
+def test_export_streams_every_row(app_module, chatbot_id):
+    resp = app_module.app.test_client().get(f"/api/leads/export?chatbot_id={chatbot_id}&fields=username,timestart")
+    assert resp.status_code == 200 and resp.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [row["username"] for row in rows] == ["Visitor 0", "Visitor 1", "Visitor 2"]
+    assert set(rows[0]) == {"username", "timestart"}
+    assert in_use(app_module) == 0
+
+
+def test_csv_export_has_a_header_row(app_module, chatbot_id):
+    resp = app_module.app.test_client().get(f"/api/leads/export?chatbot_id={chatbot_id}&format=csv&fields=username")
+    assert resp.get_data(as_text=True).splitlines() == ["username", "Visitor 0", "Visitor 1", "Visitor 2"]
+
+
+def test_head_requests_give_the_connection_back(app_module, chatbot_id):
+    client = app_module.app.test_client()
+    size = app_module.DatabaseManager.pool_stats()["size"]
+    for _ in range(size + 1):
+        resp = client.head(f"/api/leads/export?chatbot_id={chatbot_id}")
+        assert resp.status_code == 200
+        resp.close()
+        assert in_use(app_module) == 0
+    assert client.get("/api/leads").status_code == 200
+
+
+def test_unread_export_gives_the_connection_back(app_module, chatbot_id):
+    resp = app_module.app.test_client().get(f"/api/leads/export?chatbot_id={chatbot_id}", buffered=False)
+    assert in_use(app_module) == 1
+    resp.close()
+    assert in_use(app_module) == 0
+
+
+def test_bad_arguments_are_rejected(app_module):
+    client = app_module.app.test_client()
+    assert client.get("/api/leads/export?format=xml").status_code == 400
+    assert client.get("/api/leads/export?fields=password").status_code == 400
@@ -0,0 +1,70 @@
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def chatbot_id(seed_leads):
+    chatbot_id = f"stats-{uuid.uuid4().hex[:8]}"
+    lead = dict(chatbot_id=chatbot_id, company_name="Acme")
+    seed_leads([
+        dict(lead, username="Emailed", mailid="ann@example.com", questions_asked=3,
+             timestart="2026-01-01 10:00:00", timeend="2026-01-01 10:05:00"),
+        dict(lead, username="Declined", mailid="not_provided@example.com", phonenumber="Not provided",
+             questions_asked=1, timestart="2026-01-01 12:00:00"),
+        dict(lead, username="Phoned", phonenumber="555-0100", questions_asked=2,
+             timestart="2026-01-02 09:00:00", timeend="2026-01-02 09:01:00"),
+        dict(lead, username="Silent", questions_asked=0, timestart="2026-02-01 08:00:00"),
+    ])
+    return chatbot_id
+
+
+def stats(app_module, query):
+    resp = app_module.app.test_client().get(f"/api/stats?{query}")
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def test_totals_for_one_chatbot(app_module, chatbot_id):
+    assert stats(app_module, f"chatbot_id={chatbot_id}")["stats"] == {
+        "total_leads": 4,
+        "total_questions": 6,
+        "avg_questions": 1.5,
+        "converted_leads": 2,
+        "conversion_rate": 0.5,
+        "completed_sessions": 2,
+        "avg_duration_seconds": 180.0,
+        "max_duration_seconds": 300,
+    }
+
+
+def test_date_range_includes_since_and_excludes_until(app_module, chatbot_id):
+    result = stats(app_module, f"chatbot_id={chatbot_id}&since=2026-01-02&until=2026-02-01T08:00:00")["stats"]
+    assert (result["total_leads"], result["converted_leads"], result["conversion_rate"]) == (1, 1, 1.0)
+    assert result["max_duration_seconds"] == 60
+
+
+def test_no_leads_gives_zero_rates(app_module, chatbot_id):
+    result = stats(app_module, f"chatbot_id={chatbot_id}&since=2030-01-01")["stats"]
+    assert result["total_leads"] == 0 and result["conversion_rate"] == 0 and result["avg_questions"] == 0
+    assert result["avg_duration_seconds"] is None and result["max_duration_seconds"] is None
+    assert stats(app_module, "chatbot_id=no-such-bot")["stats"]["total_leads"] == 0
+
+
+def test_breakdown_by_chatbot_and_month(app_module, chatbot_id, seed_leads):
+    other = f"stats-{uuid.uuid4().hex[:8]}"
+    seed_leads([dict(chatbot_id=other, username="Other", mailid="bo@example.com", timestart="2026-01-05 10:00:00")])
+    by_chatbot = stats(app_module, "group_by=chatbot&since=2026-01-01&until=2026-03-01")["breakdown"]
+    counts = {row["chatbot_id"]: row["total_leads"] for row in by_chatbot}
+    assert counts[chatbot_id] == 4 and counts[other] == 1
+
+    by_month = stats(app_module, f"chatbot_id={chatbot_id}&interval=month")["breakdown"]
+    assert [(row["bucket"], row["total_leads"], row["converted_leads"]) for row in by_month] == [
+        ("2026-01-01", 3, 2), ("2026-02-01", 1, 0)]
+
+
+def test_bad_arguments_are_rejected(app_module):
+    client = app_module.app.test_client()
+    assert client.get("/api/stats?interval=week").status_code == 400
+    assert client.get("/api/stats?group_by=company").status_code == 400
+    assert client.get("/api/stats?since=yesterday").status_code == 400
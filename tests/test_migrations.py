@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+
+import migrations
+from content_store import is_packed, load_pages
+from db_backends import SQLiteBackend
+from retrieval import ChunkIndex
+
+PAGES = [{"url": "https://example.com/", "title": "Home", "content": "We sell blue widgets and repair them."}]
+
+
+def fetch_all(conn, sql, params=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def test_fresh_database_reaches_schema_version(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "fresh.db"))
+    conn = backend.connect()
+    try:
+        assert migrations.migrate(conn, backend) == [number for number, _, _ in migrations.MIGRATIONS]
+        assert migrations.current_version(conn) == migrations.SCHEMA_VERSION
+        tables = {row[0] for row in fetch_all(conn, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"leads", "chatbots", "messages", "faq_answers", "scraped_pages", "schema_migrations"} <= tables
+        # A second run finds nothing to do
+        assert migrations.migrate(conn, backend) == []
+    finally:
+        conn.close()
+
+
+def test_legacy_rows_are_repacked_and_indexed(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "legacy.db"))
+    conn = backend.connect()
+    try:
+        assert migrations.migrate(conn, backend, target=1) == [1]
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO chatbots (chatbot_id, company_name, website_url, scraped_content) VALUES (%s, %s, %s, %s)",
+            ("legacy", "Legacy Co", "https://example.com/", json.dumps(PAGES))
+        )
+        conn.commit()
+        cursor.close()
+
+        assert migrations.migrate(conn, backend) == [2, 3, 4, 5, 6]
+        raw, index = fetch_all(conn, "SELECT scraped_content, search_index FROM chatbots WHERE chatbot_id = %s",
+                               ("legacy",))[0]
+        assert is_packed(raw) and load_pages(raw).to_list() == PAGES
+        assert ChunkIndex.from_bytes(index).search("widgets repair")
+    finally:
+        conn.close()
+
+
+def test_main_upgrades_and_reports_status(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "cli.db"))
+
+    assert migrations.main(["migrations.py", "status"]) == 0
+    assert "applied" not in capsys.readouterr().out
+    assert migrations.main(["migrations.py"]) == 0
+    assert f"version {migrations.SCHEMA_VERSION}" in capsys.readouterr().out
+    assert migrations.main(["migrations.py", "status"]) == 0
+    assert "pending" not in capsys.readouterr().out
+    assert migrations.main(["migrations.py", "downgrade"]) == 2
+
+
+def test_main_does_not_import_app(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, DB_BACKEND="sqlite", SQLITE_PATH=str(tmp_path / "cli.db"))
+    script = "import sys, migrations; migrations.main(['migrations.py']); print('app' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=dict(env, PYTHONPATH=root),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "False"
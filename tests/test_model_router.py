@@ -0,0 +1,94 @@
+import time
+
+from model_router import CLOSED, HALF_OPEN, OPEN, ModelRouter
+
+MODELS = ["a", "b", "c"]
+
+
+def open_circuit(router, model):
+    for _ in range(router.failure_threshold):
+        router.record_failure(model)
+
+
+def test_fastest_healthy_model_goes_first():
+    router = ModelRouter(MODELS)
+    # Unmeasured models are tried in configured order
+    assert router.candidates() == MODELS
+    router.record_success("a", 2.0)
+    router.record_success("b", 0.5)
+    router.record_success("c", 1.0)
+    assert router.candidates() == ["b", "c", "a"]
+
+
+def test_consecutive_failures_open_the_circuit():
+    router = ModelRouter(MODELS, failure_threshold=3, cooldown=30)
+    router.record_failure("a")
+    router.record_failure("a")
+    assert router.stats()["a"]["state"] == CLOSED
+    router.record_failure("a")
+    assert router.stats()["a"]["state"] == OPEN
+    assert "a" not in router.candidates()
+
+
+def test_rate_limit_opens_immediately_with_retry_after_floor():
+    router = ModelRouter(MODELS, cooldown=5)
+    router.record_failure("b", rate_limited=True, retry_after=60)
+    stats = router.stats()["b"]
+    assert stats["state"] == OPEN and stats["cooldown_remaining"] > 50
+
+
+def test_half_open_admits_one_probe_at_a_time():
+    router = ModelRouter(MODELS, cooldown=0.05)
+    open_circuit(router, "a")
+    time.sleep(0.1)
+    first = router.candidates()
+    assert first[0] == "a"
+    assert router.stats()["a"]["state"] == HALF_OPEN
+    # A concurrent request does not get a second probe
+    assert "a" not in router.candidates()
+
+
+def test_successful_probe_closes_the_circuit():
+    router = ModelRouter(MODELS, cooldown=0.05)
+    open_circuit(router, "a")
+    time.sleep(0.1)
+    router.candidates()
+    router.record_success("a", 0.2)
+    assert router.stats()["a"]["state"] == CLOSED
+    assert "a" in router.candidates()
+
+
+def test_failed_probe_doubles_the_cooldown():
+    router = ModelRouter(MODELS, cooldown=0.05, max_cooldown=300)
+    open_circuit(router, "a")
+    time.sleep(0.1)
+    router.candidates()
+    router.record_failure("a")
+    health = router._health["a"]
+    assert health.state == OPEN and health.cooldown == 0.1
+
+
+def test_unused_probe_slot_is_released():
+    router = ModelRouter(MODELS, cooldown=0.05)
+    open_circuit(router, "a")
+    time.sleep(0.1)
+    router.candidates()
+    router.release("a")
+    assert router.stats()["a"]["state"] == OPEN
+    assert router.candidates()[0] == "a"
+
+
+def test_all_open_still_offers_soonest_to_recover():
+    router = ModelRouter(["a", "b"], cooldown=30)
+    open_circuit(router, "b")
+    open_circuit(router, "a")
+    assert router.candidates() == ["b", "a"]
+
+
+def test_latency_percentile_needs_enough_samples():
+    router = ModelRouter(MODELS)
+    for i in range(19):
+        router.record_success("a", i / 100)
+    assert router.latency_percentile("a", 95) is None
+    router.record_success("a", 0.19)
+    assert router.latency_percentile("a", 95) == 0.18
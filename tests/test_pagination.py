@@ -0,0 +1,85 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def chatbot_id(seed_leads):
+    """Eleven leads, with runs of identical timestart values so the userid tie-break matters"""
+    chatbot_id = f"page-{uuid.uuid4().hex[:8]}"
+    times = ["2026-01-01 10:00:00"] * 4 + ["2026-01-02 10:00:00"] * 3 + [f"2026-01-0{d} 10:00:00" for d in (3, 4, 5, 6)]
+    seed_leads([dict(chatbot_id=chatbot_id, company_name="Acme", username=f"Visitor {i}", timestart=ts,
+                     conversation="[]") for i, ts in enumerate(times)])
+    return chatbot_id
+
+
+def page_through(app_module, chatbot_id, limit):
+    client = app_module.app.test_client()
+    seen, pages, cursor = [], 0, None
+    while True:
+        url = f"/api/leads?chatbot_id={chatbot_id}&limit={limit}&fields=username,timestart"
+        resp = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert len(body["leads"]) <= limit
+        seen.extend(lead["username"] for lead in body["leads"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return seen, pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 10, 11, 50])
+def test_every_row_appears_exactly_once(app_module, chatbot_id, limit):
+    seen, pages = page_through(app_module, chatbot_id, limit)
+    assert sorted(seen) == sorted(f"Visitor {i}" for i in range(11))
+    assert len(seen) == len(set(seen))
+    assert pages == max(1, -(-11 // limit))
+
+
+def test_newest_first_with_ties_broken_by_id(app_module, chatbot_id):
+    seen, _ = page_through(app_module, chatbot_id, 3)
+    assert seen == [f"Visitor {i}" for i in (10, 9, 8, 7, 6, 5, 4, 3, 2, 1, 0)]
+
+
+def test_cursor_round_trip(app_module):
+    key = (datetime(2026, 1, 2, 10, 0, 0), 42)
+    token = app_module.encode_cursor(key)
+    assert "=" not in token
+    assert app_module.decode_cursor(token) == key
+
+
+def token(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    token({"ts": "2026-01-01"}),
+    token(["2026-01-01T10:00:00"]),
+    token(["yesterday", 1]),
+    token([None, 1]),
+    token(["2026-01-01T10:00:00", "one"]),
+    token(5),
+])
+def test_tampered_cursor_is_a_400(app_module, cursor):
+    client = app_module.app.test_client()
+    for path in ("/api/leads", "/api/chatbots"):
+        resp = client.get(f"{path}?cursor={cursor}")
+        assert resp.status_code == 400
+        assert resp.get_json()["success"] is False
+
+
+def test_field_projection_and_limits(app_module, chatbot_id):
+    client = app_module.app.test_client()
+    lead = client.get(f"/api/leads?chatbot_id={chatbot_id}&limit=1").get_json()["leads"][0]
+    assert "conversation" not in lead
+    lead = client.get(f"/api/leads?chatbot_id={chatbot_id}&limit=1&fields=*").get_json()["leads"][0]
+    assert "conversation" in lead
+    assert client.get("/api/leads?fields=password").status_code == 400
+    assert client.get("/api/leads?limit=0").status_code == 400
+    assert client.get("/api/leads?limit=ten").status_code == 400
@@ -0,0 +1,57 @@
+from prompt_builder import ModelBudget, PromptBuilder, estimate_tokens
+
+TEMPLATE = "Company: {company}\n\nContext:\n{context}\n\nQuestion: {question}"
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 400) == 100
+    # Short words and punctuation cost at least ~0.75 tokens each
+    assert estimate_tokens("a , b , c , d") == 6
+
+
+def test_pack_context_keeps_whole_lines_in_order_without_repeats():
+    context, used, truncated = PromptBuilder.pack_context(["first line\nsecond line", "first line\nthird line"], 100)
+    assert context == "first line\nsecond line\nthird line"
+    assert not truncated and used == sum(estimate_tokens(l) for l in context.splitlines())
+
+
+def test_pack_context_cuts_the_overflowing_line_at_a_word():
+    long_line = " ".join(f"word{i}" for i in range(100))
+    context, used, truncated = PromptBuilder.pack_context(["short line", long_line, "never reached"], 30)
+    assert truncated and used <= 30
+    first, cut = context.split("\n")
+    assert first == "short line"
+    assert long_line.startswith(cut) and long_line[len(cut)] == " "
+    assert "never reached" not in context
+
+
+def test_prompt_is_repacked_per_model_budget():
+    builder = PromptBuilder({"small": ModelBudget(8192, 20), "large": ModelBudget(8192, 2000)},
+                            default_context_tokens=50)
+    sections = ["\n".join(f"Fact number {i} about the company and its services." for i in range(100))]
+    prompt = builder.build(TEMPLATE, sections, company="Acme", question="What do you do?")
+    small, small_max = builder.render(prompt, "small")
+    large, _ = builder.render(prompt, "large")
+    assert len(small) < len(prompt) < len(large)
+    assert small.startswith("Company: Acme") and small.endswith("Question: What do you do?")
+    assert small_max == 150
+    stats = builder.stats()
+    assert stats["small"]["truncated_rate"] == 1.0 and stats["large"]["truncated_rate"] == 0.0
+
+
+def test_context_never_crowds_out_the_reply():
+    builder = PromptBuilder({"tiny": ModelBudget(300, 10000, reply_tokens=100)})
+    prompt = builder.build(TEMPLATE, ["word " * 5000], company="Acme", question="Hours?")
+    text, max_tokens = builder.render(prompt, "tiny")
+    assert estimate_tokens(text) + max_tokens <= 300
+    assert max_tokens == 100
+
+
+def test_plain_strings_pass_through_and_usage_is_recorded():
+    builder = PromptBuilder()
+    text, _ = builder.render("Just a question", "unknown/model")
+    assert text == "Just a question"
+    builder.record_usage("unknown/model", {"prompt_tokens": 12})
+    builder.record_usage("unknown/model", None)
+    assert builder.stats()["unknown/model"]["avg_reported_prompt_tokens"] == 12
@@ -0,0 +1,139 @@
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+def html(title, text):
+    return (f"<html><head><title>{title}</title></head><body><main><h1>{title}</h1>"
+            f"<p>{text} " + "We have served customers across the region for many years. " * 3 +
+            "</p></main></body></html>")
+
+
+class Site:
+    """Local website: path -> (status, html, etag); answers 304 when If-None-Match matches"""
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests.append((self.path, self.headers.get("If-None-Match")))
+                status, body, etag = site.pages.get(self.path, (404, "not found", None))
+                if etag and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                payload = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(payload)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.origin = f"http://127.0.0.1:{self.server.server_port}"
+
+
+@pytest.fixture
+def site():
+    site = Site()
+    yield site
+    site.server.shutdown()
+
+
+def create(app, site, etags=True):
+    """Store a chatbot whose pages are the site's current pages, as a fresh scrape would"""
+    chatbot_id = f"refresh-{uuid.uuid4().hex[:8]}"
+    scraper = app.EnhancedScraper()
+    pages = []
+    for path, (_, body, etag) in site.pages.items():
+        page = scraper.parse_page(site.origin + path, body)
+        if etags and etag:
+            page["etag"] = etag
+        pages.append(page)
+    assert app.DatabaseManager.save_chatbot(chatbot_id, "Acme", site.origin + "/", pages, {}, "<script></script>")
+    assert app.DatabaseManager.get_chatbot(chatbot_id)  # warms chatbot_cache
+    return chatbot_id
+
+
+def contents(app, chatbot_id):
+    return {page["url"]: page["content"] for page in app.DatabaseManager.get_chatbot(chatbot_id)["scraped_content"]}
+
+
+def test_all_not_modified_keeps_content_and_caches(app_module, site):
+    site.pages = {"/": (200, html("Home", "Welcome to Acme."), '"h1"'),
+                  "/about": (200, html("About", "Acme makes widgets."), '"a1"')}
+    chatbot_id = create(app_module, site)
+    before = app_module.DatabaseManager.get_chatbot(chatbot_id)
+    site.requests.clear()
+
+    payload, status = app_module.refresh_chatbot(chatbot_id)
+    assert status == 200 and payload["updated"] is False
+    assert payload["not_modified"] == 2 and payload["changed"] == 0
+    assert sorted(site.requests) == [("/", '"h1"'), ("/about", '"a1"')]
+    assert app_module.chatbot_cache.get(chatbot_id) is before
+
+
+def test_only_changed_page_is_updated(app_module, site):
+    site.pages = {"/": (200, html("Home", "Welcome to Acme."), '"h1"'),
+                  "/about": (200, html("About", "Acme makes widgets."), '"a1"')}
+    chatbot_id = create(app_module, site)
+    home = contents(app_module, chatbot_id)[site.origin + "/"]
+    site.pages["/about"] = (200, html("About", "Acme now makes gadgets too."), '"a2"')
+
+    payload, status = app_module.refresh_chatbot(chatbot_id)
+    assert status == 200 and payload["updated"] is True
+    assert (payload["changed"], payload["not_modified"]) == (1, 1)
+    assert app_module.chatbot_cache.get(chatbot_id) is app_module.MISSING
+    after = contents(app_module, chatbot_id)
+    assert after[site.origin + "/"] == home
+    assert "gadgets" in after[site.origin + "/about"]
+    assert app_module.DatabaseManager.get_page_state(chatbot_id)[site.origin + "/about"]["etag"] == '"a2"'
+
+    # The new validator is used next time
+    payload, _ = app_module.refresh_chatbot(chatbot_id)
+    assert payload["not_modified"] == 2 and payload["updated"] is False
+
+
+def test_missing_page_is_removed(app_module, site):
+    site.pages = {"/": (200, html("Home", "Welcome to Acme."), '"h1"'),
+                  "/old": (200, html("Old", "A retired product line."), '"o1"')}
+    chatbot_id = create(app_module, site)
+    del site.pages["/old"]
+
+    payload, _ = app_module.refresh_chatbot(chatbot_id)
+    assert payload["removed"] == 1 and payload["updated"] is True
+    assert list(contents(app_module, chatbot_id)) == [site.origin + "/"]
+    assert site.origin + "/old" not in app_module.DatabaseManager.get_page_state(chatbot_id)
+
+
+def test_without_validators_content_hash_decides(app_module, site):
+    site.pages = {"/": (200, html("Home", "Welcome to Acme."), None),
+                  "/about": (200, html("About", "Acme makes widgets."), None)}
+    chatbot_id = create(app_module, site, etags=False)
+    before = app_module.DatabaseManager.get_chatbot(chatbot_id)
+
+    payload, _ = app_module.refresh_chatbot(chatbot_id)
+    assert payload["unchanged"] == 2 and payload["updated"] is False
+    assert app_module.chatbot_cache.get(chatbot_id) is before
+
+    site.pages["/"] = (200, html("Home", "Welcome to the new Acme."), None)
+    payload, _ = app_module.refresh_chatbot(chatbot_id)
+    assert (payload["changed"], payload["unchanged"]) == (1, 1)
+    assert "new Acme" in contents(app_module, chatbot_id)[site.origin + "/"]
+
+
+def test_unknown_chatbot(app_module):
+    assert app_module.refresh_chatbot("no-such-bot")[1] == 404
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from cache import MISSING, LRUCache, MemoryResponseCache, SQLiteResponseCache
+
+
+@pytest.fixture
+def shared(tmp_path):
+    """Two handles on one cache file, standing in for two workers"""
+    path = str(tmp_path / "llm_cache.db")
+    return SQLiteResponseCache(path, max_entries=3, prune_every=1), SQLiteResponseCache(path, max_entries=3, prune_every=1)
+
+
+def test_lru_cache_ttl_and_negative_entries():
+    cache = LRUCache(max_entries=2, ttl=0.05, negative_ttl=0.05)
+    cache.set("a", 1)
+    cache.set_missing("b")
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    time.sleep(0.1)
+    assert cache.get("a") is MISSING and cache.get("b") is MISSING
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_invalidate_namespace_hides_only_that_namespace(backend, tmp_path):
+    cache = MemoryResponseCache() if backend == "memory" else SQLiteResponseCache(str(tmp_path / "c.db"))
+    cache.set("bot1", "prompt", "one")
+    cache.set("bot2", "prompt", "two")
+    cache.invalidate_namespace("bot1")
+    assert cache.get("bot1", "prompt") is MISSING
+    assert cache.get("bot2", "prompt") == "two"
+    cache.set("bot1", "prompt", "fresh")
+    assert cache.get("bot1", "prompt") == "fresh"
+
+
+def test_sqlite_cache_is_shared_and_bounded(shared):
+    first, second = shared
+    for i in range(5):
+        first.set("bot", f"prompt {i}", f"answer {i}")
+    assert second.get("bot", "prompt 4") == "answer 4"
+    assert second.stats()["entries"] == 3
+    assert first.stats()["evictions"] == 2
+
+
+def test_sqlite_cache_entries_expire(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "c.db"), ttl=0)
+    cache.set("bot", "prompt", "answer")
+    assert cache.get("bot", "prompt") is MISSING
+
+
+def test_lease_is_exclusive_until_released(shared):
+    first, second = shared
+    assert first.acquire_lease("bot", "prompt", ttl=30)
+    assert not second.acquire_lease("bot", "prompt", ttl=30)
+    first.release_lease("bot", "prompt")
+    assert second.acquire_lease("bot", "prompt", ttl=30)
+
+
+def test_expired_lease_can_be_taken_over(shared):
+    first, second = shared
+    assert first.acquire_lease("bot", "prompt", ttl=0.05)
+    time.sleep(0.1)
+    assert second.acquire_lease("bot", "prompt", ttl=30)
+
+
+def test_waiter_gets_leaseholders_answer(shared):
+    leader, follower = shared
+    assert leader.acquire_lease("bot", "prompt", ttl=30)
+
+    def answer():
+        time.sleep(0.1)
+        leader.set("bot", "prompt", "computed once")
+        leader.release_lease("bot", "prompt")
+
+    threading.Thread(target=answer).start()
+    assert follower.wait_for("bot", "prompt", timeout=5) == "computed once"
+
+
+def test_waiter_gives_up_when_lease_released_without_answer(shared):
+    leader, follower = shared
+    assert leader.acquire_lease("bot", "prompt", ttl=30)
+    threading.Timer(0.1, leader.release_lease, ("bot", "prompt")).start()
+    started = time.monotonic()
+    assert follower.wait_for("bot", "prompt", timeout=5) is MISSING
+    assert time.monotonic() - started < 2
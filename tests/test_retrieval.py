@@ -0,0 +1,80 @@
+import math
+
+import pytest
+
+from retrieval import ChunkIndex, chunk_pages, terms
+
+PAGES = [
+    {"url": "https://example.com/", "content": "Home\nWe install solar panels on family homes.\nContact us today"},
+    {"url": "https://example.com/roofs", "content": "Roof repair\nWe repair roofs and gutters after storms.\n"
+                                                    "Roof inspections are free.\nContact us today"},
+    {"url": "https://example.com/pricing", "content": "Pricing\nSolar installs start at $9,000.\n"
+                                                      "Roof repair starts at $300.\nContact us today"},
+]
+
+
+def reference_bm25(chunks, query, k1=1.2, b=0.75):
+    """Textbook BM25 over the same tokenizer, one chunk at a time"""
+    docs = [terms(chunk) for chunk in chunks]
+    avg_len = sum(len(d) for d in docs) / len(docs)
+    scores = []
+    for doc in docs:
+        score = 0.0
+        for term in set(terms(query)):
+            df = sum(term in d for d in docs)
+            tf = doc.count(term)
+            if not tf:
+                continue
+            idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def test_chunks_drop_lines_repeated_across_pages():
+    chunks = chunk_pages(PAGES, max_words=60)
+    assert len(chunks) == 3
+    assert sum(chunk.count("Contact us today") for chunk in chunks) == 1
+
+
+def test_long_lines_are_split_into_bounded_chunks():
+    page = {"url": "u", "content": " ".join(f"w{i}" for i in range(150))}
+    chunks = chunk_pages([page], max_words=60)
+    assert [len(c.split()) for c in chunks] == [60, 60, 30]
+
+
+def test_scores_match_reference_bm25():
+    index = ChunkIndex.build(PAGES, max_words=8)
+    for query in ("roof repair", "solar panels", "how much does a solar install cost", "storm gutters"):
+        expected = reference_bm25(index.chunks, query)
+        for chunk_id, score in index.search(query, k=len(index)):
+            assert score == pytest.approx(expected[chunk_id], rel=1e-5)
+        best = max(range(len(expected)), key=expected.__getitem__)
+        assert index.search(query, k=1)[0][0] == best
+
+
+def test_rarer_terms_weigh_more():
+    index = ChunkIndex.build(PAGES, max_words=8)
+    # "roof" appears in several chunks, "gutters" in one
+    top = index.top_chunks("roof gutters", k=1)[0]
+    assert "gutters" in top
+
+
+def test_no_match_falls_back_to_leading_chunks():
+    index = ChunkIndex.build(PAGES)
+    assert index.search("quantum chromodynamics") == []
+    assert index.top_chunks("quantum chromodynamics", k=2) == index.chunks[:2]
+
+
+def test_round_trip_through_bytes():
+    index = ChunkIndex.build(PAGES, max_words=8)
+    loaded = ChunkIndex.from_bytes(index.to_bytes())
+    assert loaded.chunks == index.chunks
+    assert loaded.search("roof repair cost") == index.search("roof repair cost")
+
+
+def test_empty_index():
+    index = ChunkIndex.build([])
+    assert len(index) == 0
+    assert index.search("anything") == [] and index.top_chunks("anything") == []
+    assert len(ChunkIndex.from_bytes(index.to_bytes())) == 0
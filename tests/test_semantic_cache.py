@@ -0,0 +1,81 @@
+from semantic_cache import SemanticCache, question_numbers
+
+
+def test_rephrased_question_hits():
+    cache = SemanticCache()
+    cache.add("bot", "What are your opening hours?", "9 to 5")
+    assert cache.lookup("bot", "what are your opening hours") == "9 to 5"
+    assert cache.lookup("bot", "Opening hours?") == "9 to 5"
+    assert cache.lookup("bot", "Do you deliver to Spain?") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_answers_are_per_chatbot():
+    cache = SemanticCache()
+    cache.add("bot1", "What are your opening hours?", "9 to 5")
+    assert cache.lookup("bot2", "What are your opening hours?") is None
+
+
+def test_different_numbers_never_match():
+    cache = SemanticCache()
+    cache.add("bot", "Do you have a 2 bedroom apartment available?", "Yes, two of them")
+    assert cache.lookup("bot", "Do you have a 3 bedroom apartment available?") is None
+    assert cache.lookup("bot", "Do you have an apartment available?") is None
+    assert cache.lookup("bot", "do you have a 2 bedroom apartment available") == "Yes, two of them"
+
+
+def test_nearest_question_with_matching_numbers_wins():
+    cache = SemanticCache()
+    cache.add("bot", "Price of the 2 bedroom apartment?", "$1,000")
+    cache.add("bot", "Price of the 3 bedroom apartment?", "$1,400")
+    assert cache.lookup("bot", "price of the 3 bedroom apartment") == "$1,400"
+
+
+def test_question_numbers():
+    assert question_numbers("Two rooms for 3 nights at $1,200.50") == {"2", "3", "1200.50"}
+    assert question_numbers("What are your prices?") == frozenset()
+
+
+def test_new_content_version_drops_old_answers():
+    cache = SemanticCache()
+    cache.add("bot", "What are your opening hours?", "9 to 5", version="v1")
+    assert cache.lookup("bot", "What are your opening hours?", "v1") == "9 to 5"
+    assert cache.lookup("bot", "What are your opening hours?", "v2") is None
+    assert cache.stats()["entries"] == 0
+    # Nor does an answer computed from the old content come back under the old version
+    assert cache.lookup("bot", "What are your opening hours?", "v1") is None
+
+
+def test_invalidate_and_bounds():
+    cache = SemanticCache(max_entries=2, max_chatbots=2)
+    for i, question in enumerate(["opening hours", "delivery options", "refund policy"]):
+        cache.add("bot1", question, f"answer {i}")
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup("bot1", "refund policy") == "answer 2"
+    cache.add("bot2", "opening hours", "x")
+    cache.add("bot3", "opening hours", "y")
+    # bot1 was least recently used and is gone
+    assert cache.lookup("bot1", "refund policy") is None
+    cache.invalidate("bot3")
+    assert cache.lookup("bot3", "opening hours") is None
+    assert cache.stats()["chatbots"] == 1
+
+
+def test_reply_is_cached_under_the_chatbots_content_version(app_module, llm):
+    app = app_module
+    pages = [{"url": "https://example.com", "title": "Example", "content": "Example Co sells rockets. " * 20}]
+    assert app.DatabaseManager.save_chatbot("semantic-bot", "Example Co", "https://example.com", pages, {}, "")
+    assert app.generate_reply("semantic-bot", "What rockets do you sell?") == "We build widgets."
+    llm.reply = "Something else."
+    assert app.generate_reply("semantic-bot", "what rockets do you sell") == "We build widgets."
+
+    # Content rewritten by another worker: this one notices when its chatbot record is reloaded
+    conn = app.DatabaseManager.create_connection()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE chatbots SET scraped_content = %s WHERE chatbot_id = %s",
+                   (app.pack_pages([{"url": "https://example.com", "content": "Now boats only. " * 20}]),
+                    "semantic-bot"))
+    conn.commit()
+    conn.close()
+    app.chatbot_cache.invalidate("semantic-bot")
+    assert app.generate_reply("semantic-bot", "what rockets do you sell") == "Something else."
@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cache import MemoryResponseCache, SQLiteResponseCache, SingleFlight
+from model_router import ModelRouter
+
+MODEL = "only/model"
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flights.do, "key", slow)
+        started.wait(5)
+        followers = [pool.submit(flights.do, "key", slow) for _ in range(4)]
+        while flights.stats()["coalesced"] < 4:
+            time.sleep(0.01)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_followers_see_the_leaders_exception():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.do, "key", failing)
+        started.wait(5)
+        follower = pool.submit(flights.do, "key", failing)
+        while flights.stats()["coalesced"] < 1:
+            time.sleep(0.01)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+    # The failed flight is forgotten: the next call runs again
+    assert flights.do("key", lambda: "retried") == "retried"
+
+
+def test_identical_prompts_reach_the_model_once(app_module, llm):
+    llm.delays[MODEL] = 0.3
+    ai = app_module.SmartAI(MemoryResponseCache(), ModelRouter([MODEL]))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        replies = list(pool.map(lambda _: ai.call_llm("same question", "bot"), range(8)))
+    assert replies == ["We build widgets."] * 8
+    assert llm.models_called() == [MODEL]
+
+
+def test_leader_rechecks_the_cache_before_calling_the_model(app_module, llm):
+    cache = MemoryResponseCache()
+    ai = app_module.SmartAI(cache, ModelRouter([MODEL]))
+    # Stored by a flight that finished after this caller's own cache check
+    cache.set("bot", "question", "already answered")
+    assert ai._fetch("question", "bot") == "already answered"
+    assert llm.models_called() == []
+
+
+def test_workers_coalesce_through_shared_leases(app_module, llm, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "LLM_SINGLEFLIGHT_SHARED", True)
+    llm.delays[MODEL] = 0.3
+    path = str(tmp_path / "llm_cache.db")
+    workers = [app_module.SmartAI(SQLiteResponseCache(path), ModelRouter([MODEL])) for _ in range(3)]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        replies = list(pool.map(lambda ai: ai.call_llm("same question", "bot"), workers))
+    assert replies == ["We build widgets."] * 3
+    assert llm.models_called() == [MODEL]
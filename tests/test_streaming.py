@@ -0,0 +1,66 @@
+import json
+import uuid
+
+import pytest
+
+
+def events(resp):
+    """(event, payload) pairs of a text/event-stream body"""
+    parsed = []
+    for block in resp.get_data(as_text=True).split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+@pytest.fixture
+def chatbot(app_module):
+    chatbot_id = f"stream-{uuid.uuid4().hex[:8]}"
+    pages = [{"url": "https://acme.test/", "title": "Acme", "content": "Acme builds widgets for factories. " * 5}]
+    assert app_module.DatabaseManager.save_chatbot(chatbot_id, "Acme", "https://acme.test/", pages, {}, "")
+    return chatbot_id
+
+
+def ask(app_module, chatbot_id, message):
+    resp = app_module.app.test_client().post("/api/chat/stream", json={"chatbot_id": chatbot_id, "message": message})
+    assert resp.status_code == 200 and resp.mimetype == "text/event-stream"
+    return events(resp)
+
+
+def test_reply_streams_as_deltas_then_done(app_module, llm, chatbot):
+    llm.reply = "We build widgets for factories."
+    sent = ask(app_module, chatbot, "What do you build?")
+    deltas = "".join(payload["text"] for event, payload in sent if event == "delta")
+    assert deltas.strip() == "We build widgets for factories."
+    assert sent[-1] == ("done", {"response": deltas})
+    assert len(sent) > 2
+    assert all(streamed for _, streamed in llm.requests)
+
+
+def test_finished_stream_is_cached(app_module, llm, chatbot):
+    first = ask(app_module, chatbot, "What do you build?")
+    calls = len(llm.requests)
+    second = ask(app_module, chatbot, "What do you build?")
+    assert len(llm.requests) == calls
+    assert second[-1][1]["response"].strip() == first[-1][1]["response"].strip()
+
+
+def test_failed_models_fall_back_before_the_first_token(app_module, llm, chatbot):
+    for model in app_module.MODELS[:-1]:
+        llm.status[model] = 500
+    sent = ask(app_module, chatbot, "Do you sell gears?")
+    assert sent[-1][1]["response"].strip() == "We build widgets."
+    assert llm.models_called()[-1] == app_module.MODELS[-1]
+
+
+def test_canned_reply_is_a_single_done_event(app_module, llm, chatbot):
+    sent = ask(app_module, chatbot, "hello")
+    assert len(sent) == 1 and sent[0][0] == "done"
+    assert "Acme" in sent[0][1]["response"]
+    assert llm.requests == []
+
+
+def test_missing_fields_are_rejected(app_module):
+    resp = app_module.app.test_client().post("/api/chat/stream", json={"chatbot_id": "x"})
+    assert resp.status_code == 400
@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from db_backends import SQLiteConnection
+from write_queue import WriteBehindQueue
+
+INSERT = "INSERT INTO rows (id, value) VALUES (%s, %s)"
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "queue.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE rows (id INTEGER PRIMARY KEY, value TEXT NOT NULL)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def stored(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT id, value FROM rows ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def make_queue(db, spool, **kwargs):
+    return WriteBehindQueue("rows", INSERT, lambda: SQLiteConnection(db), flush_interval=0.05,
+                            spool_dir=str(spool), fsync=False, **kwargs)
+
+
+def test_rows_are_batched_and_journal_removed(db, tmp_path):
+    spool = tmp_path / "spool"
+    queue = make_queue(db, spool, batch_size=10)
+    for i in range(25):
+        queue.enqueue((i, f"v{i}"))
+    assert queue.flush(5)
+    queue.stop()
+    assert len(stored(db)) == 25
+    assert queue.stats()["batches"] < 25
+    assert not list(spool.glob("rows-*.jsonl"))
+
+
+def test_start_replays_journal_of_dead_process(db, tmp_path):
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    # Left behind by a worker that crashed mid-write: the torn last line is skipped
+    (spool / "rows-999999999-deadbeef-0.jsonl").write_text('[1, "a"]\n[2, "b"]\n[3, "c', encoding="utf-8")
+    queue = make_queue(db, spool)
+    queue.start()
+    assert queue.flush(5)
+    queue.stop()
+    assert stored(db) == [(1, "a"), (2, "b")]
+    assert not list(spool.glob("rows-*.jsonl"))
+
+
+def test_journal_of_live_process_is_left_alone(db, tmp_path):
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    live = spool / f"rows-{os.getppid()}-cafebabe-0.jsonl"
+    live.write_text('[1, "a"]\n', encoding="utf-8")
+    queue = make_queue(db, spool)
+    queue.start()
+    assert queue.flush(5)
+    queue.stop()
+    assert stored(db) == []
+    assert live.exists()
+
+
+def test_bad_rows_are_dead_lettered(db, tmp_path):
+    spool = tmp_path / "spool"
+    queue = make_queue(db, spool)
+    queue.enqueue((1, "ok"))
+    queue.enqueue((2, None))  # NOT NULL violation: not transient, so not retried
+    queue.enqueue((3, "ok"))
+    assert queue.flush(5)
+    queue.stop()
+    assert stored(db) == [(1, "ok"), (3, "ok")]
+    assert queue.stats()["dead_lettered"] == 1
+    failed = [json.loads(line) for line in (spool / "rows.failed.jsonl").read_text().splitlines()]
+    assert failed[0]["row"] == [2, None]
+
+
+def test_unwritten_rows_stay_journaled_for_next_start(tmp_path):
+    spool = tmp_path / "spool"
+    queue = WriteBehindQueue("rows", INSERT, lambda: None, flush_interval=0.05, max_retries=0,
+                             spool_dir=str(spool), fsync=False)
+    queue.enqueue((1, "a"))
+    queue.stop()
+    journal = list(spool.glob("rows-*.jsonl"))
+    assert len(journal) == 1
+    assert journal[0].read_text().strip() == '[1, "a"]'
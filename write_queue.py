@@ -0,0 +1,361 @@
+"""
+Write-behind queue
+Rows are journaled to a local spool file, acknowledged, and inserted by a
+background thread in batched executemany transactions. Journal segments are
+deleted once every row in them is committed, and segments left behind by a
+crashed process are replayed on the next start.
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+# MySQL errors worth retrying: lock wait timeout, deadlock, server gone / lost / unreachable
+TRANSIENT_ERRNOS = {1205, 1213, 2002, 2003, 2006, 2013, 2055}
+# SQLite: SQLITE_BUSY, SQLITE_LOCKED
+TRANSIENT_SQLITE_CODES = {5, 6}
+
+
+def is_transient(error):
+    return (getattr(error, "errno", None) in TRANSIENT_ERRNOS or
+            getattr(error, "sqlite_errorcode", None) in TRANSIENT_SQLITE_CODES)
+
+
+class TransientWriteError(Exception):
+    """No connection could be obtained; the batch should be retried later"""
+
+
+class WriteBehindQueue:
+    """Batches INSERTs on a background thread; flushes on size, interval and shutdown"""
+
+    def __init__(self, name, query, get_connection, batch_size=50, flush_interval=1.0,
+                 max_retries=5, spool_dir=None, fsync=True, segment_rows=1000):
+        self.name = name
+        self.query = query
+        self.get_connection = get_connection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spool_dir = spool_dir
+        self.fsync = fsync
+        self.segment_rows = segment_rows
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._flush_requested = threading.Event()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._pid = None
+        self._run_id = None
+
+        # Journal segments: seg_id -> rows not yet committed
+        self._segments = {}
+        self._segment_files = {}
+        self._active_segment = None
+        self._active_file = None
+        self._active_rows = 0
+        self._next_segment = 0
+
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dead_lettered = 0
+        self.last_error = None
+
+    # ---- producer side ----
+
+    def enqueue(self, row):
+        """Journal the row and hand it to the writer thread. Returns once the row is durable on disk."""
+        self._ensure_started()
+        with self._lock:
+            segment = None
+            if self.spool_dir:
+                segment = self._journal(row)
+            self._pending += 1
+            self.enqueued += 1
+        self._queue.put((segment, row))
+        if self._queue.qsize() >= self.batch_size:
+            self._flush_requested.set()
+        return True
+
+    def _journal(self, row):
+        if self._active_file is None or self._active_rows >= self.segment_rows:
+            self._rotate()
+        self._active_file.write(json.dumps(row, default=str) + "\n")
+        self._active_file.flush()
+        if self.fsync:
+            os.fsync(self._active_file.fileno())
+        self._active_rows += 1
+        self._segments[self._active_segment] += 1
+        return self._active_segment
+
+    def _segment_path(self, seg):
+        return os.path.join(self.spool_dir, f"{self.name}-{os.getpid()}-{self._run_id}-{seg}.jsonl")
+
+    def _rotate(self):
+        self._close_active()
+        seg = self._next_segment
+        self._next_segment += 1
+        path = self._segment_path(seg)
+        self._active_file = open(path, "a", encoding="utf-8")
+        self._active_segment = seg
+        self._active_rows = 0
+        self._segments[seg] = 0
+        self._segment_files[seg] = path
+
+    def _close_active(self):
+        if self._active_file is None:
+            return
+        self._active_file.close()
+        self._active_file = None
+        seg, self._active_segment = self._active_segment, None
+        self._release_segment(seg, 0)
+
+    def _release_segment(self, seg, committed):
+        """Drop committed rows from a segment; delete its file once it's closed and empty"""
+        self._segments[seg] -= committed
+        if self._segments[seg] <= 0 and seg != self._active_segment:
+            path = self._segment_files.pop(seg)
+            del self._segments[seg]
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Start the writer thread now, replaying journal segments left by earlier runs,
+        instead of waiting for the first enqueue"""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        if self._pid is not None and self._pid != os.getpid():
+            self._forget_parent()
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._run_id = uuid.uuid4().hex[:8]
+            self._stopping.clear()
+            if self.spool_dir:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                self._recover()
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _forget_parent(self):
+        """In a forked child: rows queued by the parent stay with the parent, which writes them
+        (or leaves them in its journal for the next start), so the child starts empty"""
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._thread = None
+        self._pending = 0
+        self._segments = {}
+        self._segment_files = {}
+        self._active_segment = None
+        self._active_file = None
+        self._active_rows = 0
+        self._next_segment = 0
+
+    def _recover(self):
+        """Adopt journal segments from processes that are gone (or earlier runs with our pid)"""
+        for path in glob.glob(os.path.join(self.spool_dir, f"{self.name}-*.jsonl")):
+            parts = os.path.basename(path)[len(self.name) + 1:-len(".jsonl")].split("-")
+            if len(parts) != 3 or not parts[0].isdigit():
+                continue
+            owner = int(parts[0])
+            if owner != os.getpid() and _pid_alive(owner):
+                continue
+            seg = self._next_segment
+            self._next_segment += 1
+            claimed = self._segment_path(seg)
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # another worker claimed it first
+            rows = []
+            with open(claimed, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        try:
+                            rows.append(json.loads(line))
+                        except ValueError:
+                            pass  # torn final line from a crash mid-write
+            self._segments[seg] = len(rows)
+            self._segment_files[seg] = claimed
+            if not rows:
+                self._release_segment(seg, 0)
+                continue
+            print(f"[Queue] {self.name}: replaying {len(rows)} journaled row(s) from {os.path.basename(path)}")
+            for row in rows:
+                self._pending += 1
+                self._queue.put((seg, tuple(row)))
+
+    def flush(self, timeout=None):
+        """Block until everything enqueued so far is committed (or timeout). Returns True if drained."""
+        if self._thread is None:
+            return True
+        self._flush_requested.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def stop(self, timeout=30):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._flush_requested.set()
+        self._thread.join(timeout)
+        self._thread = None
+        with self._lock:
+            self._close_active()
+        if self._pending:
+            print(f"[Queue] {self.name}: {self._pending} row(s) left in the journal for the next start")
+
+    # ---- writer thread ----
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._write_with_retry(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _collect_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self._stopping.is_set() or self._flush_requested.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+            except queue.Empty:
+                if self._stopping.is_set() or self._flush_requested.is_set():
+                    break
+        return batch
+
+    def _write_with_retry(self, batch):
+        attempt = 0
+        while True:
+            try:
+                self._write_batch([row for _, row in batch])
+                self._committed(batch)
+                return
+            except TransientWriteError as e:
+                self.last_error = str(e)
+            except Exception as e:
+                self.last_error = str(e)
+                if not is_transient(e):
+                    self._write_rows_individually(batch)
+                    return
+
+            attempt += 1
+            self.retries += 1
+            if self._stopping.is_set() and attempt > self.max_retries:
+                # Give up for this process; the rows stay in the journal and are replayed on restart
+                print(f"[Queue] {self.name}: giving up on {len(batch)} row(s) at shutdown: {self.last_error}")
+                return
+            time.sleep(0.2 if self._stopping.is_set() else min(0.2 * 2 ** min(attempt, 8), 30))
+
+    def _write_batch(self, rows):
+        conn = self.get_connection()
+        if not conn:
+            raise TransientWriteError("no database connection")
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(self.query, rows)
+            conn.commit()
+            cursor.close()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+        self.batches += 1
+
+    def _write_rows_individually(self, batch):
+        """A non-transient error poisoned the batch; isolate the bad rows into a dead-letter file"""
+        for item in batch:
+            seg, row = item
+            try:
+                self._write_batch([row])
+            except Exception as e:
+                self.dead_lettered += 1
+                print(f"[Queue] {self.name}: dead-lettering row: {e}")
+                if self.spool_dir:
+                    with open(os.path.join(self.spool_dir, f"{self.name}.failed.jsonl"), "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"error": str(e), "row": row}, default=str) + "\n")
+                self._committed([item], written=False)
+                continue
+            self._committed([item])
+
+    def _committed(self, batch, written=True):
+        with self._idle:
+            if self.spool_dir:
+                counts = {}
+                for seg, _ in batch:
+                    counts[seg] = counts.get(seg, 0) + 1
+                for seg, n in counts.items():
+                    if seg in self._segments:
+                        self._release_segment(seg, n)
+            self._pending -= len(batch)
+            if written:
+                self.written += len(batch)
+            if self._pending == 0:
+                self._flush_requested.clear()
+                # Start a fresh segment next time so the drained one can be deleted
+                if self._active_rows:
+                    self._close_active()
+                self._idle.notify_all()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "batches": self.batches,
+                "retries": self.retries,
+                "dead_lettered": self.dead_lettered,
+                "journal_segments": len(self._segment_files),
+                "last_error": self.last_error
+            }
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True